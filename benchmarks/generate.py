@@ -0,0 +1,119 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Generates synthetic source trees in the layout expected by `cicd deploy`.
+"""
+
+import argparse
+import json
+import os
+import random
+from os import path as op
+
+SCALES = {
+    'small': {'notebooks': 100, 'jobs': 20, 'tasks': 4, 'clusters': 3, 'instance_pools': 2,
+              'dbfs_small': 50, 'dbfs_large': 1, 'large_size': 3 * 1024 * 1024},
+    'medium': {'notebooks': 1000, 'jobs': 200, 'tasks': 8, 'clusters': 10, 'instance_pools': 4,
+               'dbfs_small': 1000, 'dbfs_large': 2, 'large_size': 50 * 1024 * 1024},
+    'large': {'notebooks': 10000, 'jobs': 500, 'tasks': 16, 'clusters': 20, 'instance_pools': 5,
+              'dbfs_small': 10000, 'dbfs_large': 3, 'large_size': 200 * 1024 * 1024},
+}
+NOTEBOOK_HEADER = '# Databricks notebook source\n'
+
+
+def _write(file_path: str, content, mode='w'):
+    os.makedirs(op.dirname(file_path), exist_ok=True)
+    with open(file_path, mode) as f:
+        f.write(content)
+
+
+def notebook_name(i: int) -> str:
+    return f'pkg_{i % 10}/mod_{i % 7}/notebook_{i}'
+
+
+def notebook_source(i: int, revision: int = 0) -> str:
+    cells = '\n# COMMAND ----------\n\n'.join(
+        f'def step_{i}_{c}(df):\n    return df.filter("value > {c + revision}")\n' for c in range(20))
+    return f'{NOTEBOOK_HEADER}\n{cells}'
+
+
+def job_spec(i: int, scale: dict, revision: int = 0) -> dict:
+    tasks = []
+    for t in range(scale['tasks']):
+        task = {'task_key': f'task_{t}',
+                # the last notebook is never referenced, so apply_delta can remove it
+                'notebook_task': {'notebook_path': notebook_name((i * scale['tasks'] + t) % (scale['notebooks'] - 1)),
+                                  'base_parameters': {'run': str(revision)}},
+                'existing_cluster_name': f'cluster_{(i + t) % scale["clusters"]}',
+                'timeout_seconds': 3600}
+        if t:
+            task['depends_on'] = [{'task_key': f'task_{t - 1}'}]
+        tasks.append(task)
+    return {'name': f'job_{i}', 'max_concurrent_runs': 1, 'timeout_seconds': 0,
+            'email_notifications': {'on_failure': ['team@example.com']}, 'tasks': tasks}
+
+
+def cluster_spec(i: int, scale: dict) -> dict:
+    return {'cluster_name': f'cluster_{i}', 'spark_version': '10.4.x-scala2.12', 'num_workers': 2,
+            'instance_pool_name': f'pool_{i % scale["instance_pools"]}', 'autotermination_minutes': 30,
+            'spark_conf': {'spark.sql.shuffle.partitions': '64'}}
+
+
+def pool_spec(i: int) -> dict:
+    return {'instance_pool_name': f'pool_{i}', 'node_type_id': 'Standard_DS3_v2', 'min_idle_instances': 0,
+            'idle_instance_autotermination_minutes': 15}
+
+
+def generate(root: str, scale: dict, seed: int = 0):
+    rnd = random.Random(seed)
+    for i in range(scale['notebooks']):
+        _write(op.join(root, 'workspace', notebook_name(i) + '.py'), notebook_source(i))
+    for i in range(scale['jobs']):
+        _write(op.join(root, 'jobs', f'job_{i}.json'), json.dumps(job_spec(i, scale), indent=2))
+    for i in range(scale['clusters']):
+        _write(op.join(root, 'clusters', f'cluster_{i}.json'), json.dumps(cluster_spec(i, scale), indent=2))
+    for i in range(scale['instance_pools']):
+        _write(op.join(root, 'instance_pools', f'pool_{i}.json'), json.dumps(pool_spec(i), indent=2))
+    for i in range(scale['dbfs_small']):
+        _write(op.join(root, 'dbfs', 'conf', f'part_{i % 20}', f'file_{i}.json'),
+               json.dumps({'id': i, 'payload': 'x' * rnd.randint(100, 4000)}))
+    for i in range(scale['dbfs_large']):
+        _write(op.join(root, 'dbfs', 'jars', f'library_{i}.jar'), os.urandom(scale['large_size']), 'wb')
+
+
+def apply_delta(root: str, scale: dict, revision: int = 1):
+    """
+    A small change set: ~1% of the notebooks edited, one added and one removed, one job and one dbfs file changed.
+    """
+    for i in range(0, scale['notebooks'], 100):
+        _write(op.join(root, 'workspace', notebook_name(i) + '.py'), notebook_source(i, revision))
+    _write(op.join(root, 'workspace', 'pkg_new', f'notebook_r{revision}.py'), notebook_source(revision, revision))
+    removed = op.join(root, 'workspace', notebook_name(scale['notebooks'] - 1) + '.py')
+    if op.isfile(removed):
+        os.remove(removed)
+    _write(op.join(root, 'jobs', 'job_0.json'), json.dumps(job_spec(0, scale, revision), indent=2))
+    _write(op.join(root, 'dbfs', 'conf', 'part_0', 'file_0.json'), json.dumps({'id': 0, 'revision': revision}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates a synthetic databricks-cicd source tree.')
+    parser.add_argument('root', help='Target folder.')
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    args = parser.parse_args()
+    generate(args.root, SCALES[args.scale])
+
+
+if __name__ == '__main__':
+    main()
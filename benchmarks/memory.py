@@ -0,0 +1,134 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the memory per item of local and remote item stores and the time to match them, for large DBFS trees,
+and the peak memory of parsing a large cluster listing of which only a few clusters are kept, whole and incrementally.
+
+    python benchmarks/memory.py --items 150000 --budget_bytes 400
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from os import path as op
+
+sys.path.insert(0, op.dirname(op.dirname(op.abspath(__file__))))
+
+from databricks_cicd.utils import Item, ItemStore, merge_join, codec  # noqa: E402 pylint: disable=wrong-import-position
+from databricks_cicd.utils.local import Local  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def _path(i: int) -> str:
+    return f'data/part_{i % 100:03}/batch_{i % 977:04}/file_{i:07}.parquet'
+
+
+def remote_store(count: int, target_path: str = '/bench/') -> ItemStore:
+    store = ItemStore()
+    for i in range(count):
+        path = _path(i)
+        store[path] = Item(path=target_path + path, kind='dbfs file', is_dir=False, size=i * 7)
+    return store
+
+
+def cluster_listing(count: int) -> bytes:
+    """
+    A clusters/list response, in which one cluster in 100 is created by the deploying user.
+    """
+    return json.dumps({'clusters': [
+        {'cluster_id': f'0101-{i:06}-abcdefgh', 'cluster_name': f'cluster_{i}', 'spark_version': '10.4.x-scala2.12',
+         'node_type_id': 'Standard_DS3_v2', 'num_workers': i % 8, 'autotermination_minutes': 30,
+         'spark_conf': {'spark.sql.shuffle.partitions': '64'}, 'custom_tags': {'team': f'team_{i % 10}'},
+         'creator_user_name': 'cicd@example.com' if i % 100 == 0 else f'user_{i}@example.com',
+         'state': 'TERMINATED'} for i in range(count)]}).encode('utf-8')
+
+
+def _own(spec: dict) -> bool:
+    return spec['creator_user_name'] == 'cicd@example.com'
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def measure_peak(build) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory per item of databricks-cicd item stores.')
+    parser.add_argument('--items', type=int, default=150000)
+    parser.add_argument('--local_items', type=int, default=5000, help='Files created on disk for Local.dbfs_ls.')
+    parser.add_argument('--budget_bytes', type=float, default=None, help='Fails above this many bytes per item.')
+    parser.add_argument('--listing_items', type=int, default=20000, help='Clusters in the listing to parse.')
+    args = parser.parse_args()
+
+    remote, remote_size, remote_time = measure(lambda: remote_store(args.items))
+    print(f'remote store: {args.items} items, {remote_size / args.items:.0f} bytes/item, {remote_time:.2f}s')
+
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(args.local_items):
+            file_path = op.join(root, *_path(i).split('/'))
+            os.makedirs(op.dirname(file_path), exist_ok=True)
+            with open(file_path, 'wb'):
+                pass
+        local, local_size, local_time = measure(lambda: Local.dbfs_ls(root))
+        print(f'local store: {len(local)} items, {local_size / len(local):.0f} bytes/item, {local_time:.2f}s')
+
+    local = remote_store(args.items // 2)
+    start = time.perf_counter()
+    creates = updates = deletes = 0
+    for _, local_item, remote_item in merge_join(local, remote):
+        if remote_item is None:
+            creates += 1
+        elif local_item is None:
+            deletes += 1
+        else:
+            updates += 1
+    print(f'merge join: {creates} creates, {updates} matches, {deletes} deletes in {time.perf_counter() - start:.2f}s')
+
+    listing = cluster_listing(args.listing_items)
+    assert len(listing) >= codec.INCREMENTAL_THRESHOLD, 'The listing is parsed whole, increase --listing_items.'
+    whole_peak, whole_time = measure_peak(lambda: [s for s in codec.loads(listing)['clusters'] if _own(s)])
+    filtered_peak, filtered_time = measure_peak(lambda: codec.loads_filtered(listing, 'clusters', _own))
+    print(f'listing: {args.listing_items} clusters, {len(listing) / 1024 / 1024:.1f} MB, peak memory parsed whole '
+          f'{whole_peak / 1024 / 1024:.1f} MB in {whole_time:.2f}s, incrementally {filtered_peak / 1024 / 1024:.1f} MB '
+          f'in {filtered_time:.2f}s ({codec.BACKEND})')
+
+    if args.budget_bytes and remote_size / args.items > args.budget_bytes:
+        print(f'Memory per item exceeds the budget of {args.budget_bytes} bytes.')
+        sys.exit(1)
+    if filtered_peak >= whole_peak:
+        print('Parsing the listing incrementally does not lower the peak memory.')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
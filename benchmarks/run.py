@@ -0,0 +1,224 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runs `cicd deploy` against the local stand-in API on synthetic source trees and records wall time,
+peak RSS, CPU time, the CPU time spent on logging and API calls per endpoint for three scenarios:
+  cold   - empty workspace, everything is created
+  warm   - a second deploy of the same tree, nothing changes
+  delta  - a small change set on top of the warm state
+After the warm deploy, `cicd validate --remote` runs on a copy of the tree without a cluster and an instance pool,
+so their references are resolved against the workspace.
+
+    python benchmarks/run.py --scale small --output results.json --check benchmarks/baseline.json
+
+With --check, the run fails when the API call count of the warm (no change) scenario or of the remote validate
+exceeds the baseline.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from os import path as op
+
+BENCHMARKS_DIR = op.dirname(op.abspath(__file__))
+REPO_DIR = op.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, op.join(REPO_DIR, 'tests'))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from stub_server import StubServer  # noqa: E402 pylint: disable=wrong-import-position
+from generate import SCALES, generate, apply_delta  # noqa: E402 pylint: disable=wrong-import-position
+
+SCENARIOS = ['cold', 'warm', 'delta']
+# scenarios whose call counts are kept in the baseline
+CHECKED_SCENARIOS = ['warm', 'validate_remote']
+TARGET_PATH = '/bench'
+USER_NAME = 'cicd@example.com'
+CONFIG = '''[global]
+deploy_safety_limit: 1000000
+rate_limit_attempts: 5
+rate_limit_timeout: 1
+'''
+
+
+def _peak_rss_bytes(rusage) -> int:
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+
+
+def deploy(server: StubServer, local_path: str, config_file: str, work_dir: str, scenario: str,
+           extra_args: list = None) -> dict:
+    report_file = op.join(work_dir, f'{scenario}_report.json')
+    cmd = [sys.executable, '-m', 'databricks_cicd.cli', 'deploy',
+           '-w', server.url, '-u', USER_NAME, '-t', 'benchmark', '-lp', local_path, '-tp', TARGET_PATH,
+           '-np', 'bench_', '-c', config_file, '--report', report_file] + (extra_args or [])
+    server.reset_calls()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_DIR, os.environ.get('PYTHONPATH', '')]))
+    with open(op.join(work_dir, f'{scenario}.log'), 'w') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall_time = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        with open(op.join(work_dir, f'{scenario}.log')) as log:
+            sys.stderr.write(log.read()[-5000:])
+        raise RuntimeError(f'Scenario {scenario} failed with exit code {process.returncode}')
+    with open(report_file) as f:
+        report = json.load(f)
+    calls = OrderedDict(sorted(server.calls.items()))
+    return OrderedDict([
+        ('wall_time', round(wall_time, 3)),
+        ('deploy_time', report['duration']),
+        ('cpu_time', round(rusage.ru_utime + rusage.ru_stime, 3)),
+        ('log_cpu_time', round(report['logging']['caller_cpu_time'] + report['logging']['writer_cpu_time'], 3)),
+        ('log_records', report['logging']['records']),
+        ('peak_rss', _peak_rss_bytes(rusage)),
+        ('total_calls', sum(calls.values())),
+        ('calls', calls),
+        ('phases', report['phases']),
+        ('helpers', report['helpers']),
+    ])
+
+
+def validate_remote(server: StubServer, local_path: str, config_file: str, work_dir: str) -> dict:
+    validate_path = op.join(work_dir, 'validate_source')
+    if op.isdir(validate_path):
+        shutil.rmtree(validate_path)
+    shutil.copytree(local_path, validate_path)
+    # only in the workspace, so the clusters and jobs that reference them are checked against the listings
+    os.remove(op.join(validate_path, 'clusters', 'cluster_0.json'))
+    os.remove(op.join(validate_path, 'instance_pools', 'pool_0.json'))
+    cmd = [sys.executable, '-m', 'databricks_cicd.cli', 'validate', '--remote',
+           '-w', server.url, '-u', USER_NAME, '-t', 'benchmark', '-lp', validate_path, '-tp', TARGET_PATH,
+           '-np', 'bench_', '-c', config_file]
+    server.reset_calls()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_DIR, os.environ.get('PYTHONPATH', '')]))
+    with open(op.join(work_dir, 'validate_remote.log'), 'w') as log:
+        start = time.perf_counter()
+        process = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        wall_time = time.perf_counter() - start
+    if process.returncode != 0:
+        with open(op.join(work_dir, 'validate_remote.log')) as log:
+            sys.stderr.write(log.read()[-5000:])
+        raise RuntimeError(f'Scenario validate_remote failed with exit code {process.returncode}')
+    calls = OrderedDict(sorted(server.calls.items()))
+    return OrderedDict([
+        ('wall_time', round(wall_time, 3)),
+        ('total_calls', sum(calls.values())),
+        ('calls', calls),
+    ])
+
+
+def run(scale_name: str, latency: float, work_dir: str) -> dict:
+    scale = SCALES[scale_name]
+    local_path = op.join(work_dir, 'source')
+    config_file = op.join(work_dir, 'benchmark.ini')
+    with open(config_file, 'w') as f:
+        f.write(CONFIG)
+    if op.isdir(local_path):
+        shutil.rmtree(local_path)
+    generate(local_path, scale)
+    results = OrderedDict([('scale', scale_name), ('latency', latency), ('scenarios', OrderedDict())])
+    with StubServer(latency=latency, user_name=USER_NAME) as server:
+        server.state.workspace_mkdirs(TARGET_PATH)
+        server.state.dbfs_mkdirs(TARGET_PATH)
+        for scenario in SCENARIOS:
+            if scenario == 'delta':
+                apply_delta(local_path, scale)
+            results['scenarios'][scenario] = deploy(server, local_path, config_file, work_dir, scenario)
+            result = results['scenarios'][scenario]
+            print(f'{scale_name:>6} {scenario:>5}: {result["wall_time"]:8.2f}s '
+                  f'{result["peak_rss"] / 1024 / 1024:8.1f} MB '
+                  f'{result["total_calls"]:8} calls '
+                  f'{result["cpu_time"]:6.2f}s cpu, {result["log_cpu_time"]:5.3f}s of it logging '
+                  f'{result["log_records"]} lines', flush=True)
+            if scenario == 'warm':
+                results['scenarios']['validate_remote'] = validate_remote(server, local_path, config_file, work_dir)
+                result = results['scenarios']['validate_remote']
+                print(f'{scale_name:>6} validate --remote: {result["wall_time"]:8.2f}s '
+                      f'{result["total_calls"]:8} calls', flush=True)
+    return results
+
+
+def check(results: list, baseline_file: str) -> list:
+    """
+    Compares the calls of the checked scenarios with the baseline. Returns a list of regressions.
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    regressions = []
+    for result in results:
+        for scenario in CHECKED_SCENARIOS:
+            expected = baseline.get(result['scale'], {}).get(scenario)
+            if expected is None:
+                continue
+            actual = result['scenarios'][scenario]
+            if actual['total_calls'] > expected['total_calls']:
+                regressions.append(f'{result["scale"]}: {scenario} makes {actual["total_calls"]} API calls, '
+                                   f'the baseline is {expected["total_calls"]}')
+            for endpoint, count in actual['calls'].items():
+                if count > expected['calls'].get(endpoint, 0):
+                    regressions.append(f'{result["scale"]}: {scenario} calls {endpoint} {count} times, '
+                                       f'the baseline is {expected["calls"].get(endpoint, 0)}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='databricks-cicd deploy benchmarks.')
+    parser.add_argument('--scale', choices=list(SCALES), action='append',
+                        help='Scale to run. Can be repeated. Defaults to small.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API call.')
+    parser.add_argument('--output', default=None, help='Path to write the results to, as JSON.')
+    parser.add_argument('--check', default=None, help='Baseline JSON file to check the call counts against.')
+    parser.add_argument('--update_baseline', default=None, help='Writes the checked call counts as a new baseline.')
+    parser.add_argument('--work_dir', default=None, help='Keeps the generated trees and logs in this folder.')
+    args = parser.parse_args()
+
+    results = []
+    for scale_name in args.scale or ['small']:
+        if args.work_dir:
+            work_dir = op.join(args.work_dir, scale_name)
+            os.makedirs(work_dir, exist_ok=True)
+            results.append(run(scale_name, args.latency, work_dir))
+        else:
+            with tempfile.TemporaryDirectory(prefix=f'cicd_bench_{scale_name}_') as work_dir:
+                results.append(run(scale_name, args.latency, work_dir))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        baseline = {r['scale']: {scenario: {'total_calls': r['scenarios'][scenario]['total_calls'],
+                                            'calls': r['scenarios'][scenario]['calls']}
+                                 for scenario in CHECKED_SCENARIOS} for r in results}
+        with open(args.update_baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+    if args.check:
+        regressions = check(results, args.check)
+        if regressions:
+            print('API call count regressions:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print('No API call count regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Checks the startup cost of local only commands against a budget:
+  - `python -X importtime` of databricks_cicd.cli, in milliseconds
+  - wall time of `cicd -v` and of `cicd validate` on an empty tree, in milliseconds
+  - `cicd -v` and `cicd validate` must not import any of HEAVY_MODULES
+
+    python benchmarks/startup.py --import_budget_ms 50 --wall_budget_ms 100
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from os import path as op
+
+REPO_DIR = op.dirname(op.dirname(op.abspath(__file__)))
+HEAVY_MODULES = ['requests', 'urllib3', 'databricks_cicd.deploy.cli']
+PROBE = '''
+import sys
+from databricks_cicd.cli import cli
+try:
+    cli.main(sys.argv[1:])
+except SystemExit:
+    pass
+print('\\n'.join(m for m in {heavy} if m in sys.modules), file=sys.stderr)
+'''
+
+
+def _env() -> dict:
+    return dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_DIR, os.environ.get('PYTHONPATH', '')]))
+
+
+def import_time_ms() -> float:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import databricks_cicd.cli'],
+                            capture_output=True, text=True, env=_env(), check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package. Top level imports are not indented
+        _, cumulative, name = line.split('|')
+        if name.startswith(' databricks_cicd') and not name.startswith('  '):
+            total += int(cumulative)
+    return total / 1000
+
+
+def wall_time_ms(args: list, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'databricks_cicd.cli'] + args,
+                       capture_output=True, env=_env(), check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def baseline_wall_time_ms(repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def heavy_imports(args: list) -> list:
+    result = subprocess.run([sys.executable, '-c', PROBE.format(heavy=HEAVY_MODULES)] + args,
+                            capture_output=True, text=True, env=_env(), check=True)
+    return [m for m in result.stderr.splitlines() if m in HEAVY_MODULES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='databricks-cicd startup time budget.')
+    parser.add_argument('--import_budget_ms', type=float, default=50,
+                        help='Budget of the cumulative import time of databricks_cicd.cli.')
+    parser.add_argument('--wall_budget_ms', type=float, default=100,
+                        help='Budget of the wall time of local commands, on top of a bare interpreter start.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    imports = import_time_ms()
+    print(f'import databricks_cicd.cli: {imports:.1f} ms')
+    if imports > args.import_budget_ms:
+        failures.append(f'import time {imports:.1f} ms exceeds {args.import_budget_ms} ms')
+
+    interpreter = baseline_wall_time_ms(args.repeat)
+    print(f'python -c pass: {interpreter:.1f} ms')
+    with tempfile.TemporaryDirectory() as local_path:
+        for command in (['-v'], ['validate', '-lp', local_path]):
+            wall = wall_time_ms(command, args.repeat) - interpreter
+            print(f'cicd {" ".join(command[:1])}: {wall:.1f} ms')
+            if wall > args.wall_budget_ms:
+                failures.append(f'cicd {command[0]} takes {wall:.1f} ms, the budget is {args.wall_budget_ms} ms')
+            heavy = heavy_imports(command)
+            if heavy:
+                failures.append(f'cicd {command[0]} imports {", ".join(heavy)}')
+
+    if failures:
+        print('Startup budget exceeded:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('Startup within budget.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import base64
+import os
+import time
+import zipfile
+from contextlib import ExitStack
+from os import path as op
+from databricks_cicd import __version__
+from databricks_cicd.conf import Conf
+from databricks_cicd.utils import Item, ItemStore, content_hash, codec
+from databricks_cicd.utils.local import Local, READ_CHUNK_SIZE
+
+BUNDLE_FORMAT = 1
+INDEX_ENTRY = 'index.json'
+TMP_SUFFIX = '.tmp'
+# kind of the items listed by Local.files_ls, by their section
+SPEC_KINDS = {'instance_pools': 'instance pool', 'clusters': 'cluster', 'jobs': 'job'}
+
+_log = logging.getLogger(__name__)
+
+
+def _record(name: str, entry: str, item: Item) -> dict:
+    return {'name': name, 'path': entry, 'kind': item.kind, 'is_dir': item.is_dir, 'language': item.language,
+            'size': item.size, 'hash': item.hash}
+
+
+def _write_entries(archive: zipfile.ZipFile, conf: Conf) -> dict:
+    """
+    Writes the items of all sections to the archive. Returns their index records, by section.
+    """
+    sections = {'workspace': []}
+    for name, item in Local.workspace_ls(op.join(conf.local_path, conf.workspace.local_sub_dir)).items():
+        entry = f'workspace/{name}'
+        if not item.is_dir:
+            content = Local.load_binary(item.path)
+            item.hash = content_hash([content])
+            archive.writestr(entry, base64.b64encode(content))
+        sections['workspace'].append(_record(name, entry, item))
+    for section, kind in SPEC_KINDS.items():
+        sections[section] = []
+        for name, item in Local.files_ls(op.join(conf.local_path, getattr(conf, section).local_sub_dir),
+                                         ['.json'], kind).items():
+            entry = f'{section}/{name}.json'
+            try:
+                archive.writestr(entry, codec.dumps(Local.load_json(item.path)))
+            except ValueError as e:
+                raise RuntimeError(f'Invalid JSON in {item.path}: {e}') from e
+            sections[section].append(_record(name, entry, item))
+    sections['dbfs'] = []
+    for name, item in Local.dbfs_ls(op.join(conf.local_path, conf.dbfs.local_sub_dir)).items():
+        entry = f'dbfs/{name}'
+        if not item.is_dir:
+            archive.write(item.path, entry)
+        sections['dbfs'].append(_record(name, entry, item))
+    return sections
+
+
+def write_bundle(conf: Conf, bundle_path: str) -> dict:
+    """
+    Scans the local source files once and writes them to a zip archive, with an index of all items:
+    notebooks base64 encoded, as sent by workspace/import, with their hash, specs validated and compacted, and DBFS
+    files as they are. Returns the number of items of each section.
+    """
+    # written next to the target and renamed once complete, so a failed build leaves no partial bundle behind
+    tmp_path = bundle_path + TMP_SUFFIX
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            sections = _write_entries(archive, conf)
+            archive.writestr(INDEX_ENTRY, codec.dumps({'format': BUNDLE_FORMAT, 'version': __version__,
+                                                       'created_at': int(time.time()),
+                                                       'local_path': op.abspath(conf.local_path),
+                                                       'sections': sections}))
+    except Exception:
+        if op.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, bundle_path)
+    return {section: len(records) for section, records in sections.items()}
+
+
+class Bundle:
+    """
+    Local source files, as written to an archive by write_bundle. It lists and loads items like Local, so the helpers
+    deploy from either. Items are listed by section from the index, regardless of the local paths of the deploy.
+    Item paths are entries of the archive.
+    """
+
+    def __init__(self, bundle_path: str):
+        self._path = bundle_path
+        # the archive stays open for the lifetime of the bundle, unless it is not a bundle that can be deployed
+        with ExitStack() as stack:
+            archive = stack.enter_context(zipfile.ZipFile(bundle_path, 'r'))
+            try:
+                index = codec.loads(archive.read(INDEX_ENTRY))
+            except KeyError as e:
+                raise RuntimeError(f'Not a bundle, no {INDEX_ENTRY} in: {bundle_path}') from e
+            if index.get('format') != BUNDLE_FORMAT:
+                raise RuntimeError(f'Bundle format {index.get("format")} of {bundle_path} is not supported. '
+                                   f'Build it again with databricks-cicd {__version__}')
+            stack.pop_all()
+        self._archive = archive
+        self._index = index
+        _log.info('Deploying bundle %s, built by databricks-cicd %s from %s', bundle_path, self._index['version'],
+                  self._index['local_path'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._archive.close()
+
+    def _ls(self, section: str) -> ItemStore:
+        return ItemStore({r['name']: Item(path=r['path'], kind=r['kind'], is_dir=r['is_dir'], size=r['size'],
+                                          language=r['language'], hash_=r['hash'])
+                          for r in self._index['sections'].get(section, [])})
+
+    def workspace_ls(self, _path) -> ItemStore:
+        return self._ls('workspace')
+
+    def dbfs_ls(self, _path) -> ItemStore:
+        return self._ls('dbfs')
+
+    def files_ls(self, _path, _extensions=None, kind=None) -> ItemStore:
+        return self._ls({v: k for k, v in SPEC_KINDS.items()}[kind])
+
+    def load_json(self, path) -> dict:
+        return codec.loads(self._archive.read(path))
+
+    def load_base64(self, path) -> str:
+        return self._archive.read(path).decode('ascii')
+
+    def load_binary(self, path) -> bytes:
+        if path.startswith('workspace/'):
+            return base64.b64decode(self._archive.read(path))
+        return self._archive.read(path)
+
+    def open_binary(self, path):
+        return self._archive.open(path)
+
+    def read_chunks(self, path, chunk_size: int = READ_CHUNK_SIZE):
+        with self._archive.open(path) as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+
+    def content_hash(self, path) -> str:
+        return content_hash([self.load_binary(path)])
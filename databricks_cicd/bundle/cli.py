@@ -0,0 +1,45 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import time
+import click
+from databricks_cicd import CONTEXT_SETTINGS
+from databricks_cicd.conf import Conf
+from databricks_cicd.utils import display_log
+from databricks_cicd.bundle.bundle import write_bundle
+
+_log = logging.getLogger(__name__)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               short_help='Builds a bundle of the source files, that deploys to any environment with deploy --bundle.')
+@click.option('--local_path', '-lp', show_default=True, default='.',
+              help='Root path of all source files to be deployed.')
+@click.option('--output', '-o', show_default=True, default='cicd_bundle.zip',
+              help='Path of the bundle to write.')
+@click.option('--config_file', '-c', show_default=True, default=None,
+              help='Path to the config file. Only the local_sub_dir of each section is used.')
+@click.option('--verbose', show_default=True, default=False, is_flag=True,
+              help='Shows debug messages.')
+def bundle_cli(**kwargs):
+    display_log(logging.DEBUG if kwargs['verbose'] else logging.INFO)
+    conf = Conf({'global': {'local_path': kwargs['local_path']}}, kwargs['config_file'])
+    start = time.perf_counter()
+    try:
+        counts = write_bundle(conf, kwargs['output'])
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    _log.info('Bundled in %.2fs to %s. Items of %s', time.perf_counter() - start, kwargs['output'],
+              ', '.join(f'{s.replace("_", " ")}: {n}' for s, n in counts.items()))
@@ -12,10 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import importlib
 import click
 from databricks_cicd import __version__, CONTEXT_SETTINGS
-from databricks_cicd.deploy.cli import deploy_cli
-from databricks_cicd.validate.cli import validate_cli
+
+# subcommands are imported on first use, so `cicd -v` or a local only `cicd validate` do not load the API stack
+COMMANDS = {
+    'deploy': 'databricks_cicd.deploy.cli:deploy_cli',
+    'validate': 'databricks_cicd.validate.cli:validate_cli',
+    'smoke': 'databricks_cicd.smoke.cli:smoke_cli',
+    'pull': 'databricks_cicd.pull.cli:pull_cli',
+    'drift': 'databricks_cicd.drift.cli:drift_cli',
+    'watch': 'databricks_cicd.watch.cli:watch_cli',
+    'daemon': 'databricks_cicd.daemon.cli:daemon_cli',
+    'bundle': 'databricks_cicd.bundle.cli:bundle_cli',
+}
+
+
+class LazyGroup(click.Group):
+    def __init__(self, *args, lazy_commands: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self._lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self._lazy_commands:
+            module_name, attribute = self._lazy_commands[cmd_name].split(':')
+            self.add_command(getattr(importlib.import_module(module_name), attribute), name=cmd_name)
+        return super().get_command(ctx, cmd_name)
 
 
 def print_version_callback(ctx, _, value):
@@ -25,15 +51,28 @@ def print_version_callback(ctx, _, value):
     ctx.exit()
 
 
-@click.group(context_settings=CONTEXT_SETTINGS)
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS, context_settings=CONTEXT_SETTINGS)
 @click.option('--version', '-v', is_flag=True, callback=print_version_callback,
               expose_value=False, is_eager=True, help=__version__)
-def cli():
-    pass
-
+@click.option('--profile', default=None, type=click.Choice(['cpu', 'memory']),
+              help='Runs the command under cProfile (cpu) or tracemalloc (memory).')
+@click.option('--profile_output', default=None,
+              help='Path of the profile result. Defaults to cicd.pstats for cpu and cicd_memory.txt for memory.')
+@click.option('--profile_top', show_default=True, default=20,
+              help='Number of functions or allocations to include in the profile summary.')
+@click.option('--log_format', default=None, type=click.Choice(['text', 'json']), envvar='CICD_LOG_FORMAT',
+              help='Format of the log lines. json writes one object per line, for log collectors. Defaults to text.')
+@click.pass_context
+def cli(ctx, profile, profile_output, profile_top, log_format):
+    if log_format:
+        from databricks_cicd.utils.logs import set_log_format
+        set_log_format(log_format)
+    if profile:
+        from databricks_cicd.utils.profiling import Profiler
+        profiler = Profiler(profile, profile_output, profile_top)
+        profiler.start()
+        ctx.call_on_close(profiler.stop)
 
-cli.add_command(deploy_cli, name='deploy')
-cli.add_command(validate_cli, name='validate')
 
 if __name__ == "__main__":
     cli()
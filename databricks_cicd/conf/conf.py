@@ -17,6 +17,8 @@ from os import path as op
 from configparser import ConfigParser
 from textwrap import indent
 
+DBFS_UPLOAD_BACKENDS = ('blocks', 'put', 'files')
+
 _log = logging.getLogger(__name__)
 
 
@@ -55,6 +57,9 @@ class Conf(ConfBase):
 
         self._section = 'global'
         self.workspace_host = parser[self._section].get('workspace_host')
+        self.workspace_scheme = parser[self._section].get('workspace_scheme')
+        if self.workspace_host and '://' in self.workspace_host:
+            self.workspace_scheme, self.workspace_host = self.workspace_host.split('://', 1)
         self.deploying_user_name = parser[self._section].get('deploying_user_name')
         self.deploying_service_name = parser[self._section].get('deploying_service_name')
         self.deploying_user_id = None
@@ -64,12 +69,19 @@ class Conf(ConfBase):
         self.deploy_safety_limit = self._parse_int(parser[self._section].get('deploy_safety_limit'))
         self.rate_limit_timeout = self._parse_int(parser[self._section].get('rate_limit_timeout'))
         self.rate_limit_attempts = self._parse_int(parser[self._section].get('rate_limit_attempts'))
+        self.content_budget = self._parse_int(parser[self._section].get('content_budget'))
         self.workspace = ConfWorkspace(parser)
         self.instance_pools = ConfInstancePools(parser)
         self.clusters = ConfClusters(parser)
         self.jobs = ConfJobs(parser)
         self.dbfs = ConfDBFS(parser)
         self.validate = ConfValidate(parser)
+        self.smoke = ConfSmoke(parser)
+        self.pull = ConfPull(parser)
+        self.drift = ConfDrift(parser)
+        self.shard = ConfShard(parser)
+        self.watch = ConfWatch(parser)
+        self.daemon = ConfDaemon(parser)
 
 
 class ConfWorkspace(ConfBase):
@@ -107,6 +119,7 @@ class ConfJobs(ConfBase):
         self.deploy = parser[self._section].getboolean('deploy')
         self.local_sub_dir = parser[self._section].get('local_sub_dir')
         self.strip_attributes = self._parse_list(parser[self._section].get('strip_attributes'))
+        self.partial_update = parser[self._section].getboolean('partial_update')
 
 
 class ConfDBFS(ConfBase):
@@ -117,6 +130,17 @@ class ConfDBFS(ConfBase):
         self.compare_contents = parser[self._section].getboolean('compare_contents')
         self.target_path = parser[self._section].get('target_path')
         self.transfer_block_size = eval(parser[self._section].get('transfer_block_size'))
+        self.progress_interval = parser[self._section].getfloat('progress_interval')
+        self.upload_backend = parser[self._section].get('upload_backend')
+        self.upload_backends = {}
+        for line in self._parse_list(parser[self._section].get('upload_backends')):
+            assert ':' in line, f'Invalid upload backend "{line}". Expected <path prefix>: <backend>'
+            prefix, backend = (v.strip() for v in line.rsplit(':', 1))
+            self.upload_backends[prefix.rstrip('/') or '/'] = backend
+        for backend in [self.upload_backend] + list(self.upload_backends.values()):
+            assert backend in DBFS_UPLOAD_BACKENDS, \
+                f'Unknown upload backend "{backend}". Expected one of: {", ".join(DBFS_UPLOAD_BACKENDS)}'
+        self.files_endpoint = parser[self._section].get('files_endpoint').strip('/')
         assert self.target_path != '/', 'Cannot deploy in the dbfs root folder!'
 
 
@@ -130,3 +154,55 @@ class ConfValidate(ConfBase):
         self.jobs_no_nested_folders = parser[self._section].getboolean('jobs_no_nested_folders')
         self.jobs_notebook_paths = parser[self._section].getboolean('jobs_notebook_paths')
         self.jobs_existing_clusters = parser[self._section].getboolean('jobs_existing_clusters')
+        self.workers = self._parse_int(parser[self._section].get('workers'))
+        self.cache_file = parser[self._section].get('cache_file')
+
+
+class ConfSmoke(ConfBase):
+    def __init__(self, parser: ConfigParser):
+        self._section = 'smoke'
+        self.jobs = self._parse_list(parser[self._section].get('jobs'))
+        self.fail_fast = parser[self._section].getboolean('fail_fast')
+        self.poll_interval = parser[self._section].getfloat('poll_interval')
+        self.max_poll_interval = parser[self._section].getfloat('max_poll_interval')
+        self.backoff = parser[self._section].getfloat('backoff')
+        self.calls_per_second = parser[self._section].getfloat('calls_per_second')
+        self.timeout = self._parse_int(parser[self._section].get('timeout'))
+
+
+class ConfPull(ConfBase):
+    def __init__(self, parser: ConfigParser):
+        self._section = 'pull'
+        self.workers = self._parse_int(parser[self._section].get('workers'))
+
+
+class ConfDrift(ConfBase):
+    def __init__(self, parser: ConfigParser):
+        self._section = 'drift'
+        self.state_file = parser[self._section].get('state_file')
+
+
+class ConfShard(ConfBase):
+    def __init__(self, parser: ConfigParser):
+        self._section = 'shard'
+        self.wait_timeout = self._parse_int(parser[self._section].get('wait_timeout'))
+        self.poll_interval = self._parse_int(parser[self._section].get('poll_interval'))
+
+
+class ConfWatch(ConfBase):
+    def __init__(self, parser: ConfigParser):
+        self._section = 'watch'
+        self.debounce = parser[self._section].getfloat('debounce')
+        self.poll_interval = parser[self._section].getfloat('poll_interval')
+        self.resync_interval = self._parse_int(parser[self._section].get('resync_interval'))
+        self.use_watchdog = parser[self._section].getboolean('use_watchdog')
+
+
+class ConfDaemon(ConfBase):
+    def __init__(self, parser: ConfigParser):
+        self._section = 'daemon'
+        self.host = parser[self._section].get('host')
+        self.port = self._parse_int(parser[self._section].get('port'))
+        self.listing_ttl = self._parse_int(parser[self._section].get('listing_ttl'))
+        self.identity_ttl = self._parse_int(parser[self._section].get('identity_ttl'))
+        self.idle_timeout = self._parse_int(parser[self._section].get('idle_timeout'))
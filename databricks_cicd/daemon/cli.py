@@ -0,0 +1,45 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import click
+from databricks_cicd import CONTEXT_SETTINGS
+from databricks_cicd.conf import Conf
+from databricks_cicd.utils import display_log
+from databricks_cicd.daemon.server import DeployDaemon, serve
+
+_log = logging.getLogger(__name__)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               short_help='Serves deploy requests, reusing connections and listings between deploys of a workspace.')
+@click.option('--host', show_default=True, default=None,
+              help='Address to listen on. Defaults to host in [daemon].')
+@click.option('--port', show_default=True, default=None, type=int,
+              help='Port to listen on. Defaults to port in [daemon].')
+@click.option('--socket', 'socket_path', show_default=True, default=None,
+              help='Unix socket to listen on, instead of host:port.')
+@click.option('--config_file', '-c', show_default=True, default=None,
+              help='Path to the config file with the [daemon] section.')
+@click.option('--verbose', show_default=True, default=False, is_flag=True,
+              help='Shows debug messages.')
+def daemon_cli(**kwargs):
+    display_log(logging.DEBUG if kwargs['verbose'] else logging.INFO)
+
+    conf = Conf({'daemon': {k: str(kwargs[k]) for k in ['host', 'port'] if kwargs[k] is not None}},
+                kwargs['config_file'])
+    try:
+        serve(DeployDaemon(conf.daemon), conf.daemon.host, conf.daemon.port, kwargs['socket_path'])
+    except KeyboardInterrupt:
+        _log.info('Stopped.')
@@ -0,0 +1,296 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import hashlib
+import os
+import socketserver
+import threading
+import time
+from os import path as op
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd import __version__
+from databricks_cicd.conf import Conf
+from databricks_cicd.conf.conf import ConfDaemon
+from databricks_cicd.utils import Context, codec
+from databricks_cicd.utils.api import API
+from databricks_cicd.deploy.deployer import Deployer
+
+# fields of a deploy request that tell workspace targets apart, besides the token
+TARGET_FIELDS = ('workspace', 'user', 'target_path', 'local_path', 'name_prefix', 'config_file')
+REQUIRED_FIELDS = ('token', 'workspace', 'user', 'target_path')
+
+_log = logging.getLogger(__name__)
+
+
+class Session:
+    """
+    Warm state of one workspace target: the API session, the deploying user id and the helpers with their listings.
+    Deploys of a session run one at a time, in the order they were received.
+    """
+
+    def __init__(self, request: dict, conf: ConfDaemon):
+        self._daemon_conf = conf
+        self.conf = Conf({
+            'global': {'workspace_host': request['workspace'],
+                       'local_path': request.get('local_path') or '.',
+                       'name_prefix': request.get('name_prefix') or '',
+                       'deploying_user_name': request['user']},
+            'workspace': {'target_path': request['target_path']},
+            'dbfs': {'target_path': request['target_path']},
+            },
+            request.get('config_file'))
+        self.context = Context(self.conf)
+        self.context.api = API(self.conf, request['token'], self.context.metrics, self.context.tracer)
+        self._queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cicd-deploy')
+        # guards the counters below, updated by request threads and the deploy thread
+        self._lock = threading.Lock()
+        self._helpers = None
+        self._identity_at = None
+        self._listed_at = None
+        self.used_at = time.monotonic()
+        self.deploys = 0
+        self.failed = 0
+        self.pending = 0
+
+    def _refresh(self, refresh: bool):
+        now = time.monotonic()
+        conf = self._daemon_conf
+        if refresh or self._identity_at is None or now - self._identity_at > conf.identity_ttl:
+            helpers.resolve_identity(self.context)
+            self._identity_at = now
+        if self._helpers is None:
+            workspace = helpers.WorkspaceHelper(self.context)
+            instance_pools = helpers.InstancePoolsHelper(self.context)
+            clusters = helpers.ClustersHelper(self.context, instance_pools)
+            jobs = helpers.JobsHelper(self.context, clusters, workspace)
+            dbfs = helpers.DBFSHelper(self.context)
+            self._helpers = (workspace, instance_pools, clusters, jobs, dbfs)
+            self._listed_at = now
+            return
+        expired = refresh or now - self._listed_at > conf.listing_ttl
+        for helper in self._helpers:
+            helper.local_items = None
+            if expired:
+                helper.remote_items = None
+        if expired:
+            self._listed_at = now
+
+    def _deploy(self, dry_run: bool, refresh: bool) -> dict:
+        self.context.metrics.reset()
+        self.context.api.reset_safety_limit()
+        self.conf.dry_run = dry_run
+        succeeded = False
+        try:
+            self._refresh(refresh)
+            Deployer(self.context, *self._helpers).deploy()
+            succeeded = True
+        except Exception:
+            # a failed write may leave the listings off
+            self._helpers = None
+            raise
+        finally:
+            self._release(succeeded)
+        self.context.metrics.observe_memory(self.context.content.stats())
+        return self.context.metrics.report()
+
+    def reserve(self):
+        """
+        Marks a deploy as pending, so the session is not dropped as idle before it is submitted.
+        """
+        with self._lock:
+            self.pending += 1
+            self.used_at = time.monotonic()
+
+    def _release(self, succeeded: bool = None):
+        """
+        Ends a reserved deploy: succeeded, failed, or never started if succeeded is None.
+        """
+        with self._lock:
+            if succeeded is not None:
+                self.deploys += 1 if succeeded else 0
+                self.failed += 0 if succeeded else 1
+            self.pending -= 1
+            self.used_at = time.monotonic()
+
+    def idle_seconds(self, now: float):
+        """
+        Seconds since the session was last used, or None while a deploy is pending.
+        """
+        with self._lock:
+            return now - self.used_at if self.pending == 0 else None
+
+    def stats(self, now: float) -> dict:
+        with self._lock:
+            return {'deploys': self.deploys, 'failed': self.failed, 'pending': self.pending,
+                    'idle_seconds': round(now - self.used_at, 1)}
+
+    def submit(self, dry_run: bool, refresh: bool) -> Future:
+        """
+        Queues a deploy, reserved with reserve.
+        """
+        try:
+            return self._queue.submit(self._deploy, dry_run, refresh)
+        except RuntimeError:
+            self._release()
+            raise
+
+    def close(self):
+        self._queue.shutdown(wait=False)
+
+
+class DeployDaemon:
+    """
+    Keeps a session per workspace target, so repeated deploys of the same target reuse its connections, identity and
+    listings. Sessions that were not used for idle_timeout seconds are dropped.
+    """
+
+    def __init__(self, conf: ConfDaemon):
+        self._conf = conf
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(request: dict) -> tuple:
+        return tuple(request.get(f) for f in TARGET_FIELDS) + (hashlib.sha256(request['token'].encode()).hexdigest(),)
+
+    def _session(self, request: dict) -> Session:
+        """
+        The session of the requested target, reserved for a deploy.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for key, session in list(self._sessions.items()):
+                idle_seconds = session.idle_seconds(now)
+                if idle_seconds is not None and idle_seconds > self._conf.idle_timeout:
+                    _log.info('Dropping idle session of: %s %s', key[0], key[2])
+                    session.close()
+                    del self._sessions[key]
+            key = self._key(request)
+            if key not in self._sessions:
+                _log.info('New session of: %s %s', request['workspace'], request['target_path'])
+                self._sessions[key] = Session(request, self._conf)
+            session = self._sessions[key]
+            session.reserve()
+            return session
+
+    @staticmethod
+    def validate(request):
+        """
+        Fails with an AssertionError on a request that cannot be deployed, before anything is queued.
+        """
+        assert isinstance(request, dict), 'Expected a JSON object'
+        missing = [f for f in REQUIRED_FIELDS if not request.get(f)]
+        assert not missing, f'Missing fields: {", ".join(missing)}'
+
+    def deploy(self, request: dict) -> dict:
+        """
+        Queues a deploy of the requested target, checked with validate, and returns its run report, once it finished.
+        """
+        session = self._session(request)
+        return session.submit(bool(request.get('dry_run')), bool(request.get('refresh'))).result()
+
+    def status(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [{**dict(zip(TARGET_FIELDS, key)), **s.stats(now)}
+                    for key, s in self._sessions.items()]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = f'databricks-cicd/{__version__}'
+
+    def _respond(self, status: int, body: dict):
+        data = codec.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/status':
+            self._respond(404, {'error': f'Unknown path: {self.path}'})
+            return
+        self._respond(200, {'version': __version__, 'sessions': self.server.deploy_daemon.status()})
+
+    def do_POST(self):
+        if self.path != '/deploy':
+            self._respond(404, {'error': f'Unknown path: {self.path}'})
+            return
+        try:
+            request = codec.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            DeployDaemon.validate(request)
+        except (ValueError, AssertionError) as e:
+            self._respond(400, {'status': 'invalid', 'error': f'Invalid request: {e}'})
+            return
+        try:
+            report = self.server.deploy_daemon.deploy(request)
+        except Exception as e:
+            _log.error('Deploy of %s %s failed: %s', request.get('workspace'), request.get('target_path'), e)
+            self._respond(500, {'status': 'failed', 'error': str(e)})
+            return
+        self._respond(200, {'status': 'succeeded', 'report': report})
+
+    def log_message(self, format, *args):
+        # the client address of a unix socket is empty
+        _log.debug(format, *args)
+
+
+class _DaemonServer:
+    """
+    Serves the requests of a DeployDaemon with _Handler.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, deploy_daemon: DeployDaemon):
+        super().__init__(address, _Handler)
+        self.deploy_daemon = deploy_daemon
+
+
+class _HTTPServer(_DaemonServer, ThreadingHTTPServer):
+    pass
+
+
+class _UnixHTTPServer(_DaemonServer, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def serve(deploy_daemon: DeployDaemon, host: str = None, port: int = None, socket_path: str = None):
+    """
+    Serves POST /deploy and GET /status until interrupted, on host:port or on a unix socket.
+    """
+    if socket_path:
+        if op.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, deploy_daemon)
+        _log.info('Listening on unix socket: %s', socket_path)
+    else:
+        server = _HTTPServer((host, port), deploy_daemon)
+        _log.info('Listening on http://%s:%s', *server.server_address[:2])
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        deploy_daemon.close()
+        if socket_path and op.exists(socket_path):
+            os.remove(socket_path)
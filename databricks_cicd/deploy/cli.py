@@ -13,12 +13,21 @@
 # limitations under the License.
 
 import logging
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import click
 import databricks_cicd.utils.helpers as helpers
 from databricks_cicd import CONTEXT_SETTINGS
 from databricks_cicd.conf import Conf
 from databricks_cicd.utils import Context, display_log
+from databricks_cicd.utils.logs import log_stats
 from databricks_cicd.utils.api import API
+from databricks_cicd.utils.metrics import Metrics
+from databricks_cicd.utils.tracing import Tracer, TRACE_FORMATS
+from databricks_cicd.utils.transport import HttpTransport, RecordingTransport, ReplayTransport
+from databricks_cicd.deploy.shard import Shard
+from databricks_cicd.deploy.deployer import Deployer, PREFETCH_WORKERS
+from databricks_cicd.bundle.bundle import Bundle
 
 _log = logging.getLogger(__name__)
 
@@ -33,6 +42,8 @@ _log = logging.getLogger(__name__)
               help='The user who creates all objects.')
 @click.option('--local_path', '-lp', show_default=True, default='.',
               help='Root path of all source files to be deployed.')
+@click.option('--bundle', show_default=True, default=None,
+              help='Path of a bundle, built by cicd bundle, to deploy instead of the files in local_path.')
 @click.option('--target_path', '-tp', required=True,
               help='Target path for workspace and dbfs.')
 @click.option('--name_prefix', '-np', show_default=True, default=None,
@@ -43,8 +54,32 @@ _log = logging.getLogger(__name__)
               help='Pretend run, without modifying the target.')
 @click.option('--verbose', show_default=True, default=False, is_flag=True,
               help='Shows debug messages.')
+@click.option('--report', show_default=True, default=None,
+              help='Path to write a JSON run report with API call and item counters to.')
+@click.option('--prometheus', show_default=True, default=None,
+              help='Path to write the run metrics to, in the Prometheus textfile format.')
+@click.option('--trace', show_default=True, default=None,
+              help='Path to write a timeline of phases, helper operations and API calls to.')
+@click.option('--trace_format', show_default=True, default='chrome', type=click.Choice(TRACE_FORMATS),
+              help='Format of the trace file. chrome opens in Perfetto or chrome://tracing.')
+@click.option('--record', show_default=True, default=None,
+              help='Path to record all API calls to, with tokens and content redacted.')
+@click.option('--replay', show_default=True, default=None,
+              help='Path of a recording to serve all API calls from, instead of the workspace.')
+@click.option('--replay_speed', show_default=True, default=1.0,
+              help='Scale of the recorded latencies while replaying. 0 does not wait at all.')
+@click.option('--shard', show_default=True, default=None,
+              help='i/N, like 2/4. Deploys only the i-th of N parts of the source files, without deleting anything.')
+@click.option('--finalize_shards', show_default=True, default=None, type=int,
+              help='Number of shards. Once all of them succeeded, deletes remote objects that do not exist locally.')
+@click.option('--shard_dir', show_default=True, default=None,
+              help='Folder shared by all shards and the finalize step, where each shard marks its success.')
 def deploy_cli(**kwargs):
     display_log(logging.DEBUG if kwargs['verbose'] else logging.INFO)
+    if (kwargs['shard'] or kwargs['finalize_shards']) and not kwargs['shard_dir']:
+        raise click.UsageError('--shard and --finalize_shards require --shard_dir.')
+    if kwargs['shard'] and kwargs['finalize_shards']:
+        raise click.UsageError('--shard and --finalize_shards cannot be used together.')
 
     conf = Conf({
         'global': {'workspace_host': kwargs['workspace'],
@@ -57,49 +92,58 @@ def deploy_cli(**kwargs):
         },
         kwargs['config_file'])
 
-    api = API(conf, kwargs['token'])
-    context = Context(conf, api)
-    users = helpers.UsersHelper(context)
-    user = users.get_single_item(conf.deploying_user_name)
-    if user:
-        conf.deploying_user_id = user.path
+    metrics = Metrics()
+    tracer = Tracer(enabled=kwargs['trace'] is not None)
+    if kwargs['replay']:
+        transport = ReplayTransport(kwargs['replay'], kwargs['replay_speed'])
     else:
-        service_principals = helpers.ServicePrincipalsHelper(context)
-        service_principal = service_principals.get_single_item(conf.deploying_user_name)
-        conf.deploying_user_id = service_principal.path
-        conf.deploying_service_name = service_principal.content.get('applicationId')
+        transport = HttpTransport()
+    if kwargs['record']:
+        transport = RecordingTransport(transport, kwargs['record'])
+    api = API(conf, kwargs['token'], metrics, tracer, transport)
+    context = Context(conf, api, metrics, tracer)
+    if kwargs['bundle']:
+        try:
+            context.bundle = Bundle(kwargs['bundle'])
+        except (OSError, RuntimeError, zipfile.BadZipFile) as e:
+            raise click.ClickException(f'Cannot open bundle {kwargs["bundle"]}: {e}') from e
 
+    def resolve_identity():
+        with metrics.phase('identity'), tracer.span('phase.identity'):
+            helpers.resolve_identity(context)
 
-    _log.info('''databricks-cicd deploy initialized. Current configuration:
+    try:
+        workspace = helpers.WorkspaceHelper(context)
+        instance_pools = helpers.InstancePoolsHelper(context)
+        clusters = helpers.ClustersHelper(context, instance_pools)
+        jobs = helpers.JobsHelper(context, clusters, workspace)
+        dbfs = helpers.DBFSHelper(context)
+        deployer = Deployer(context, workspace, instance_pools, clusters, jobs, dbfs)
+        with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='cicd-prefetch') as executor:
+            deployer.prefetch(executor, executor.submit(resolve_identity))
+
+            _log.info('''databricks-cicd deploy initialized. Current configuration:
 ---------------------------------------------------------------------------------------------------------
 %s
 ---------------------------------------------------------------------------------------------------------''', conf)
 
-    # conf.dry_run = True
-
-    workspace = helpers.WorkspaceHelper(context)
-    if conf.workspace.deploy:
-        _log.info('Deploying workspace...')
-        workspace.deploy()
-
-    instance_pools = helpers.InstancePoolsHelper(context)
-    if conf.instance_pools.deploy:
-        _log.info('Deploying instance pools...')
-        instance_pools.deploy()
-
-    clusters = helpers.ClustersHelper(context, instance_pools)
-    if conf.clusters.deploy:
-        _log.info('Deploying clusters...')
-        clusters.deploy()
-
-    jobs = helpers.JobsHelper(context, clusters, workspace)
-    if conf.jobs.deploy:
-        _log.info('Deploying jobs...')
-        jobs.deploy()
+            shard = Shard.parse(kwargs['shard']) if kwargs['shard'] else None
+            deployer.deploy(shard, kwargs['finalize_shards'], kwargs['shard_dir'])
+    finally:
+        if context.bundle is not None:
+            context.bundle.close()
 
-    dbfs = helpers.DBFSHelper(context)
-    if conf.dbfs.deploy:
-        _log.info('Deploying dbfs...')
-        dbfs.deploy()
+    memory = context.content.stats()
+    metrics.observe_memory(memory)
+    metrics.observe_logging(log_stats())
+    _log.info('Peak memory: %s MB, content kept: %s MB, content evicted: %s times',
+              round(memory['peak_rss'] / 1024 / 1024, 1) if memory['peak_rss'] is not None else 'unknown',
+              round(memory['content_size'] / 1024 / 1024, 1), memory['content_evicted'])
 
+    if kwargs['report']:
+        metrics.write_report(kwargs['report'])
+    if kwargs['prometheus']:
+        metrics.write_prometheus(kwargs['prometheus'])
+    if kwargs['trace']:
+        tracer.write(kwargs['trace'], kwargs['trace_format'])
     _log.info('All done!')
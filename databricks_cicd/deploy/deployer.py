@@ -0,0 +1,94 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from concurrent.futures import Executor, Future
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context
+from databricks_cicd.deploy.shard import Shard, ShardMarkers, tree_fingerprint
+
+# threads that scan the local items and list the remote items of all kinds, before and while deploying
+PREFETCH_WORKERS = 8
+# listed by path, so they can be listed before the deploying identity is known
+PATH_KINDS = ('workspace', 'dbfs')
+
+_log = logging.getLogger(__name__)
+
+
+class Deployer:
+    """
+    Deploys all kinds in order, as a whole or as one shard, or deletes the orphans of a sharded deploy.
+    The helpers are not scanned or listed again, so their listings can be reused by the next deploy.
+    """
+
+    def __init__(self, context: Context, workspace: helpers.WorkspaceHelper,
+                 instance_pools: helpers.InstancePoolsHelper, clusters: helpers.ClustersHelper,
+                 jobs: helpers.JobsHelper, dbfs: helpers.DBFSHelper):
+        self._c = context
+        self._workspace = workspace
+        self._instance_pools = instance_pools
+        self._clusters = clusters
+        self._jobs = jobs
+        self._dbfs = dbfs
+        self._phases = [('workspace', workspace), ('instance_pools', instance_pools), ('clusters', clusters),
+                        ('jobs', jobs), ('dbfs', dbfs)]
+
+    def prefetch(self, executor: Executor, identity: Future):
+        """
+        Starts scanning the local items of all kinds and listing their remote items in the background, so every phase
+        starts with both at hand. Instance pools, clusters and jobs are filtered by their creator, so they are only
+        listed once the identity lookup has finished. Returns once it has.
+        """
+        conf = self._c.conf
+        kinds = [(name, helper) for name, helper in self._phases if getattr(conf, name).deploy]
+        for _, helper in kinds:
+            helper.prefetch_local(executor)
+        for name, helper in kinds:
+            if name in PATH_KINDS:
+                helper.prefetch_remote(executor)
+        identity.result()
+        for name, helper in kinds:
+            if name not in PATH_KINDS:
+                helper.prefetch_remote(executor)
+
+    def deploy(self, shard: Shard = None, finalize_shards: int = None, shard_dir: str = None):
+        conf = self._c.conf
+        metrics = self._c.metrics
+        tracer = self._c.tracer
+        shard_count = shard.count if shard else finalize_shards
+        if shard_count:
+            markers = ShardMarkers(shard_dir, shard_count,
+                                   tree_fingerprint(self._c, *[helper for _, helper in self._phases]))
+        if shard:
+            shard.split(self._workspace, self._instance_pools, self._clusters, self._jobs, self._dbfs)
+
+        if finalize_shards:
+            shard_writes = sum(m['writes'] for m in markers.check())
+            _log.info('All %s shards succeeded with %s writes. Deleting orphans...', shard_count, shard_writes)
+            # dependent objects first, like jobs before the clusters they run on
+            for name, helper in reversed(self._phases):
+                if getattr(conf, name).deploy:
+                    with metrics.phase(name), tracer.span(f'phase.{name}'):
+                        helper.delete_orphans()
+            markers.clear()
+        else:
+            for name, helper in self._phases:
+                if getattr(conf, name).deploy:
+                    _log.info('Deploying %s...', name.replace('_', ' '))
+                    with metrics.phase(name), tracer.span(f'phase.{name}'):
+                        if shard and name == 'jobs':
+                            shard.wait_for_clusters(self._c, self._clusters)
+                        helper.deploy(delete_orphans=shard is None)
+        if shard:
+            markers.write(shard, self._c.api.writes)
@@ -0,0 +1,215 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import hashlib
+import json
+import os
+import re
+import time
+from os import path as op
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context, ItemStore, ancestors
+
+_log = logging.getLogger(__name__)
+
+
+class _UnionFind:
+    def __init__(self):
+        self._parent = {}
+
+    def find(self, key):
+        self._parent.setdefault(key, key)
+        while self._parent[key] != key:
+            self._parent[key] = self._parent[self._parent[key]]
+            key = self._parent[key]
+        return key
+
+    def union(self, left, right):
+        self._parent[self.find(left)] = self.find(right)
+
+    def groups(self) -> dict:
+        """
+        Smallest key of the group, by key. It is stable for a given set of items and references.
+        """
+        smallest = {}
+        for key in self._parent:
+            root = self.find(key)
+            smallest[root] = min(smallest.get(root, key), key)
+        return {key: smallest[self.find(key)] for key in self._parent}
+
+
+class Shard:
+    """
+    One of `count` parts of a deploy, with 1 <= index <= count.
+    Local items are partitioned by a stable hash of their dependency group, so that a job is deployed by the same shard
+    as its notebooks and a cluster by the same shard as its instance pool. Clusters are shared by many jobs, so jobs
+    are not grouped with them. A shard waits instead until the clusters its jobs reference exist.
+    Directories are deployed by every shard that has an item within them.
+    """
+
+    def __init__(self, index: int, count: int):
+        assert 1 <= index <= count, f'Invalid shard {index}/{count}'
+        self.index = index
+        self.count = count
+        self._clusters_referenced = set()
+
+    @classmethod
+    def parse(cls, value: str) -> 'Shard':
+        m = re.fullmatch(r'(\d+)/(\d+)', value.strip())
+        assert m, f'Invalid shard "{value}". Expected i/N, like 2/4'
+        return cls(int(m.group(1)), int(m.group(2)))
+
+    def __str__(self):
+        return f'{self.index}/{self.count}'
+
+    def _owns(self, group: str) -> bool:
+        return int(hashlib.sha1(group.encode('utf-8')).hexdigest(), 16) % self.count == self.index - 1
+
+    @staticmethod
+    def _references(workspace: helpers.WorkspaceHelper, clusters: helpers.ClustersHelper,
+                    jobs: helpers.JobsHelper) -> tuple:
+        """
+        Returns the union find of all dependency groups and the cluster names referenced by each job.
+        """
+        union_find = _UnionFind()
+        cluster_names = {}
+        for name, local_item in clusters.local_items.items():
+            union_find.find(f'clusters:{name}')
+            pool_name = clusters.local_source.load_json(local_item.path).get('instance_pool_name')
+            if pool_name:
+                union_find.union(f'clusters:{name}', f'instance_pools:{pool_name}')
+        for name, local_item in jobs.local_items.items():
+            union_find.find(f'jobs:{name}')
+            spec = jobs.local_source.load_json(local_item.path)
+            cluster_names[name] = set()
+            for task in [spec] + spec.get('tasks', []):
+                notebook_path = task.get('notebook_task', {}).get('notebook_path')
+                if notebook_path in workspace.local_items:
+                    union_find.union(f'jobs:{name}', f'workspace:{notebook_path}')
+                if task.get('existing_cluster_name'):
+                    cluster_names[name].add(task['existing_cluster_name'])
+        return union_find, cluster_names
+
+    def _split_tree(self, helper: helpers.DeployHelperBase, kind: str, groups: dict):
+        """
+        Keeps the files of this shard and their directories. Directories without files are hashed by themselves.
+        """
+        local_items = helper.local_items
+        owned = ItemStore()
+        used_dirs = set()
+        for name, item in local_items.items():
+            if not item.is_dir:
+                used_dirs.update(ancestors(name))
+                key = f'{kind}:{name}'
+                if self._owns(groups.get(key, key)):
+                    owned[name] = item
+                    owned.update({d: local_items[d] for d in ancestors(name) if d in local_items})
+        for name, item in local_items.items():
+            if item.is_dir and name not in used_dirs and self._owns(f'{kind}:{name}'):
+                owned[name] = item
+        helper.local_items = owned
+
+    def _split_specs(self, helper: helpers.DeployHelperBase, kind: str, groups: dict):
+        helper.local_items = ItemStore({name: item for name, item in helper.local_items.items()
+                                        if self._owns(groups.get(f'{kind}:{name}', f'{kind}:{name}'))})
+
+    def split(self, workspace: helpers.WorkspaceHelper, instance_pools: helpers.InstancePoolsHelper,
+              clusters: helpers.ClustersHelper, jobs: helpers.JobsHelper, dbfs: helpers.DBFSHelper):
+        """
+        Reduces the local items of all helpers to the items of this shard.
+        """
+        union_find, cluster_names = self._references(workspace, clusters, jobs)
+        groups = union_find.groups()
+        self._split_tree(workspace, 'workspace', groups)
+        self._split_specs(instance_pools, 'instance_pools', groups)
+        self._split_specs(clusters, 'clusters', groups)
+        self._split_specs(jobs, 'jobs', groups)
+        self._split_tree(dbfs, 'dbfs', groups)
+        self._clusters_referenced = set().union(*[cluster_names[name] for name in jobs.local_items])
+        _log.info('Shard %s: %s workspace objects, %s instance pools, %s clusters, %s jobs, %s dbfs objects', self,
+                  len(workspace.local_items), len(instance_pools.local_items), len(clusters.local_items),
+                  len(jobs.local_items), len(dbfs.local_items))
+
+    def wait_for_clusters(self, context: Context, clusters: helpers.ClustersHelper):
+        """
+        Waits until all clusters referenced by the jobs of this shard exist. Other shards may still be creating them.
+        """
+        conf = context.conf.shard
+        deadline = time.monotonic() + conf.wait_timeout
+        while True:
+            missing = sorted(n for n in self._clusters_referenced if n not in clusters.remote_items)
+            if not missing:
+                return
+            assert time.monotonic() < deadline, \
+                f'Clusters {", ".join(missing)} were not created by any shard within {conf.wait_timeout}s'
+            _log.info('Shard %s waits for other shards to create the clusters: %s', self, ', '.join(missing))
+            time.sleep(conf.poll_interval)
+            clusters.remote_items = None
+
+
+def tree_fingerprint(context: Context, *deploy_helpers: helpers.DeployHelperBase) -> str:
+    """
+    Hash of the target and all local item names, before the split, so markers of a different deploy do not match.
+    """
+    conf = context.conf
+    h = hashlib.sha1(f'{conf.workspace_host}|{conf.name_prefix}|{conf.workspace.target_path}'.encode('utf-8'))
+    for helper in deploy_helpers:
+        for name in helper.local_items.sorted_keys():
+            h.update(f'{helper.__class__.__name__}:{name}\n'.encode('utf-8'))
+    return h.hexdigest()
+
+
+class ShardMarkers:
+    """
+    Success markers of all shards of a deploy, in a directory shared by all runners.
+    """
+
+    def __init__(self, directory: str, count: int, fingerprint: str):
+        self._directory = directory
+        self._count = count
+        self._fingerprint = fingerprint
+
+    def _path(self, index: int) -> str:
+        return op.join(self._directory, f'shard_{index}_of_{self._count}.json')
+
+    def write(self, shard: Shard, writes: int):
+        os.makedirs(self._directory, exist_ok=True)
+        with open(self._path(shard.index), 'w', encoding='utf-8') as f:
+            json.dump({'shard': shard.index, 'count': shard.count, 'fingerprint': self._fingerprint,
+                       'writes': writes, 'finished_at': time.time()}, f)
+        _log.info('Shard %s marked as successful in: %s', shard, self._path(shard.index))
+
+    def check(self) -> list:
+        """
+        Returns the markers of all shards. Fails if any shard did not succeed on the same source tree.
+        """
+        markers = []
+        for index in range(1, self._count + 1):
+            path = self._path(index)
+            assert op.isfile(path), f'Shard {index}/{self._count} has not succeeded. No marker in: {path}'
+            with open(path, 'r', encoding='utf-8') as f:
+                marker = json.load(f)
+            assert marker.get('fingerprint') == self._fingerprint, \
+                f'Shard {index}/{self._count} succeeded on a different source tree or target: {path}'
+            markers.append(marker)
+        return markers
+
+    def clear(self):
+        """
+        Removes all markers, so they cannot be mistaken for the markers of the next deploy.
+        """
+        for index in range(1, self._count + 1):
+            if op.isfile(self._path(index)):
+                os.remove(self._path(index))
@@ -0,0 +1,90 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import click
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd import CONTEXT_SETTINGS
+from databricks_cicd.conf import Conf
+from databricks_cicd.utils import Context, display_log
+from databricks_cicd.utils.api import API
+from databricks_cicd.drift.detector import DriftDetector
+
+_log = logging.getLogger(__name__)
+
+
+class DriftFound(click.ClickException):
+    # distinct from 1, which any other failure exits with
+    exit_code = 3
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               short_help='Reports differences between the workspace and the local source files, without deploying.')
+@click.option('--token', '-t', required=True,
+              help='Access token, used to connect to Databricks workspace.')
+@click.option('--workspace', '-w', required=True,
+              help='Databricks workspace host to connect to.')
+@click.option('--user', '-u', required=True,
+              help='The user who creates all objects.')
+@click.option('--local_path', '-lp', show_default=True, default='.',
+              help='Root path of all source files.')
+@click.option('--target_path', '-tp', required=True,
+              help='Target path for workspace and dbfs.')
+@click.option('--name_prefix', '-np', show_default=True, default=None,
+              help='Prefix for object names, like jobs, clusters, etc.')
+@click.option('--config_file', '-c', show_default=True, default=None,
+              help='Path to the config file.')
+@click.option('--report', show_default=True, default=None,
+              help='Path to write the JSON drift report to.')
+@click.option('--state_file', show_default=True, default=None,
+              help='Path of the drift state. Defaults to state_file in [drift].')
+@click.option('--verbose', show_default=True, default=False, is_flag=True,
+              help='Shows debug messages.')
+def drift_cli(**kwargs):
+    display_log(logging.DEBUG if kwargs['verbose'] else logging.INFO)
+
+    conf = Conf({
+        'global': {'workspace_host': kwargs['workspace'],
+                   'local_path': kwargs['local_path'],
+                   'name_prefix': kwargs['name_prefix'] if kwargs['name_prefix'] else '',
+                   'deploying_user_name': kwargs['user'],
+                   # read only: any write would be skipped
+                   'dry_run': 'True'},
+        'workspace': {'target_path': kwargs['target_path']},
+        'dbfs': {'target_path': kwargs['target_path']},
+        'drift': {'state_file': kwargs['state_file']} if kwargs['state_file'] is not None else {},
+        },
+        kwargs['config_file'])
+
+    context = Context(conf)
+    context.api = API(conf, kwargs['token'], context.metrics, context.tracer)
+    helpers.resolve_identity(context)
+
+    workspace = helpers.WorkspaceHelper(context)
+    instance_pools = helpers.InstancePoolsHelper(context)
+    clusters = helpers.ClustersHelper(context, instance_pools)
+    jobs = helpers.JobsHelper(context, clusters, workspace)
+    dbfs = helpers.DBFSHelper(context)
+    detector = DriftDetector(context, workspace, instance_pools, clusters, jobs, dbfs)
+    drift = detector.detect()
+
+    for d in drift:
+        _log.warning('Drift in %s: %s is %s%s', d['kind'], d['path'], d['change'],
+                     f'. {d["reason"]}' if d.get('reason') else '')
+    if kwargs['report']:
+        detector.write_report(kwargs['report'])
+    _log.info('Checked with %s API calls, %s notebooks exported.', detector.report()['api_calls'], detector.exported)
+    if drift:
+        raise DriftFound(f'Found {len(drift)} difference(s) between the workspace and the local source files.')
+    _log.info('No drift found.')
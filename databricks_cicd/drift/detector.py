@@ -0,0 +1,143 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import json
+import os
+import time
+from os import path as op
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd import __version__
+from databricks_cicd.utils import Context, Item, merge_join
+
+STATE_VERSION = 1
+# missing: only in the local tree, changed: differs, unmanaged: only in the workspace, within the deployed scope
+DRIFT_CHANGES = ('missing', 'changed', 'unmanaged')
+
+_log = logging.getLogger(__name__)
+
+
+class DriftDetector:
+    """
+    Compares the workspace with the local tree, without changing either, using the cheapest signal per kind:
+    - instance pools, clusters and jobs are compared on the specs returned by their single listing
+    - DBFS files are compared by size, as in deploy
+    - notebooks are compared by content hash. The remote hash is kept in a state file with the size and
+      modification time of the notebook, so only notebooks modified since the last check are exported.
+    """
+
+    def __init__(self, context: Context, workspace: helpers.WorkspaceHelper,
+                 instance_pools: helpers.InstancePoolsHelper, clusters: helpers.ClustersHelper,
+                 jobs: helpers.JobsHelper, dbfs: helpers.DBFSHelper):
+        self._c = context
+        self._workspace = workspace
+        self._helpers = [('workspace', workspace), ('instance_pools', instance_pools), ('clusters', clusters),
+                         ('jobs', jobs), ('dbfs', dbfs)]
+        conf = context.conf
+        # outside of local_path by default, so it does not end up in the source tree
+        self._state_file = op.abspath(op.expanduser(conf.drift.state_file)) if conf.drift.state_file else None
+        self._state_key = f'{conf.workspace_host}{workspace.remote_path("")}'
+        self._state = {}
+        self.exported = 0
+        self.drift = []
+
+    def _load_state(self) -> dict:
+        if self._state_file and op.isfile(self._state_file):
+            try:
+                with open(self._state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('version') == STATE_VERSION:
+                    return state
+            except (OSError, ValueError):
+                _log.warning('Ignoring invalid drift state: %s', self._state_file)
+        return {'version': STATE_VERSION, 'workspaces': {}}
+
+    def _save_state(self, state: dict):
+        if self._state_file:
+            try:
+                os.makedirs(op.dirname(self._state_file), exist_ok=True)
+                with open(self._state_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+            except OSError as e:
+                _log.warning('Cannot write the drift state %s: %s', self._state_file, e)
+
+    def _remote_hash(self, remote_item: Item) -> str:
+        known = self._state.get(remote_item.path)
+        if known and remote_item.modified_at is not None \
+                and [known['size'], known['modified_at']] == [remote_item.size, remote_item.modified_at]:
+            return known['hash']
+        self.exported += 1
+        remote_hash = self._workspace.remote_hash(remote_item)
+        self._state[remote_item.path] = {'size': remote_item.size, 'modified_at': remote_item.modified_at,
+                                         'hash': remote_hash}
+        return remote_hash
+
+    def _is_different(self, kind: str, helper: helpers.DeployHelperBase, local_item: Item, remote_item: Item):
+        if local_item.is_dir or remote_item.is_dir:
+            return local_item.is_dir != remote_item.is_dir
+        if kind == 'workspace':
+            return helper.local_hash(local_item) != self._remote_hash(remote_item)
+        return helper.is_different(local_item, remote_item)
+
+    def detect(self) -> list:
+        """
+        Returns the drift as a list of dicts with kind, name, remote path and change. A spec that references an
+        object missing in the workspace is changed, with the missing reference as its reason.
+        """
+        state = self._load_state()
+        self._state = state['workspaces'].get(self._state_key, {})
+        seen = set()
+        for kind, helper in self._helpers:
+            if not getattr(self._c.conf, kind).deploy:
+                continue
+            for name, local_item, remote_item in merge_join(helper.local_items, helper.remote_items):
+                if remote_item is not None and kind == 'workspace':
+                    seen.add(remote_item.path)
+                reason = None
+                if remote_item is None:
+                    change = 'missing'
+                elif local_item is None:
+                    change = 'unmanaged'
+                else:
+                    try:
+                        if not self._is_different(kind, helper, local_item, remote_item):
+                            continue
+                    except AssertionError as e:
+                        # the local spec references a notebook, cluster or instance pool missing in the workspace
+                        local_item.content = None
+                        reason = str(e)
+                    change = 'changed'
+                entry = {'kind': kind, 'name': name, 'path': helper.remote_path(name), 'change': change}
+                if reason:
+                    entry['reason'] = reason
+                self.drift.append(entry)
+        state['workspaces'][self._state_key] = {k: v for k, v in self._state.items() if k in seen}
+        self._save_state(state)
+        return self.drift
+
+    def report(self) -> dict:
+        return {
+            'version': __version__,
+            'checked_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'workspace_host': self._c.conf.workspace_host,
+            'drift': self.drift,
+            'counts': {c: sum(1 for d in self.drift if d['change'] == c) for c in DRIFT_CHANGES},
+            'exported_notebooks': self.exported,
+            'api_calls': sum(e.calls for e in self._c.metrics.endpoints.values()),
+        }
+
+    def write_report(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        _log.info('Drift report written to: %s', path)
@@ -0,0 +1,136 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import hashlib
+import json
+import os
+from os import path as op
+from concurrent.futures import ThreadPoolExecutor
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context, Item, Comparator, content_hash
+from databricks_cicd.utils.api import NOTEBOOK_LANGUAGES
+from databricks_cicd.utils.local import Local
+
+TMP_SUFFIX = '.cicd_tmp'
+
+_log = logging.getLogger(__name__)
+
+
+def _sha1(chunks) -> str:
+    h = hashlib.sha1()
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+class Puller:
+    """
+    Writes remote objects into the local source layout, the reverse of a deploy.
+    Notebooks and DBFS files are downloaded in a worker pool and streamed to disk. Local files that already match
+    the remote are left untouched. Local files without a remote counterpart are not deleted.
+    """
+
+    def __init__(self, context: Context, workspace: helpers.WorkspaceHelper,
+                 instance_pools: helpers.InstancePoolsHelper, clusters: helpers.ClustersHelper,
+                 jobs: helpers.JobsHelper, dbfs: helpers.DBFSHelper):
+        self._c = context
+        self._workspace = workspace
+        self._instance_pools = instance_pools
+        self._clusters = clusters
+        self._jobs = jobs
+        self._dbfs = dbfs
+        self._comparator = Comparator()
+
+    def _local_path(self, sub_dir: str, name: str, extension: str = '') -> str:
+        return op.join(self._c.conf.local_path, sub_dir, *name.split('/')) + extension
+
+    def _count(self, kind: str, path: str, action: str):
+        if action != 'unchanged':
+            _log.info('Pulled %s: %s', kind, path)
+        self._c.metrics.count(f'pull.{kind}', action)
+
+    @staticmethod
+    def _stream(path: str, chunks, digest) -> str:
+        """
+        Writes the chunks to path, unless the file there already has the same digest.
+        Returns the action taken: created, updated or unchanged.
+        """
+        exists = op.isfile(path)
+        os.makedirs(op.dirname(path), exist_ok=True)
+        with open(path + TMP_SUFFIX, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        if exists and digest(Local.read_chunks(path)) == digest(Local.read_chunks(path + TMP_SUFFIX)):
+            os.remove(path + TMP_SUFFIX)
+            return 'unchanged'
+        os.replace(path + TMP_SUFFIX, path)
+        return 'updated' if exists else 'created'
+
+    def _write_json(self, path: str, spec: dict) -> str:
+        exists = op.isfile(path)
+        if exists and not self._comparator.is_different(Local.load_json(path), spec):
+            return 'unchanged'
+        os.makedirs(op.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(spec, f, indent=2)
+            f.write('\n')
+        return 'updated' if exists else 'created'
+
+    def _pull_notebook(self, name: str, remote_item: Item):
+        path = self._local_path(self._c.conf.workspace.local_sub_dir, name, NOTEBOOK_LANGUAGES[remote_item.language])
+        self._count('workspace', path, self._stream(path, self._workspace.export_chunks(remote_item), content_hash))
+
+    def _pull_dbfs_file(self, name: str, remote_item: Item):
+        path = self._local_path(self._c.conf.dbfs.local_sub_dir, name)
+        if op.isfile(path) and op.getsize(path) == remote_item.size:
+            self._count('dbfs', path, 'unchanged')
+        else:
+            self._count('dbfs', path, self._stream(path, self._dbfs.read_chunks(remote_item), _sha1))
+
+    def _pull_specs(self, kind: str, helper: helpers.DeployHelperBase, sub_dir: str):
+        for name, remote_item in helper.remote_items.items():
+            path = self._local_path(sub_dir, name, '.json')
+            self._count(kind, path, self._write_json(path, helper.to_local(remote_item)))
+
+    def _downloads(self) -> list:
+        downloads = []
+        conf = self._c.conf
+        if conf.workspace.deploy:
+            for name, remote_item in self._workspace.remote_items.items():
+                if remote_item.is_dir:
+                    os.makedirs(self._local_path(conf.workspace.local_sub_dir, name), exist_ok=True)
+                elif remote_item.kind == 'notebook':
+                    downloads.append((self._pull_notebook, name, remote_item))
+        if conf.dbfs.deploy:
+            for name, remote_item in self._dbfs.remote_items.items():
+                if remote_item.is_dir:
+                    os.makedirs(self._local_path(conf.dbfs.local_sub_dir, name), exist_ok=True)
+                else:
+                    downloads.append((self._pull_dbfs_file, name, remote_item))
+        return downloads
+
+    def pull(self):
+        conf = self._c.conf
+        downloads = self._downloads()
+        _log.info('Downloading %s notebooks and files with %s workers...', len(downloads), conf.pull.workers)
+        with ThreadPoolExecutor(max_workers=conf.pull.workers) as executor:
+            for future in [executor.submit(*d) for d in downloads]:
+                future.result()
+        if conf.instance_pools.deploy:
+            self._pull_specs('instance_pools', self._instance_pools, conf.instance_pools.local_sub_dir)
+        if conf.clusters.deploy:
+            self._pull_specs('clusters', self._clusters, conf.clusters.local_sub_dir)
+        if conf.jobs.deploy:
+            self._pull_specs('jobs', self._jobs, conf.jobs.local_sub_dir)
@@ -0,0 +1,77 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import click
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd import CONTEXT_SETTINGS
+from databricks_cicd.conf import Conf
+from databricks_cicd.utils import Context, display_log
+from databricks_cicd.utils.api import API
+from databricks_cicd.smoke.runner import SmokeRunner
+
+_log = logging.getLogger(__name__)
+
+
+@click.command(context_settings=CONTEXT_SETTINGS,
+               short_help='Runs the smoke jobs on the target Databricks workspace and waits for them to finish.')
+@click.option('--token', '-t', required=True,
+              help='Access token, used to connect to Databricks workspace.')
+@click.option('--workspace', '-w', required=True,
+              help='Databricks workspace host to connect to.')
+@click.option('--user', '-u', required=True,
+              help='The user who created the jobs.')
+@click.option('--name_prefix', '-np', show_default=True, default=None,
+              help='Prefix for object names, like jobs, clusters, etc.')
+@click.option('--config_file', '-c', show_default=True, default=None,
+              help='Path to the config file.')
+@click.option('--job', '-j', 'job_names', multiple=True,
+              help='Job to run, by its name without name_prefix. Can be repeated. Defaults to the jobs in [smoke].')
+@click.option('--fail_fast/--no_fail_fast', default=None,
+              help='Cancel all other runs on the first failure. Defaults to fail_fast in [smoke].')
+@click.option('--dry_run', '-dry', show_default=True, default=False, is_flag=True,
+              help='Pretend run, without starting any job.')
+@click.option('--verbose', show_default=True, default=False, is_flag=True,
+              help='Shows debug messages.')
+def smoke_cli(**kwargs):
+    display_log(logging.DEBUG if kwargs['verbose'] else logging.INFO)
+
+    cmd_args = {
+        'global': {'workspace_host': kwargs['workspace'],
+                   'name_prefix': kwargs['name_prefix'] if kwargs['name_prefix'] else '',
+                   'deploying_user_name': kwargs['user'],
+                   'dry_run': str(kwargs['dry_run'])},
+        'smoke': {},
+        }
+    if kwargs['job_names']:
+        cmd_args['smoke']['jobs'] = '\n'.join(kwargs['job_names'])
+    if kwargs['fail_fast'] is not None:
+        cmd_args['smoke']['fail_fast'] = str(kwargs['fail_fast'])
+    conf = Conf(cmd_args, kwargs['config_file'])
+    if not conf.smoke.jobs:
+        raise click.ClickException('No smoke jobs given. Pass --job or set jobs in the [smoke] config section.')
+
+    context = Context(conf)
+    context.api = API(conf, kwargs['token'], context.metrics, context.tracer)
+    helpers.resolve_identity(context)
+
+    runner = SmokeRunner(context, helpers.JobsHelper(context, None, None), conf.smoke.jobs)
+    try:
+        runner.start()
+        failed = runner.wait()
+    finally:
+        runner.cancel_pending()
+    if failed:
+        raise click.ClickException(f'{len(failed)} of {len(runner.runs)} smoke run(s) did not succeed.')
+    _log.info('All done!')
@@ -0,0 +1,137 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import heapq
+import time
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context, codec
+from databricks_cicd.utils.api import Endpoints, RateLimiter
+
+TERMINAL_STATES = ['TERMINATED', 'SKIPPED', 'INTERNAL_ERROR']
+
+_log = logging.getLogger(__name__)
+
+
+class SmokeRun:
+    def __init__(self, name: str, job_id: int, run_id: int = None):
+        self.name = name
+        self.job_id = job_id
+        self.run_id = run_id
+        self.life_cycle_state = None
+        self.result_state = None
+        self.state_message = ''
+        self.run_page_url = None
+        self.cancelled = False
+
+    @property
+    def done(self) -> bool:
+        return self.life_cycle_state in TERMINAL_STATES
+
+    @property
+    def succeeded(self) -> bool:
+        return self.done and self.result_state == 'SUCCESS'
+
+    @property
+    def state(self) -> str:
+        return '/'.join(s for s in [self.life_cycle_state, self.result_state] if s)
+
+
+class SmokeRunner:
+    """
+    Starts the smoke jobs and waits for all their runs in a single scheduler. Every run is polled on its own interval,
+    which backs off while its state does not change, and all polls share one rate limit.
+    """
+
+    def __init__(self, context: Context, jobs: helpers.JobsHelper, names: list):
+        self._c = context
+        self._conf = context.conf.smoke
+        self._jobs = jobs
+        self._names = names
+        self._limiter = RateLimiter(self._conf.calls_per_second)
+        self.runs = []
+
+    def start(self):
+        missing = [self._jobs.remote_path(name) for name in self._names if name not in self._jobs.remote_items]
+        assert not missing, f'Smoke jobs not found: {", ".join(missing)}'
+        for name in self._names:
+            job_id = self._jobs.remote_items[name].path
+            response = self._c.api.call(Endpoints.jobs_run_now, body={'job_id': job_id})
+            if response is None:
+                continue  # dry run
+            run = SmokeRun(name, job_id, codec.loads(response.content)['run_id'])
+            _log.info('Started smoke job %s, run %s', self._jobs.remote_path(name), run.run_id)
+            self.runs.append(run)
+
+    def _poll(self, run: SmokeRun) -> bool:
+        """
+        Refreshes the state of the run. Returns True if it changed.
+        """
+        self._limiter.acquire()
+        response = codec.loads(self._c.api.call(Endpoints.jobs_runs_get, body={'run_id': run.run_id}).content)
+        state = response.get('state', {})
+        previous = run.state
+        run.life_cycle_state = state.get('life_cycle_state')
+        run.result_state = state.get('result_state')
+        run.state_message = state.get('state_message', '')
+        run.run_page_url = response.get('run_page_url')
+        if run.state != previous:
+            _log.info('Smoke job %s, run %s: %s %s', self._jobs.remote_path(run.name), run.run_id, run.state,
+                      run.state_message)
+            return True
+        return False
+
+    def _cancel(self, runs: list):
+        for run in runs:
+            _log.warning('Cancelling smoke job %s, run %s', self._jobs.remote_path(run.name), run.run_id)
+            self._c.api.call(Endpoints.jobs_runs_cancel, body={'run_id': run.run_id})
+            run.cancelled = True
+
+    def cancel_pending(self):
+        """
+        Cancels the runs that are neither finished nor cancelled, so an aborted smoke test leaves no runs behind.
+        """
+        self._cancel([run for run in self.runs if not run.done and not run.cancelled])
+
+    def wait(self) -> list:
+        """
+        Polls all runs until they are finished. Returns the runs that did not succeed.
+        """
+        deadline = time.monotonic() + self._conf.timeout if self._conf.timeout else None
+        queue = [(time.monotonic(), i, run, self._conf.poll_interval) for i, run in enumerate(self.runs)]
+        failed = []
+        while queue:
+            due, i, run, interval = heapq.heappop(queue)
+            now = time.monotonic()
+            if deadline is not None and max(now, due) > deadline:
+                pending = [run] + [q[2] for q in queue]
+                _log.error('Timed out after %ss, waiting for %s smoke runs', self._conf.timeout, len(pending))
+                self._cancel(pending)
+                return failed + pending
+            if due > now:
+                time.sleep(due - now)
+            changed = self._poll(run)
+            if run.done:
+                if not run.succeeded:
+                    _log.error('Smoke job %s, run %s did not succeed: %s %s', self._jobs.remote_path(run.name),
+                               run.run_id, run.state, run.run_page_url or '')
+                    failed.append(run)
+                    if self._conf.fail_fast:
+                        self._cancel([q[2] for q in queue])
+                        return failed
+                continue
+            interval = self._conf.poll_interval if changed \
+                else min(interval * self._conf.backoff, self._conf.max_poll_interval)
+            heapq.heappush(queue, (time.monotonic() + interval, i, run, interval))
+        return failed
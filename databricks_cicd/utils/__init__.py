@@ -13,11 +13,17 @@
 # limitations under the License.
 
 import logging
-import sys
+from typing import TYPE_CHECKING
 from databricks_cicd.conf import Conf
-from databricks_cicd.utils.api import API
+from databricks_cicd.utils.compare import Comparator, DICT_SORT_KEYS, first_match, content_hash, b64decode_chunks
+from databricks_cicd.utils.metrics import Metrics
+from databricks_cicd.utils.content import ContentStore
+from databricks_cicd.utils.tracing import Tracer
+from databricks_cicd.utils.logs import display_log
+
+if TYPE_CHECKING:
+    from databricks_cicd.utils.api import API
 
-DICT_SORT_KEYS = ['task_key']
 _log = logging.getLogger(__name__)
 
 
@@ -25,93 +31,117 @@ class Item:
     """
     Used as a descriptor of a deployable item to the remote (local or remote).
     It is used for any object type (Job, Directory, Notebook, File, Cluster, etc.).
+    Slotted, as there is one instance per object and large DBFS trees have hundreds of thousands of them.
     """
+    __slots__ = ('is_dir', 'kind', 'path', 'language', 'size', 'content', 'hash', 'modified_at')
 
-    def __init__(self, path: str, kind: str, is_dir=False, size: int = None, language: str = None, content=None):
+    def __init__(self, path: str, kind: str, is_dir=False, size: int = None, language: str = None, content=None,
+                 hash_: str = None, modified_at: int = None):
         self.is_dir = is_dir
         self.kind = kind
         self.path = path
         self.language = language
         self.size = size
         self.content = content
+        self.hash = hash_
+        self.modified_at = modified_at
 
 
-class Context:
-    def __init__(self, config: Conf, _api: API = None):
-        self.api = _api
-        self.conf = config
+class ItemStore(dict):
+    """
+    Items by their common path, with a sorted index of the paths that is built on first use
+    and dropped whenever a path is added or removed.
+    """
+    __slots__ = ('_sorted_keys',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sorted_keys = None
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self._sorted_keys = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._sorted_keys = None
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self._sorted_keys = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self._sorted_keys = None
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._sorted_keys = None
+        return super().setdefault(key, default)
 
+    def update(self, *args, **kwargs):
+        self._sorted_keys = None
+        super().update(*args, **kwargs)
 
-def first_match(big_list: list, small_list: list) -> str:
-    for item in small_list:
-        if item in big_list:
-            return item
-    return ''
+    def __ior__(self, other):
+        self.update(other)
+        return self
 
+    def clear(self):
+        self._sorted_keys = None
+        super().clear()
 
-def sort_list(source: list) -> list:
+    def sorted_keys(self) -> list:
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self)
+        return self._sorted_keys
+
+
+def ancestors(path: str) -> list:
+    """
+    Parent paths of a common path, outermost first: a/b/c -> [a, a/b]
+    """
+    parts = path.split('/')
+    return ['/'.join(parts[:i]) for i in range(1, len(parts))]
+
+
+def merge_join(left: dict, right: dict):
     """
-    Attempts to sort a list.
-    If it is a list of dict, it will sort based on a key found within DICT_SORT_KEYS.
-    If the first dict in the list does not contain a key within DICT_SORT_KEYS, it will not attempt sort,
-    but just return the same list.
+    Walks both mappings in a single pass, in path order, and yields (path, left item, right item).
+    The item missing on either side is None. Parent paths always come before their children.
     """
-    if len(source):
-        if isinstance(source[0], dict):
-            key = first_match(source[0].keys(), DICT_SORT_KEYS)
-            if key:
-                return sorted(source, key=lambda d: d[key])
+    left_keys = left.sorted_keys() if isinstance(left, ItemStore) else sorted(left)
+    right_keys = right.sorted_keys() if isinstance(right, ItemStore) else sorted(right)
+    i, j = 0, 0
+    while i < len(left_keys) or j < len(right_keys):
+        if j == len(right_keys) or (i < len(left_keys) and left_keys[i] < right_keys[j]):
+            yield left_keys[i], left[left_keys[i]], None
+            i += 1
+        elif i == len(left_keys) or right_keys[j] < left_keys[i]:
+            yield right_keys[j], None, right[right_keys[j]]
+            j += 1
         else:
-            return sorted(source)
-    return source
+            yield left_keys[i], left[left_keys[i]], right[right_keys[j]]
+            i += 1
+            j += 1
+
+
+class Context:
+    def __init__(self, config: Conf, _api: 'API' = None, metrics: Metrics = None, tracer: Tracer = None):
+        self.api = _api
+        self.conf = config
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.content = ContentStore(config.content_budget)
+        # a Bundle to deploy from, instead of the local files
+        self.bundle = None
 
 
-def is_different(left, right, ignore_keys=None, current_path='$'):
+def is_different(left, right, ignore_keys=None) -> bool:
     """
     Compares two dictionaries, disregarding order on keys and lists.
     Also missing attribute will be treated the same as empty dict or list.
-    This is used to compare local with remote objects where the order of the attributes does not matter.
-    :param left: compare left with right
-    :param right: compare left with right
-    :param ignore_keys: list. Ignores dict keys, while comparing
-    :param current_path: string. Used to display debug message.
-    :return:
+    Helpers that compare many objects of one kind should build a single Comparator instead.
     """
-    if left in (None, [], {}) and right in (None, [], {}):
-        return False
-    if left is None or right is None:
-        _log.debug('In %s, %s is diff from %s', current_path, left, right)
-        return True
-    if isinstance(left, dict) and isinstance(right, dict):
-        if ignore_keys is None:
-            ignore_keys = []
-        for key in (set(left) | set(right)) - set(ignore_keys):
-            if is_different(left.get(key), right.get(key), current_path='.'.join([current_path, key])):
-                _log.debug('In %s, %s is diff from %s', current_path, left.get(key), right.get(key))
-                return True
-        return False
-    if isinstance(left, list) and isinstance(right, list):
-        if len(left) != len(right):
-            return True
-        sorted_right = sort_list(right)
-        for i, value in enumerate(sort_list(left)):
-            if is_different(value, sorted_right[i], current_path=current_path):
-                _log.debug('In %s, %s is diff from %s', current_path, value, sorted_right[i])
-                return True
-        return False
-    if left == right:
-        return False
-    if not isinstance(left, type(right)) \
-            and isinstance(left, (float, int)) \
-            and isinstance(right, (float, int)) \
-            and float(left) == float(right):
-        return False
-    return True
-
-
-def display_log(level):
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
-    for name in ['databricks_cicd', '__main__']:
-        logging.getLogger(name).setLevel(level)
-        logging.getLogger(name).addHandler(stream_handler)
+    return Comparator(ignore_keys).is_different(left, right)
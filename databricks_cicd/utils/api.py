@@ -13,22 +13,31 @@
 # limitations under the License.
 
 import logging
-import json
+import threading
 import time
-import requests
 from databricks_cicd.conf import Conf
+from databricks_cicd.utils import codec
+from databricks_cicd.utils.metrics import Metrics
+from databricks_cicd.utils.tracing import Tracer
+from databricks_cicd.utils.transport import HttpTransport, StreamBody
 
 NOTEBOOK_LANGUAGES = {'': '', 'PYTHON': '.py', 'SCALA': '.scala', 'SQL': '.sql', 'R': '.r'}
 NOTEBOOK_EXTENSIONS = {v: k for k, v in NOTEBOOK_LANGUAGES.items()}
 
+JSON_CONTENT_TYPE = 'application/json'
+# attributes of a call body, that are left out of logs
+CONTENT_ATTRIBUTES = frozenset(['content', 'contents', 'data'])
+
 _log = logging.getLogger(__name__)
 
 
 class Endpoint:
-    def __init__(self, method: str, url: str, is_write: bool):
+    def __init__(self, method: str, url: str, is_write: bool, is_deploy: bool = None):
         self.method = method
         self.url = url
         self.is_write = is_write
+        # Writes that change deployed objects. Only they count towards the deploy safety limit.
+        self.is_deploy = is_write if is_deploy is None else is_deploy
 
 
 class Endpoints:
@@ -41,7 +50,11 @@ class Endpoints:
     jobs_list = Endpoint('get', '2.1/jobs/list', False)
     jobs_create = Endpoint('post', '2.1/jobs/create', True)
     jobs_reset = Endpoint('post', '2.1/jobs/reset', True)
+    jobs_update = Endpoint('post', '2.1/jobs/update', True)
     jobs_delete = Endpoint('post', '2.1/jobs/delete', True)
+    jobs_run_now = Endpoint('post', '2.1/jobs/run-now', True, is_deploy=False)
+    jobs_runs_get = Endpoint('get', '2.1/jobs/runs/get', False)
+    jobs_runs_cancel = Endpoint('post', '2.1/jobs/runs/cancel', True, is_deploy=False)
 
     instance_pools_list = Endpoint('get', '2.0/instance-pools/list', False)
     instance_pools_create = Endpoint('post', '2.0/instance-pools/create', True)
@@ -61,43 +74,118 @@ class Endpoints:
     dbfs_create = Endpoint('post', '2.0/dbfs/create', False)  # False - to prevent triggering safety limit
     dbfs_close = Endpoint('post', '2.0/dbfs/close', True)
     dbfs_add_block = Endpoint('post', '2.0/dbfs/add-block', False)  # False - to prevent triggering safety limit
+    fs_files = Endpoint('put', '2.0/fs/files', True)
 
     users_list = Endpoint('get', '2.0/preview/scim/v2/Users', False)
     service_principals_list = Endpoint('get', '2.0/preview/scim/v2/ServicePrincipals', False)
 
 
+class _WithoutContent:
+    """
+    Body of a call without its content, for logs. It is only built when a record is emitted.
+    """
+    __slots__ = ('_body',)
+
+    def __init__(self, body):
+        self._body = body
+
+    def __str__(self):
+        if isinstance(self._body, str):
+            return f'<{len(self._body)} characters>'
+        if not isinstance(self._body, dict):
+            return str(self._body)
+        return str({a: v for a, v in self._body.items() if a not in CONTENT_ATTRIBUTES})
+
+
+class RateLimiter:
+    """
+    Token bucket, shared by all callers of acquire. Allows bursts of up to `burst` calls, then `rate` calls per second.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        assert rate > 0, 'The rate limit must be positive'
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
 class API:
-    def __init__(self, conf: Conf, access_token: str):
+    def __init__(self, conf: Conf, access_token: str, metrics: Metrics = None, tracer: Tracer = None, transport=None):
         self._conf = conf
         self._access_token = access_token
         self._deploy_safety_limit = conf.deploy_safety_limit
-
-    def _call(self, endpoint: Endpoint, body, query):
-        url = f'{endpoint.url}?{query}' if query else endpoint.url
-        body_wo_content = {a: body[a] for a in body if a not in ['content', 'contents', 'data']}
-        if endpoint.is_write:
-            self._deploy_safety_limit -= 1
-            assert self._deploy_safety_limit >= 0, 'Deploy safety limit reached. Aborting...'
-            if self._conf.dry_run:
-                _log.warning('dry_run mode. Skipping: %s, body_wo_content: %s', url, body_wo_content)
-                return None
+        self._lock = threading.Lock()
+        self._metrics = metrics if metrics is not None else Metrics()
+        self._tracer = tracer if tracer is not None else Tracer()
+        self._transport = transport if transport is not None else HttpTransport()
+
+    @property
+    def writes(self) -> int:
+        """
+        Number of calls counted towards the deploy safety limit so far.
+        """
+        return self._conf.deploy_safety_limit - self._deploy_safety_limit
+
+    def reset_safety_limit(self):
+        """
+        Starts counting towards the deploy safety limit anew, for a process that deploys many times, like watch.
+        """
+        with self._lock:
+            self._deploy_safety_limit = self._conf.deploy_safety_limit
+
+    def _call(self, endpoint: Endpoint, body, query, content_type: str, url_path: str):
+        url = f'{endpoint.url}{url_path}?{query}' if query else f'{endpoint.url}{url_path}'
+        body_wo_content = _WithoutContent(body)
+        if endpoint.is_deploy:
+            with self._lock:
+                self._deploy_safety_limit -= 1
+                assert self._deploy_safety_limit >= 0, 'Deploy safety limit reached. Aborting...'
+        if endpoint.is_write and self._conf.dry_run:
+            _log.warning('dry_run mode. Skipping: %s, body_wo_content: %s', url, body_wo_content)
+            self._metrics.count_dry_run(endpoint.url)
+            return None
         _log.debug('Calling %s, body_wo_content: %s', url, body_wo_content)
-        if isinstance(body, str):
-            body = json.loads(body)
-        return requests.request(
-            endpoint.method, 'https://' + self._conf.workspace_host + '/api/' + url,
-            headers={'Authorization': 'Bearer ' + self._access_token}, json=body, )
-
-    def call(self, endpoint, body, query=None):
+        data = body if isinstance(body, (str, StreamBody)) else codec.dumps(body)
+        start = time.perf_counter()
+        with self._tracer.span('api.call', endpoint=endpoint.url, method=endpoint.method,
+                               path=body.get('path') if isinstance(body, dict) else url_path or None) as span:
+            response = self._transport.request(
+                endpoint.method, f'{self._conf.workspace_scheme}://{self._conf.workspace_host}/api/{url}',
+                headers={'Authorization': 'Bearer ' + self._access_token, 'Content-Type': content_type},
+                data=data)
+            if span is not None:
+                span.attributes['status'] = str(response.status_code)
+        self._metrics.observe_call(endpoint.url, time.perf_counter() - start, len(data), len(response.content))
+        return response
+
+    def call(self, endpoint, body, query=None, content_type: str = JSON_CONTENT_TYPE, url_path: str = ''):
+        """
+        :param body: a dict sent as JSON, or a StreamBody sent as it is, with the given content_type
+        :param url_path: appended to the endpoint url, for endpoints that address an object by their url
+        """
         attempts_left = self._conf.rate_limit_attempts
         while attempts_left > 0:
-            _response = self._call(endpoint, body, query)
+            _response = self._call(endpoint, body, query, content_type, url_path)
             if _response is None or _response.ok:
                 return _response
-            if _response.reason == 429 and self._conf.rate_limit_timeout > 0:
+            if _response.status_code == 429 and self._conf.rate_limit_timeout > 0:
                 _log.warning('Databricks API rate limit reached. Waiting for %ss', self._conf.rate_limit_timeout)
+                self._metrics.count_retry(endpoint.url)
                 time.sleep(self._conf.rate_limit_timeout)
             else:
+                self._metrics.count_error(endpoint.url)
                 raise RuntimeError(f'Error in response: {_response.text}')
             attempts_left -= 1
         raise RuntimeError(f'Maximum Databricks API call attempt count of {self._conf.rate_limit_attempts} reached.')
@@ -0,0 +1,139 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library is used without it
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+# list responses larger than this are parsed one element at a time, so only the kept elements are materialized
+INCREMENTAL_THRESHOLD = 1024 * 1024
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# a scalar ends at the next separator, closing bracket or whitespace
+_SCALAR = re.compile(rb'[^,\]}\s]+')
+# the next bracket, skipping strings, which may contain brackets, and everything else
+_BRACKET = re.compile(rb'(?:[^"\[\]{}]|"[^"\\]*(?:\\.[^"\\]*)*")*([\[\]{}])', re.DOTALL)
+
+_log = logging.getLogger(__name__)
+
+
+def loads(data):
+    """
+    Parses JSON from bytes or str. orjson parses bytes as they are, the standard library decodes them first.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """
+    Serializes to compact UTF-8 encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _skip(data: bytes, position: int) -> int:
+    return _WHITESPACE.match(data, position).end()
+
+
+def _expect(data: bytes, position: int, char: bytes) -> int:
+    position = _skip(data, position)
+    if data[position:position + 1] != char:
+        raise ValueError(f'Expecting "{char.decode()}" at position {position}')
+    return position + 1
+
+
+def _value_end(data: bytes, position: int) -> int:
+    """
+    End position of the JSON value starting at position. Only brackets are looked at one by one, strings and
+    anything else are skipped by the regular expressions.
+    """
+    first = data[position:position + 1]
+    if first in (b'{', b'['):
+        depth = 0
+        for match in _BRACKET.finditer(data, position):
+            depth += 1 if match.group(1) in b'[{' else -1
+            if depth == 0:
+                return match.end()
+        raise ValueError(f'Unterminated value at position {position}')
+    match = (_STRING if first == b'"' else _SCALAR).match(data, position)
+    if match is None:
+        raise ValueError(f'Expecting a value at position {position}')
+    return match.end()
+
+
+def _parse_value(data: bytes, position: int) -> tuple:
+    position = _skip(data, position)
+    end = _value_end(data, position)
+    return loads(data[position:end]), end
+
+
+def _filter_list(data: bytes, position: int, keep) -> tuple:
+    """
+    Parses the list starting at position one element at a time. Returns (kept elements, element count, end position).
+    """
+    position = _skip(data, _expect(data, position, b'['))
+    kept, count = [], 0
+    if data[position:position + 1] == b']':
+        return kept, count, position + 1
+    while True:
+        element, position = _parse_value(data, position)
+        count += 1
+        if keep(element):
+            kept.append(element)
+        position = _skip(data, position)
+        if data[position:position + 1] == b']':
+            return kept, count, position + 1
+        position = _expect(data, position, b',')
+
+
+def loads_filtered(data, key: str, keep) -> tuple:
+    """
+    Parses a JSON object and keeps only the elements of its list attribute `key` for which keep(element) is true.
+    Returns (object, element count before filtering). Above INCREMENTAL_THRESHOLD, the bytes are scanned for the
+    bounds of each element, which is then parsed on its own, so neither a decoded copy of the whole response nor
+    the elements that are not kept are held in memory.
+    """
+    if len(data) < INCREMENTAL_THRESHOLD:
+        obj = loads(data)
+        elements = obj.get(key, [])
+        obj[key] = [e for e in elements if keep(e)]
+        return obj, len(elements)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    obj, count = {}, 0
+    position = _skip(data, _expect(data, 0, b'{'))
+    if data[position:position + 1] != b'}':
+        while True:
+            name, position = _parse_value(data, position)
+            position = _expect(data, position, b':')
+            if name == key:
+                obj[key], count, position = _filter_list(data, position, keep)
+            else:
+                obj[name], position = _parse_value(data, position)
+            position = _skip(data, position)
+            if data[position:position + 1] == b'}':
+                break
+            position = _expect(data, position, b',')
+    obj.setdefault(key, [])
+    return obj, count
@@ -0,0 +1,149 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import base64
+import hashlib
+
+DICT_SORT_KEYS = ['task_key']
+# notebooks are compared ignoring line breaks, as the workspace may change them on import
+NEWLINE_BYTES = b'\r\n'
+# base64 characters decoded at once. Must be a multiple of 4
+B64_CHUNK_SIZE = 4 * 256 * 1024
+
+_log = logging.getLogger(__name__)
+
+
+def first_match(big_list, small_list: list) -> str:
+    for item in small_list:
+        if item in big_list:
+            return item
+    return ''
+
+
+def content_hash(chunks) -> str:
+    """
+    Newline insensitive hash of content given as an iterable of byte chunks.
+    Chunks are hashed one at a time, so the content is never held in memory as a whole.
+    """
+    h = hashlib.sha1()
+    for chunk in chunks:
+        h.update(chunk.translate(None, NEWLINE_BYTES))
+    return h.hexdigest()
+
+
+def b64decode_chunks(value: str, chunk_size: int = B64_CHUNK_SIZE):
+    """
+    Decodes base64 text in chunks and yields the decoded bytes of each.
+    """
+    for position in range(0, len(value), chunk_size):
+        yield base64.b64decode(value[position:position + chunk_size])
+
+
+class Comparator:
+    """
+    Compares specs (jobs, clusters, etc.), disregarding order on keys and lists.
+    Missing attributes are treated the same as None, empty dict or list. Numbers compare by value (1 == 1.0).
+    Lists of dicts are only treated as unordered if their dicts have one of the sort_keys, like task_key.
+
+    A spec is canonicalized in a single pass into a hashable form, so comparing two specs is a plain equality check.
+    The field level diff is only built when specs differ and debug logging is on.
+    :param ignore_keys: keys to ignore. Plain names apply at the top level, dotted paths, like
+        azure_attributes.first_on_demand, apply to nested dicts
+    :param sort_keys: keys that identify dicts within a list
+    """
+
+    def __init__(self, ignore_keys: list = None, sort_keys: list = None):
+        self._ignore = frozenset(tuple(k.split('.')) for k in ignore_keys or [])
+        self._nested_ignore = any(len(k) > 1 for k in self._ignore)
+        self._top_ignore = frozenset(k[0] for k in self._ignore if len(k) == 1)
+        self._sort_keys = DICT_SORT_KEYS if sort_keys is None else sort_keys
+
+    def _ignored(self, path: tuple, key: str) -> bool:
+        if not path:
+            return key in self._top_ignore
+        return self._nested_ignore and path + (key,) in self._ignore
+
+    def _canonical(self, value, path: tuple):
+        if isinstance(value, dict):
+            items = []
+            for k, v in value.items():
+                if self._ignored(path, k):
+                    continue
+                c = self._canonical(v, path + (k,) if self._nested_ignore else path or ('',))
+                if c is not None:
+                    items.append((k, c))
+            return ('d', tuple(sorted(items))) if items else None
+        if isinstance(value, list):
+            if not value:
+                return None
+            elements = [self._canonical(v, path) for v in value]
+            if not isinstance(value[0], dict) or first_match(value[0], self._sort_keys):
+                elements.sort(key=repr)
+            return 'l', tuple(elements)
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+    def canonical(self, spec):
+        """
+        Hashable, normalized form of a spec. Two specs are equal if their canonical forms are equal.
+        """
+        return self._canonical(spec, ())
+
+    def _strip(self, value, path: tuple):
+        if isinstance(value, dict):
+            return {k: self._strip(v, path + (k,)) for k, v in value.items() if not self._ignored(path, k)}
+        if isinstance(value, list):
+            return [self._strip(v, path) for v in value]
+        return value
+
+    def strip(self, spec):
+        """
+        Copy of a spec without the ignored keys.
+        """
+        return self._strip(spec, ())
+
+    def is_different(self, left, right) -> bool:
+        different = self.canonical(left) != self.canonical(right)
+        if different and _log.isEnabledFor(logging.DEBUG):
+            for path, left_value, right_value in self.diff(left, right):
+                _log.debug('In %s, %s is diff from %s', path, left_value, right_value)
+        return different
+
+    def diff(self, left, right, current_path: str = '$', path: tuple = ()) -> list:
+        """
+        Field level differences between two specs, as a list of (path, left value, right value).
+        Lists of dicts with a sort key are matched by that key, like $.tasks[task_key=ingest].timeout_seconds
+        """
+        if self._canonical(left, path) == self._canonical(right, path):
+            return []
+        if isinstance(left, dict) and isinstance(right, dict):
+            result = []
+            for key in sorted(set(left) | set(right)):
+                if not self._ignored(path, key):
+                    result += self.diff(left.get(key), right.get(key), f'{current_path}.{key}',
+                                        path + (key,) if self._nested_ignore else path or ('',))
+            return result
+        if isinstance(left, list) and isinstance(right, list) and left and right \
+                and isinstance(left[0], dict) and isinstance(right[0], dict):
+            key = first_match(left[0], self._sort_keys)
+            if key and all(isinstance(d, dict) and key in d for d in left + right):
+                left_by_key = {d[key]: d for d in left}
+                right_by_key = {d[key]: d for d in right}
+                result = []
+                for k in sorted(set(left_by_key) | set(right_by_key), key=str):
+                    result += self.diff(left_by_key.get(k), right_by_key.get(k), f'{current_path}[{key}={k}]', path)
+                return result
+        return [(current_path, left, right)]
@@ -0,0 +1,95 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_log = logging.getLogger(__name__)
+
+
+def estimate_size(obj) -> int:
+    """
+    Approximate memory held by content: bytes, or parsed JSON.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, list):
+        size += sum(estimate_size(v) for v in obj)
+    return size
+
+
+def peak_rss():
+    """
+    Peak resident set size of the process in bytes, or None where it cannot be told.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class ContentStore:
+    """
+    Keeps the content of items, loaded by the helpers, within a memory budget shared by all helpers of a run.
+    The least recently used content is evicted by setting it to None on its item, so the helpers load it again on
+    next use. Hashes stay on the items. The item added last is never evicted, so it can be used right away.
+    """
+
+    def __init__(self, budget: int):
+        self._budget = budget
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.peak_size = 0
+        self.evicted = 0
+
+    def add(self, item, size: int = None):
+        """
+        Accounts for the content just set on item, evicting older content over the budget.
+        """
+        size = estimate_size(item.content) if size is None else size
+        with self._lock:
+            key = id(item)
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            self._items[key] = (item, size)
+            self.size += size
+            while self._budget and self.size > self._budget and len(self._items) > 1:
+                _, (evicted, evicted_size) = self._items.popitem(last=False)
+                evicted.content = None
+                self.size -= evicted_size
+                self.evicted += 1
+            self.peak_size = max(self.peak_size, self.size)
+
+    def touch(self, item):
+        """
+        Marks the content of item as used, if it is kept.
+        """
+        with self._lock:
+            if id(item) in self._items:
+                self._items.move_to_end(id(item))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'peak_rss': peak_rss(), 'content_budget': self._budget, 'content_size': self.size,
+                    'content_peak_size': self.peak_size, 'content_evicted': self.evicted}
@@ -14,47 +14,106 @@
 
 import logging
 import base64
-import json
+import bisect
+import copy
+import posixpath
 import re
+import urllib.parse
+import uuid
 from os import path as op
 from abc import abstractmethod
-from collections import OrderedDict
-from databricks_cicd.utils import Context, Item, is_different
-from databricks_cicd.utils.api import Endpoints
+from concurrent.futures import Executor
+from databricks_cicd.utils import Context, Item, ItemStore, Comparator, merge_join, ancestors, content_hash, \
+    b64decode_chunks
+from databricks_cicd.utils import codec
+from databricks_cicd.utils.api import Endpoint, Endpoints
 from databricks_cicd.utils.local import Local
+from databricks_cicd.utils.logs import Progress
+from databricks_cicd.utils.transport import StreamBody
+
+# job settings that jobs/update merges by key, instead of replacing them as a whole
+JOB_SETTINGS_KEYS = {'tasks': 'task_key', 'job_clusters': 'job_cluster_key'}
+# job settings that the server sets itself and ignores on writes. They are neither compared nor removed
+JOB_SERVER_SETTINGS = ['format']
 
 _log = logging.getLogger(__name__)
 
 
+def _keep_all(_) -> bool:
+    return True
+
+
 class DeployHelperBase:
+    # whether _ls(name) lists a single item. Otherwise, single items are looked up in a listing of all items
+    _ls_by_name = True
+
     def __init__(self, context: Context):
         self._c = context
         self._remote_items_stale = True
         self._target_path = ''
         self._local_items = None
         self._remote_items = None
-        self._ls_local()
+        self._remote_ids = None
+        self._local_future = None
+        self._remote_future = None
+        self._comparator = Comparator()
 
     @property
     def local_items(self) -> dict:
-        if self._local_items is None:
+        if self._local_future is not None:
+            self._local_items = self._local_future.result()
+            self._local_future = None
+        elif self._local_items is None:
             self._local_items = self._ls_local()
         return self._local_items
 
     @local_items.setter
     def local_items(self, value):
+        self._local_future = None
         self._local_items = value
 
+    def _list(self):
+        with self._c.tracer.span(f'{self.__class__.__name__}._ls', path=self._target_path):
+            return self._ls()
+
     @property
     def remote_items(self) -> dict:
-        if self._remote_items is None or self._remote_items_stale is True:
-            self._remote_items = self._ls()
+        if self._remote_future is not None:
+            self._remote_items = self._remote_future.result()
+            self._remote_future = None
+            self._remote_items_stale = False
+            self._remote_ids = None
+        elif self._remote_items is None or self._remote_items_stale is True:
+            self._remote_items = self._list()
             self._remote_items_stale = False
+            self._remote_ids = None
         return self._remote_items
 
     @remote_items.setter
     def remote_items(self, value):
+        self._remote_future = None
         self._remote_items = value
+        self._remote_items_stale = False
+        self._remote_ids = None
+
+    def prefetch_local(self, executor: Executor):
+        """
+        Starts scanning the local items in the background. local_items waits for the scan.
+        """
+        self._local_future = executor.submit(self._ls_local)
+
+    def prefetch_remote(self, executor: Executor):
+        """
+        Starts listing the remote items in the background. remote_items waits for the listing.
+        """
+        self._remote_future = executor.submit(self._list)
+
+    @property
+    def local_source(self):
+        """
+        Where local items are listed and loaded from: the local files, or the bundle being deployed.
+        """
+        return Local if self._c.bundle is None else self._c.bundle
 
     def remote_path(self, path):
         return f'{self._target_path}{path}'
@@ -62,6 +121,15 @@ class DeployHelperBase:
     def common_path(self, path):
         return path[len(self._target_path):]
 
+    def find_by_id(self, remote_id):
+        """
+        Common path of the remote item with the given id, or None.
+        """
+        remote_items = self.remote_items
+        if self._remote_ids is None:
+            self._remote_ids = {v.path: k for k, v in remote_items.items()}
+        return self._remote_ids.get(remote_id)
+
     @abstractmethod
     def _ls(self, path=None):
         pass
@@ -84,43 +152,153 @@ class DeployHelperBase:
     def _mkdirs(self, path):
         pass
 
-    def _get_remote(self, remote_item: Item, overwrite=False):
-        pass
-
-    @staticmethod
-    def get_local(local_item: Item, overwrite=False):
+    def get_local(self, local_item: Item, overwrite=False):
         if overwrite or local_item.content is None:
-            local_item.content = Local.load_binary(local_item.path)
+            local_item.content = self.local_source.load_binary(local_item.path)
+            self._c.content.add(local_item, len(local_item.content))
+        else:
+            self._c.content.touch(local_item)
 
     def _diff(self, local_item: Item, remote_item: Item):
         self.get_local(local_item)
-        return is_different(local_item.content, remote_item.content)
+        return self._comparator.is_different(local_item.content, remote_item.content)
+
+    def is_different(self, local_item: Item, remote_item: Item) -> bool:
+        """
+        Whether a deploy would overwrite the remote item, without changing anything.
+        """
+        return self._diff(local_item, remote_item)
 
     def get_single_item(self, name):
-        if self._remote_items_stale:
-            return self._ls(name).get(name)
+        if self._remote_items_stale and self._remote_future is None and self._ls_by_name:
+            with self._c.tracer.span(f'{self.__class__.__name__}._ls', path=name):
+                return self._ls(name).get(name)
         return self.remote_items.get(name)
 
-    def deploy(self):
-        for o in self.local_items:
-            remote_path = self.remote_path(o)
-            local_item = self.local_items[o]  # type: Item
-            remote_item = self.remote_items.get(o)  # type: Item
-            if local_item.is_dir:
-                if remote_item is None:
-                    _log.info('Creating remote %s: %s', local_item.kind, remote_path)
-                    self._mkdirs(remote_path)
-            elif remote_item is None:
-                _log.info('Creating remote %s: %s', local_item.kind, remote_path)
+    def _sync(self, o: str, local_item: Item, remote_item: Item, force=False) -> str:
+        """
+        Creates or updates a single remote item to match the local one. Returns the action taken.
+        """
+        name = self.__class__.__name__
+        span = self._c.tracer.span
+        remote_path = self.remote_path(o)
+        if local_item.is_dir:
+            if remote_item is not None:
+                return 'unchanged'
+            _log.info('Creating remote %s: %s', local_item.kind, remote_path)
+            with span(f'{name}._mkdirs', path=remote_path):
+                self._mkdirs(remote_path)
+            return 'created'
+        if remote_item is None:
+            _log.info('Creating remote %s: %s', local_item.kind, remote_path)
+            with span(f'{name}._create', path=remote_path):
                 self._create(local_item, remote_path)
-            elif self._diff(local_item, remote_item):
-                _log.info('Overwriting remote %s: %s', local_item.kind, remote_path)
-                self._update(local_item, remote_item)
+            return 'created'
+        if not force:
+            with span(f'{name}._diff', path=remote_path):
+                if not self._diff(local_item, remote_item):
+                    return 'unchanged'
+        _log.info('Overwriting remote %s: %s', local_item.kind, remote_path)
+        with span(f'{name}._update', path=remote_path):
+            self._update(local_item, remote_item)
+        return 'updated'
+
+    def deploy(self, delete_orphans=True):
+        """
+        Creates and updates all remote items to match the local ones.
+        :param delete_orphans: deletes remote items that do not exist locally. Off for a partial (sharded) deploy
+        """
+        name = self.__class__.__name__
+        # a single listing is used for the whole deploy
+        remote_items = self.remote_items
+        orphans = []
+        written = []
+        for o, local_item, remote_item in merge_join(self.local_items, remote_items):
+            if local_item is None:
+                orphans.append(o)
+            else:
+                action = self._sync(o, local_item, remote_item)
+                self._c.metrics.count(name, action)
+                if action != 'unchanged':
+                    written.append(o)
+
+        if delete_orphans:
+            self._delete_orphans(orphans, remote_items)
+        self._index(written, orphans if delete_orphans else [], remote_items)
+
+    def _remote_item(self, local_item: Item, remote_path: str):
+        """
+        The remote item, as listed after local_item was deployed to remote_path.
+        None if it cannot be told without listing, like the id of a new job.
+        """
+        return None
 
-        for o in sorted(set(self.remote_items) - set(self.local_items), reverse=True):
-            remote_item = self.remote_items[o]
-            _log.info('Deleting remote %s: %s', self.remote_items[o].kind, self.remote_path(o))
-            self._delete(remote_item)
+    def _index(self, written: list, deleted, remote_items: dict):
+        """
+        Keeps the listing up to date with the written and deleted items, if the helper can describe them all.
+        Otherwise, the listing is stale and listed again on next use.
+        """
+        if self._c.conf.dry_run:
+            # nothing was written, so the listing is still accurate
+            self._remote_items_stale = False
+            return
+        for o in deleted:
+            remote_items.pop(o, None)
+        indexed = {}
+        for o in written:
+            indexed[o] = self._remote_item(self.local_items[o], self.remote_path(o))
+            if indexed[o] is None:
+                self._remote_items_stale = True
+                return
+        remote_items.update(indexed)
+        self._remote_items_stale = False
+
+    def push(self, names, force=False):
+        """
+        Brings the named items in line with local_items: the incremental counterpart of deploy, that also deletes
+        items no longer in local_items.
+        :param force: overwrites existing items without comparing, for changes the comparison cannot see, like a DBFS
+        file changed to the same size
+        """
+        name = self.__class__.__name__
+        remote_items = self.remote_items
+        written = []
+        deleted = set()
+        for o in sorted(names):
+            local_item = self.local_items.get(o)
+            if local_item is None:
+                keys = remote_items.sorted_keys()
+                start = bisect.bisect_left(keys, o)
+                end = bisect.bisect_left(keys, o + '/\uffff', start)
+                orphans = [k for k in keys[start:end] if (k == o or k.startswith(o + '/')) and k not in deleted]
+                self._delete_orphans(orphans, remote_items)
+                deleted.update(orphans)
+                continue
+            for parent in ancestors(o) + [o]:
+                if parent not in self.local_items or (parent != o and parent in remote_items) or parent in written:
+                    continue
+                action = self._sync(parent, self.local_items[parent], remote_items.get(parent), force and parent == o)
+                self._c.metrics.count(name, action)
+                if action != 'unchanged':
+                    written.append(parent)
+        self._index(written, deleted, remote_items)
+
+    def _delete_orphans(self, orphans: list, remote_items: dict):
+        name = self.__class__.__name__
+        for o in reversed(orphans):
+            remote_item = remote_items[o]
+            _log.info('Deleting remote %s: %s', remote_item.kind, self.remote_path(o))
+            with self._c.tracer.span(f'{name}._delete', path=self.remote_path(o)):
+                self._delete(remote_item)
+            self._c.metrics.count(name, 'deleted')
+
+    def delete_orphans(self):
+        """
+        Deletes remote items that do not exist locally, without creating or updating anything.
+        """
+        remote_items = self.remote_items
+        self._delete_orphans([o for o, local_item, _ in merge_join(self.local_items, remote_items)
+                              if local_item is None], remote_items)
 
 
 class WorkspaceHelper(DeployHelperBase):
@@ -131,28 +309,31 @@ class WorkspaceHelper(DeployHelperBase):
     def _ls(self, path=None):
         if path is None:
             path = self._target_path
-        _objects = OrderedDict()
-        for obj in self._c.api.call(Endpoints.workspace_list, body={'path': path}).json().get('objects', []):
+        _objects = ItemStore()
+        response = self._c.api.call(Endpoints.workspace_list, body={'path': path})
+        for obj in codec.loads(response.content).get('objects', []):
             if obj['object_type'] == 'DIRECTORY':
-                _objects = dict(_objects, **self._ls(obj['path']))
+                _objects.update(self._ls(obj['path']))
             _objects[self.common_path(obj['path'])] = Item(
                 path=obj['path'],
                 kind=obj['object_type'].lower(),
                 language=obj.get('language', ''),
-                is_dir=obj['object_type'] == 'DIRECTORY')
+                is_dir=obj['object_type'] == 'DIRECTORY',
+                size=obj.get('size'),
+                modified_at=obj.get('modified_at'))
         return _objects
 
     def _ls_local(self):
-        self.local_items = Local.workspace_ls(op.join(self._c.conf.local_path, self._c.conf.workspace.local_sub_dir))
+        return self.local_source.workspace_ls(op.join(self._c.conf.local_path, self._c.conf.workspace.local_sub_dir))
 
     def _create(self, local_item: Item, path):
         self._remote_items_stale = True
-        self.get_local(local_item)
+        # the content is only needed for this call, so it is not kept on the item
         return self._c.api.call(Endpoints.workspace_import, body={
             'path': path,
             'language': local_item.language,
             'overwrite': True,
-            'content': base64.b64encode(local_item.content).decode("utf-8")})
+            'content': self.local_source.load_base64(local_item.path)})
 
     def _delete(self, remote_item: Item):
         self._remote_items_stale = True
@@ -162,17 +343,30 @@ class WorkspaceHelper(DeployHelperBase):
         self._remote_items_stale = True
         return self._c.api.call(Endpoints.workspace_mkdirs, body={'path': path})
 
-    def _get_remote(self, remote_item: Item, overwrite=False):
-        if overwrite or remote_item.content is None:
-            response = self._c.api.call(Endpoints.workspace_export,
-                                        body={'path': remote_item.path, 'format': 'SOURCE'})
-            remote_item.content = base64.b64decode(response.json()['content'])
+    def export_chunks(self, remote_item: Item):
+        """
+        Source of a remote notebook, as decoded chunks.
+        """
+        response = self._c.api.call(Endpoints.workspace_export, body={'path': remote_item.path, 'format': 'SOURCE'})
+        return b64decode_chunks(codec.loads(response.content)['content'])
+
+    def local_hash(self, local_item: Item, overwrite=False) -> str:
+        if overwrite or local_item.hash is None:
+            local_item.hash = self.local_source.content_hash(local_item.path)
+        return local_item.hash
+
+    def remote_hash(self, remote_item: Item, overwrite=False) -> str:
+        if overwrite or remote_item.hash is None:
+            remote_item.hash = content_hash(self.export_chunks(remote_item))
+        return remote_item.hash
 
     def _diff(self, local_item: Item, remote_item: Item):
-        self.get_local(local_item)
-        self._get_remote(remote_item)
-        return (local_item.content.decode("utf-8").replace('\r', '').replace('\n', '') !=
-                remote_item.content.decode("utf-8").replace('\r', '').replace('\n', ''))
+        return self.local_hash(local_item) != self.remote_hash(remote_item)
+
+    def _remote_item(self, local_item: Item, remote_path: str):
+        if local_item.is_dir:
+            return Item(path=remote_path, kind='directory', is_dir=True)
+        return Item(path=remote_path, kind='notebook', language=local_item.language, hash_=self.local_hash(local_item))
 
     def find_notebook(self, path: str):
         if self.remote_items.get(path):
@@ -184,21 +378,39 @@ class WorkspaceHelper(DeployHelperBase):
 
 
 class InstancePoolsHelper(DeployHelperBase):
+    _ls_by_name = False
+
     def __init__(self, context: Context):
         super().__init__(context)
         self._target_path = context.conf.name_prefix
+        self._comparator = Comparator(context.conf.instance_pools.ignore_attributes)
+
+    def is_own(self, spec: dict) -> bool:
+        """
+        Whether the listed instance pool was created by the deploying identity, with the name prefix.
+        """
+        return spec['default_tags']['DatabricksInstancePoolCreatorId'] == self._c.conf.deploying_user_id \
+            and spec['instance_pool_name'].startswith(self._c.conf.name_prefix)
+
+    def list_specs(self, keep=None) -> list:
+        """
+        All instance pools in the workspace, or those for which keep(spec) is true.
+        """
+        instance_pools, _ = codec.loads_filtered(
+            self._c.api.call(Endpoints.instance_pools_list, body={}).content, 'instance_pools', keep or _keep_all)
+        return instance_pools['instance_pools']
+
+    def to_items(self, specs: list) -> ItemStore:
+        return ItemStore({self.common_path(i['instance_pool_name']): Item(path=i['instance_pool_id'],
+                                                                          kind='instance pool',
+                                                                          content=i)
+                          for i in specs})
 
     def _ls(self, path=None):
-        instance_pools = json.loads(self._c.api.call(Endpoints.instance_pools_list, body={}).text)
-        return {self.common_path(i['instance_pool_name']): Item(path=i['instance_pool_id'],
-                                                                kind='instance pool',
-                                                                content=i)
-                for i in instance_pools.get('instance_pools', [])
-                if i['default_tags']['DatabricksInstancePoolCreatorId'] == self._c.conf.deploying_user_id
-                and i['instance_pool_name'].startswith(self._c.conf.name_prefix)}
+        return self.to_items(self.list_specs(self.is_own))
 
     def _ls_local(self):
-        self.local_items = Local.files_ls(
+        return self.local_source.files_ls(
             op.join(self._c.conf.local_path, self._c.conf.instance_pools.local_sub_dir), ['.json'], 'instance pool')
 
     def _create(self, local_item: Item, path):
@@ -218,35 +430,68 @@ class InstancePoolsHelper(DeployHelperBase):
 
     def get_local(self, local_item: Item, overwrite=False):
         if overwrite or local_item.content is None:
-            local_item.content = Local.load_json(local_item.path)
+            local_item.content = self.local_source.load_json(local_item.path)
             for attribute in self._c.conf.instance_pools.strip_attributes:
                 local_item.content.pop(attribute, None)
             local_item.content['instance_pool_name'] = self.remote_path(local_item.content['instance_pool_name'])
+            self._c.content.add(local_item)
+        else:
+            self._c.content.touch(local_item)
 
     def _diff(self, local_item: Item, remote_item: Item):
         self.get_local(local_item)
-        return is_different(local_item.content, remote_item.content, self._c.conf.instance_pools.ignore_attributes)
+        return self._comparator.is_different(local_item.content, remote_item.content)
+
+    def to_local(self, remote_item: Item) -> dict:
+        """
+        Reverse of get_local: the source of a remote instance pool.
+        """
+        c = self._comparator.strip(remote_item.content)
+        for attribute in self._c.conf.instance_pools.strip_attributes:
+            c.pop(attribute, None)
+        c['instance_pool_name'] = self.common_path(c['instance_pool_name'])
+        return c
 
 
 class ClustersHelper(DeployHelperBase):
+    _ls_by_name = False
+
     def __init__(self, context: Context, instance_pools: InstancePoolsHelper):
         super().__init__(context)
         self._target_path = context.conf.name_prefix
         self._instance_pools = instance_pools
+        self._comparator = Comparator(context.conf.clusters.ignore_attributes)
+        self._comparator_with_instance_pool = Comparator(
+            context.conf.clusters.ignore_attributes + context.conf.clusters.ignore_attributes_with_instance_pool)
+
+    def is_own(self, spec: dict) -> bool:
+        """
+        Whether the listed cluster was created by the deploying identity, with the name prefix, and not by a job run.
+        """
+        return (spec['creator_user_name'] == self._c.conf.deploying_service_name
+                or spec['creator_user_name'] == self._c.conf.deploying_user_name) \
+            and spec['cluster_source'] != 'JOB' \
+            and spec['cluster_name'].startswith(self._c.conf.name_prefix)
+
+    def list_specs(self, keep=None) -> list:
+        """
+        All clusters in the workspace, or those for which keep(spec) is true.
+        """
+        clusters, _ = codec.loads_filtered(
+            self._c.api.call(Endpoints.clusters_list, body={}).content, 'clusters', keep or _keep_all)
+        return clusters['clusters']
+
+    def to_items(self, specs: list) -> ItemStore:
+        return ItemStore({self.common_path(i['cluster_name']): Item(path=i['cluster_id'],
+                                                                    kind='cluster',
+                                                                    content=i)
+                          for i in specs})
 
     def _ls(self, path=None):
-        clusters = json.loads(self._c.api.call(Endpoints.clusters_list, body={}).text)
-        return {self.common_path(i['cluster_name']): Item(path=i['cluster_id'],
-                                                          kind='cluster',
-                                                          content=i)
-                for i in clusters.get('clusters', [])
-                if (i['creator_user_name'] == self._c.conf.deploying_service_name
-                    or i['creator_user_name'] == self._c.conf.deploying_user_name)
-                and i['cluster_source'] != 'JOB'
-                and i['cluster_name'].startswith(self._c.conf.name_prefix)}
+        return self.to_items(self.list_specs(self.is_own))
 
     def _ls_local(self):
-        self.local_items = Local.files_ls(
+        return self.local_source.files_ls(
             op.join(self._c.conf.local_path, self._c.conf.clusters.local_sub_dir), ['.json'], 'cluster')
 
     def _create(self, local_item: Item, path):
@@ -266,7 +511,7 @@ class ClustersHelper(DeployHelperBase):
 
     def get_local(self, local_item: Item, overwrite=False, curate_item=True):
         if overwrite or local_item.content is None:
-            local_item.content = Local.load_json(local_item.path)
+            local_item.content = self.local_source.load_json(local_item.path)
             if curate_item:
                 for attribute in self._c.conf.clusters.strip_attributes:
                     local_item.content.pop(attribute, None)
@@ -278,46 +523,80 @@ class ClustersHelper(DeployHelperBase):
                     c['instance_pool_id'] = ip.path
                     c.pop('instance_pool_name', None)
                 c['cluster_name'] = self.remote_path(c['cluster_name'])
+            self._c.content.add(local_item)
+        else:
+            self._c.content.touch(local_item)
 
     def _diff(self, local_item: Item, remote_item: Item):
         self.get_local(local_item)
-        ignore_attributes = self._c.conf.clusters.ignore_attributes
         if local_item.content.get('instance_pool_id'):
-            ignore_attributes += self._c.conf.clusters.ignore_attributes_with_instance_pool
-        return is_different(local_item.content, remote_item.content, ignore_attributes)
+            return self._comparator_with_instance_pool.is_different(local_item.content, remote_item.content)
+        return self._comparator.is_different(local_item.content, remote_item.content)
+
+    def to_local(self, remote_item: Item) -> dict:
+        """
+        Reverse of get_local: the source of a remote cluster.
+        """
+        c = remote_item.content
+        c = (self._comparator_with_instance_pool if c.get('instance_pool_id') else self._comparator).strip(c)
+        for attribute in self._c.conf.clusters.strip_attributes:
+            c.pop(attribute, None)
+        if c.get('instance_pool_id') and self._instance_pools:
+            instance_pool_name = self._instance_pools.find_by_id(c['instance_pool_id'])
+            if instance_pool_name is not None:
+                c['instance_pool_name'] = instance_pool_name
+                c.pop('instance_pool_id')
+        c['cluster_name'] = self.common_path(c['cluster_name'])
+        return c
 
 
 class JobsHelper(DeployHelperBase):
+    _ls_by_name = False
+
     def __init__(self, context: Context, clusters: ClustersHelper, workspace: WorkspaceHelper):
         super().__init__(context)
         self._target_path = context.conf.name_prefix
         self._clusters = clusters
         self._workspace = workspace
-
-    def _ls(self, path=None):
+        self._comparator = Comparator(JOB_SERVER_SETTINGS)
+
+    def is_own(self, spec: dict) -> bool:
+        """
+        Whether the listed job was created by the deploying identity, with the name prefix.
+        """
+        return (spec['creator_user_name'] == self._c.conf.deploying_service_name
+                or spec['creator_user_name'] == self._c.conf.deploying_user_name) \
+            and spec['settings']['name'].startswith(self._c.conf.name_prefix)
+
+    def list_specs(self, keep=None) -> list:
+        """
+        All jobs in the workspace, or those for which keep(spec) is true.
+        """
         # pull jobs in batches due to the endpoint limitation:
         batch_size = 10
         offset = 0
         result_count = batch_size
         jobs = []
         while result_count == batch_size:
-            jobs_batch = json.loads(self._c.api.call(
-                Endpoints.jobs_list, body={}, query=f"expand_tasks=true&limit={batch_size}&offset={offset}").text)
-            jobs.extend([
-                i for i in jobs_batch.get('jobs', [])
-                if (i['creator_user_name'] == self._c.conf.deploying_service_name
-                    or i['creator_user_name'] == self._c.conf.deploying_user_name)
-                   and i['settings']['name'].startswith(self._c.conf.name_prefix)])
-            result_count = len(jobs_batch.get('jobs', []))
+            jobs_batch, result_count = codec.loads_filtered(
+                self._c.api.call(Endpoints.jobs_list, body={},
+                                 query=f"expand_tasks=true&limit={batch_size}&offset={offset}").content, 'jobs',
+                keep or _keep_all)
+            jobs.extend(jobs_batch['jobs'])
             offset += batch_size
+        return jobs
+
+    def to_items(self, specs: list) -> ItemStore:
+        return ItemStore({self.common_path(i['settings']['name']): Item(path=i['job_id'],
+                                                                        kind='job',
+                                                                        content=i['settings'])
+                          for i in specs})
 
-        return {self.common_path(i['settings']['name']): Item(path=i['job_id'],
-                                                              kind='job',
-                                                              content=i['settings'])
-                for i in jobs}
+    def _ls(self, path=None):
+        return self.to_items(self.list_specs(self.is_own))
 
     def _ls_local(self):
-        self.local_items = Local.files_ls(
+        return self.local_source.files_ls(
             op.join(self._c.conf.local_path, self._c.conf.jobs.local_sub_dir), ['.json'], 'job')
 
     def _create(self, local_item: Item, path):
@@ -325,9 +604,60 @@ class JobsHelper(DeployHelperBase):
         self.get_local(local_item)
         return self._c.api.call(Endpoints.jobs_create, body=local_item.content)
 
+    def _keyed_delta(self, field: str, local: list, remote: list):
+        """
+        Changed and removed elements of a list of settings identified by key, like tasks by task_key.
+        Returns None if any element has no key or a key is not unique.
+        """
+        key = JOB_SETTINGS_KEYS[field]
+        local_by_key = {e.get(key): e for e in local}
+        remote_by_key = {e.get(key): e for e in remote}
+        if None in local_by_key or None in remote_by_key \
+                or len(local_by_key) != len(local) or len(remote_by_key) != len(remote):
+            return None
+        canonical = self._comparator.canonical
+        changed = [e for k, e in local_by_key.items()
+                   if k not in remote_by_key or canonical(e) != canonical(remote_by_key[k])]
+        removed = [f'{field}/{k}' for k in remote_by_key if k not in local_by_key]
+        return changed, removed
+
+    def partial_settings(self, local: dict, remote: dict):
+        """
+        The jobs/update body that changes the remote settings into the local ones: the changed top level fields,
+        the changed tasks and job clusters by key, and the fields to remove. Returns None if only jobs/reset can
+        express the change.
+        """
+        canonical = self._comparator.canonical
+        new_settings = {}
+        fields_to_remove = []
+        for field in local.keys() | remote.keys():
+            if field in JOB_SETTINGS_KEYS and isinstance(local.get(field, []), list) \
+                    and isinstance(remote.get(field, []), list):
+                delta = self._keyed_delta(field, local.get(field) or [], remote.get(field) or [])
+                if delta is None:
+                    return None
+                changed, removed = delta
+                if changed:
+                    new_settings[field] = changed
+                fields_to_remove.extend(removed)
+            elif canonical({field: local.get(field)}) != canonical({field: remote.get(field)}):
+                if canonical({field: local.get(field)}) is None:
+                    fields_to_remove.append(field)
+                else:
+                    new_settings[field] = local[field]
+        if not new_settings and not fields_to_remove:
+            return None
+        return {'new_settings': new_settings, 'fields_to_remove': sorted(fields_to_remove)}
+
     def _update(self, local_item: Item, remote_item: Item):
         self._remote_items_stale = True
         self.get_local(local_item)
+        if self._c.conf.jobs.partial_update and remote_item.content is not None:
+            body = self.partial_settings(local_item.content, remote_item.content)
+            if body is not None:
+                _log.debug('Updating %s fields of job %s', len(body['new_settings']) + len(body['fields_to_remove']),
+                           local_item.content['name'])
+                return self._c.api.call(Endpoints.jobs_update, body={'job_id': remote_item.path, **body})
         return self._c.api.call(Endpoints.jobs_reset, body={'job_id': remote_item.path,
                                                             'new_settings': local_item.content})
 
@@ -353,7 +683,7 @@ class JobsHelper(DeployHelperBase):
 
     def get_local(self, local_item: Item, overwrite=False, curate_item=True):
         if overwrite or local_item.content is None:
-            local_item.content = Local.load_json(local_item.path)
+            local_item.content = self.local_source.load_json(local_item.path)
             for attribute in self._c.conf.jobs.strip_attributes:
                 local_item.content.pop(attribute, None)
             if curate_item:
@@ -373,12 +703,38 @@ class JobsHelper(DeployHelperBase):
                     self._replace_notebook_path(t, c['name'])
 
                 c['name'] = self.remote_path(c['name'])
+            self._c.content.add(local_item)
+        else:
+            self._c.content.touch(local_item)
+
+    def to_local(self, remote_item: Item) -> dict:
+        """
+        Reverse of get_local: the source of a remote job. Clusters and notebooks deployed by this tool
+        are referenced by their name and path without the target prefixes.
+        """
+        c = copy.deepcopy(remote_item.content)
+        for attribute in self._c.conf.jobs.strip_attributes + JOB_SERVER_SETTINGS:
+            c.pop(attribute, None)
+        for task in [c] + c.get('tasks', []):
+            if task.get('existing_cluster_id') and self._clusters:
+                cluster_name = self._clusters.find_by_id(task['existing_cluster_id'])
+                if cluster_name is not None:
+                    task['existing_cluster_name'] = cluster_name
+                    task.pop('existing_cluster_id')
+            notebook_path = task.get('notebook_task', {}).get('notebook_path')
+            if notebook_path and self._workspace and notebook_path.startswith(self._workspace.remote_path('')):
+                task['notebook_task']['notebook_path'] = self._workspace.common_path(notebook_path)
+        c['name'] = self.common_path(c['name'])
+        return c
 
     def _validate_notebook_path(self, task: dict, job_name: str):
         notebook_path = task.get('notebook_task', {}).get('notebook_path')
         if notebook_path:
-            assert self._workspace.local_items.get(notebook_path) is not None, \
-                f'Notebook "{notebook_path}" referenced in job "{job_name}" not found'
+            found = self._workspace.local_items.get(notebook_path) is not None
+            if not found and self._c.api is not None:
+                # notebooks that are not deployed, but already in the workspace
+                found = self._workspace.find_notebook(notebook_path) is not None
+            assert found, f'Notebook "{notebook_path}" referenced in job "{job_name}" not found'
 
     def validate_notebook_path(self, local_item: Item):
         self.get_local(local_item, curate_item=False)
@@ -389,7 +745,10 @@ class JobsHelper(DeployHelperBase):
 
     def _validate_existing_cluster_name(self, task: dict, job_name: str):
         if task.get('existing_cluster_name') and self._clusters:
-            ec = self._clusters.get_single_item(task['existing_cluster_name'])
+            ec = self._clusters.local_items.get(task['existing_cluster_name'])
+            if ec is None and self._c.api is not None:
+                # clusters that are not deployed, but already in the workspace
+                ec = self._clusters.get_single_item(task['existing_cluster_name'])
             assert ec is not None, f'Cluster "{task["existing_cluster_name"]}", ' \
                                    f'referenced in job "{job_name}" not found'
 
@@ -408,33 +767,77 @@ class DBFSHelper(DeployHelperBase):
     def _ls(self, path=None):
         if path is None:
             path = self._target_path
-        _objects = OrderedDict()
-        for obj in self._c.api.call(Endpoints.dbfs_list, body={'path': path}).json().get('files', []):
+        _objects = ItemStore()
+        response = self._c.api.call(Endpoints.dbfs_list, body={'path': path})
+        for obj in codec.loads(response.content).get('files', []):
             if obj['is_dir']:
-                _objects = dict(_objects, **self._ls(obj['path']))
+                _objects.update(self._ls(obj['path']))
             _objects[self.common_path(obj['path'])] = Item(
                 path=obj['path'],
                 kind='dbfs directory' if obj['is_dir'] else 'dbfs file',
                 is_dir=obj['is_dir'],
-                size=obj['file_size'])
+                size=obj['file_size'],
+                modified_at=obj.get('modification_time'))
         return _objects
 
     def _ls_local(self):
-        self.local_items = Local.dbfs_ls(op.join(self._c.conf.local_path, self._c.conf.dbfs.local_sub_dir))
+        return self.local_source.dbfs_ls(op.join(self._c.conf.local_path, self._c.conf.dbfs.local_sub_dir))
+
+    def upload_backend(self, path: str) -> str:
+        """
+        The upload backend of a remote path: the one of its longest prefix in upload_backends, or upload_backend.
+        """
+        conf = self._c.conf.dbfs
+        prefixes = [p for p in conf.upload_backends if p == '/' or path == p or path.startswith(p + '/')]
+        return conf.upload_backends[max(prefixes, key=len)] if prefixes else conf.upload_backend
+
+    def _progress(self, path: str, size: int):
+        progress = Progress(self._c.conf.dbfs.progress_interval)
+
+        def log(transferred: int):
+            if progress.due():
+                _log.info('%s of %s bytes transferred: %s', transferred, size, path)
+        return log
+
+    def _stream(self, local_item: Item, path: str, head: bytes = b'', tail: bytes = b'') -> StreamBody:
+        return StreamBody(lambda: self.local_source.open_binary(local_item.path), local_item.size, head, tail,
+                          self._progress(path, local_item.size))
+
+    def _create_blocks(self, local_item: Item, path):
+        handle = codec.loads(self._c.api.call(Endpoints.dbfs_create, body={'path': path, 'overwrite': True}).content)\
+            .get('handle')
+        transferred = 0
+        progress = self._progress(path, local_item.size)
+        for block in self.local_source.read_chunks(local_item.path, self._c.conf.dbfs.transfer_block_size):
+            self._c.api.call(
+                Endpoints.dbfs_add_block,
+                body={'handle': handle,
+                      'data': base64.b64encode(block).decode("utf-8")})
+            transferred += len(block)
+            progress(transferred)
+        self._c.api.call(Endpoints.dbfs_close, body={'handle': handle})
+
+    def _create_put(self, local_item: Item, path):
+        boundary = uuid.uuid4().hex
+        fields = ''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+                         for name, value in [('path', path), ('overwrite', 'true')])
+        head = (fields + f'--{boundary}\r\nContent-Disposition: form-data; name="contents"; '
+                         f'filename="{posixpath.basename(path)}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+        self._c.api.call(Endpoints.dbfs_put, body=self._stream(local_item, path, head, f'\r\n--{boundary}--\r\n'
+                                                                                         .encode('utf-8')),
+                         content_type=f'multipart/form-data; boundary={boundary}')
+
+    def _create_files(self, local_item: Item, path):
+        endpoint = Endpoint(Endpoints.fs_files.method, self._c.conf.dbfs.files_endpoint, Endpoints.fs_files.is_write)
+        self._c.api.call(endpoint, body=self._stream(local_item, path), query='overwrite=true',
+                         content_type='application/octet-stream', url_path=urllib.parse.quote(path))
 
     def _create(self, local_item: Item, path):
         self._remote_items_stale = True
-        handle = self._c.api.call(Endpoints.dbfs_create, body={'path': path, 'overwrite': True}).json().get('handle')
-        file_size = op.getsize(local_item.path)
-        block_size = self._c.conf.dbfs.transfer_block_size
-        with open(local_item.path, 'rb') as f:
-            for position in range(0, file_size, block_size):
-                self._c.api.call(
-                    Endpoints.dbfs_add_block,
-                    body={'handle': handle,
-                          'data': base64.b64encode(f.read(self._c.conf.dbfs.transfer_block_size)).decode("utf-8")})
-                _log.info('%s bytes trnasferred', min(position + block_size, file_size))
-        self._c.api.call(Endpoints.dbfs_close, body={'handle': handle})
+        backend = self.upload_backend(path)
+        _log.debug('Uploading %s with the %s backend', path, backend)
+        getattr(self, f'_create_{backend}')(local_item, path)
 
     def _delete(self, remote_item: Item):
         self._remote_items_stale = True
@@ -444,14 +847,28 @@ class DBFSHelper(DeployHelperBase):
         self._remote_items_stale = True
         return self._c.api.call(Endpoints.dbfs_mkdirs, body={'path': path})
 
-    def _get_remote(self, remote_item: Item, overwrite=False):
-        if overwrite or remote_item.content is None:
-            response = self._c.api.call(Endpoints.dbfs_read, body={'path': remote_item.path})
-            remote_item.content = base64.b64decode(response.json()['content'])
+    def read_chunks(self, remote_item: Item):
+        """
+        Content of a remote file, read in blocks of transfer_block_size.
+        """
+        block_size = self._c.conf.dbfs.transfer_block_size
+        offset = 0
+        while True:
+            response = codec.loads(self._c.api.call(
+                Endpoints.dbfs_read, body={'path': remote_item.path, 'offset': offset, 'length': block_size}).content)
+            if response.get('bytes_read'):
+                yield base64.b64decode(response['data'])
+            if response.get('bytes_read', 0) < block_size:
+                return
+            offset += response['bytes_read']
 
     def _diff(self, local_item: Item, remote_item: Item):
         return local_item.size != remote_item.size
 
+    def _remote_item(self, local_item: Item, remote_path: str):
+        return Item(path=remote_path, kind='dbfs directory' if local_item.is_dir else 'dbfs file',
+                    is_dir=local_item.is_dir, size=local_item.size)
+
 
 class UsersHelper(DeployHelperBase):
     def __init__(self, context: Context):
@@ -460,7 +877,7 @@ class UsersHelper(DeployHelperBase):
 
     def _ls(self, path=None):
         query = f'filter=userName+eq+{path}' if path else None
-        users = json.loads(self._c.api.call(Endpoints.users_list, body={}, query=query).text)
+        users = codec.loads(self._c.api.call(Endpoints.users_list, body={}, query=query).content)
         return {i['userName']: Item(path=i['id'], kind='user', content=i)
                 for i in users.get('Resources', [])}
 
@@ -481,7 +898,8 @@ class ServicePrincipalsHelper(DeployHelperBase):
 
     def _ls(self, path=None):
         query = f'filter=displayName+eq+{path}' if path else None
-        service_principals = json.loads(self._c.api.call(Endpoints.service_principals_list, body={}, query=query).text)
+        service_principals = codec.loads(
+            self._c.api.call(Endpoints.service_principals_list, body={}, query=query).content)
         return {i['displayName']: Item(path=i['id'], kind='service principal', content=i)
                 for i in service_principals.get('Resources', [])}
 
@@ -493,3 +911,19 @@ class ServicePrincipalsHelper(DeployHelperBase):
 
     def _delete(self, remote_item: Item):
         pass  # TODO:
+
+
+def resolve_identity(context: Context):
+    """
+    Looks up the deploying user, or service principal, and sets its ids in the config.
+    The ids are needed to tell the objects created by the deploying identity apart from all others.
+    """
+    conf = context.conf
+    user = UsersHelper(context).get_single_item(conf.deploying_user_name)
+    if user:
+        conf.deploying_user_id = user.path
+    else:
+        service_principal = ServicePrincipalsHelper(context).get_single_item(conf.deploying_user_name)
+        assert service_principal is not None, f'User or service principal "{conf.deploying_user_name}" not found'
+        conf.deploying_user_id = service_principal.path
+        conf.deploying_service_name = service_principal.content.get('applicationId')
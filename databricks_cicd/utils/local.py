@@ -13,12 +13,13 @@
 # limitations under the License.
 
 import logging
+import base64
 from os import path as op, walk as os_walk
-import json
-from collections import OrderedDict
-from databricks_cicd.utils import Item
+from databricks_cicd.utils import Item, ItemStore, content_hash, codec
 from databricks_cicd.utils.api import NOTEBOOK_EXTENSIONS
 
+READ_CHUNK_SIZE = 1024 * 1024
+
 _log = logging.getLogger(__name__)
 
 
@@ -32,8 +33,8 @@ class Local:
         return op.relpath(current_path, base_path).replace(op.sep, '/')
 
     @staticmethod
-    def workspace_ls(path) -> OrderedDict:
-        _objects = OrderedDict()
+    def workspace_ls(path) -> ItemStore:
+        _objects = ItemStore()
         if path is not None:
             for cur_path, dirs, files in os_walk(path):
                 for f in files:
@@ -51,8 +52,8 @@ class Local:
         return _objects
 
     @staticmethod
-    def dbfs_ls(path) -> OrderedDict:
-        _objects = OrderedDict()
+    def dbfs_ls(path) -> ItemStore:
+        _objects = ItemStore()
         if path is not None:
             for cur_path, dirs, files in os_walk(path):
                 for f in files:
@@ -69,8 +70,8 @@ class Local:
         return _objects
 
     @staticmethod
-    def files_ls(path, extensions=None, kind=None) -> OrderedDict:
-        _files = OrderedDict()
+    def files_ls(path, extensions=None, kind=None) -> ItemStore:
+        _files = ItemStore()
         if path is not None:
             for cur_path, _, files in os_walk(path):
                 for f in files:
@@ -85,13 +86,31 @@ class Local:
     @staticmethod
     def load_json(path) -> dict:
         with open(path, 'rb') as f:
-            return json.loads(f.read())
+            return codec.loads(f.read())
 
     @staticmethod
     def load_binary(path) -> bytes:
         with open(path, 'rb') as f:
             return f.read()
 
+    @staticmethod
+    def load_base64(path) -> str:
+        return base64.b64encode(Local.load_binary(path)).decode('utf-8')
+
+    @staticmethod
+    def open_binary(path):
+        return open(path, 'rb')
+
+    @staticmethod
+    def read_chunks(path, chunk_size: int = READ_CHUNK_SIZE):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+
+    @staticmethod
+    def content_hash(path) -> str:
+        return content_hash(Local.read_chunks(path))
+
     @staticmethod
     def get_file_name(path) -> str:
         return op.splitext(op.basename(path))[0]
@@ -0,0 +1,197 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import atexit
+import copy
+import json
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMATS = ('text', 'json')
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+# attributes of every log record. Any other attribute was passed with extra= and is added to JSON lines
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_log = logging.getLogger(__name__)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with the time in UTC, the level, logger, thread, message and any extra fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+                'level': record.levelname,
+                'logger': record.name,
+                'thread': record.threadName,
+                'message': record.getMessage()}
+        line.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line['exception'] = record.exc_text
+        return json.dumps(line, default=str)
+
+
+class _LogStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = 0
+        self.caller_cpu_time = 0.0
+        self.writer_cpu_time = 0.0
+
+    def add_record(self, cpu_time: float):
+        with self._lock:
+            self.records += 1
+            self.caller_cpu_time += cpu_time
+
+    def add_write(self, cpu_time: float):
+        with self._lock:
+            self.writer_cpu_time += cpu_time
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {'records': self.records, 'caller_cpu_time': round(self.caller_cpu_time, 6),
+                    'writer_cpu_time': round(self.writer_cpu_time, 6)}
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Hands records over to the log thread. Only the message is formatted by the thread that logs, as its arguments may
+    change once the call returns.
+    """
+
+    def __init__(self, records: queue.SimpleQueue, stats: _LogStats):
+        super().__init__(records)
+        self._stats = stats
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def handle(self, record: logging.LogRecord):
+        start = time.thread_time()
+        try:
+            return super().handle(record)
+        finally:
+            self._stats.add_record(time.thread_time() - start)
+
+
+class _DisplayHandler(logging.StreamHandler):
+    def __init__(self, stats: _LogStats):
+        super().__init__(sys.stdout)
+        self._stats = stats
+
+    def handle(self, record: logging.LogRecord):
+        start = time.thread_time()
+        try:
+            return super().handle(record)
+        finally:
+            self._stats.add_write(time.thread_time() - start)
+
+
+class _Display:
+    """
+    The log thread of the process, started by the first display_log and stopped at exit, once all records are written.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.log_format = 'text'
+        self.stats = _LogStats()
+        self.records = None
+        self._handler = None
+        self._listener = None
+
+    def set_format(self, log_format: str):
+        with self._lock:
+            self.log_format = log_format
+            if self._handler is not None:
+                self._handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    def start(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self.records = queue.SimpleQueue()
+            self._handler = _DisplayHandler(self.stats)
+            self._listener = QueueListener(self.records, self._handler)
+            self._listener.start()
+            atexit.register(self.stop)
+        self.set_format(self.log_format)
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+
+_display = _Display()
+
+
+def set_log_format(log_format: str):
+    """
+    Format of the lines logged by display_log, one of LOG_FORMATS.
+    """
+    assert log_format in LOG_FORMATS, f'Unknown log format: {log_format}'
+    _display.set_format(log_format)
+
+
+def display_log(level):
+    """
+    Logs to stdout from a background thread, so the threads that log do not wait for the output.
+    Calling it again only changes the level, so a process that runs many commands logs each line once.
+    """
+    _display.start()
+    for name in ['databricks_cicd', '__main__']:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        if not any(isinstance(h, _QueueHandler) for h in logger.handlers):
+            logger.addHandler(_QueueHandler(_display.records, _display.stats))
+
+
+def log_stats() -> dict:
+    """
+    Records logged through display_log and the CPU time spent on them, by the threads that log and the log thread.
+    """
+    return _display.stats.to_dict()
+
+
+class Progress:
+    """
+    Tells when a progress message of a long operation is due, at most once every interval seconds.
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._last = time.monotonic()
+
+    def due(self) -> bool:
+        now = time.monotonic()
+        if now - self._last < self._interval:
+            return False
+        self._last = now
+        return True
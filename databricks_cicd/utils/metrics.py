@@ -0,0 +1,194 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# upper bounds of the latency histogram buckets, in seconds. The last bucket (+Inf) is implicit
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HELPER_ACTIONS = ('created', 'updated', 'deleted', 'unchanged')
+
+_log = logging.getLogger(__name__)
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+        self.dry_run_skipped = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, latency: float, bytes_sent: int, bytes_received: int):
+        self.calls += 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_buckets[i] += 1
+                return
+        self.latency_buckets[-1] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'errors': self.errors,
+            'dry_run_skipped': self.dry_run_skipped,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'latency_sum': round(self.latency_sum, 6),
+            'latency_histogram': OrderedDict(
+                [(str(b), c) for b, c in zip(LATENCY_BUCKETS, self.latency_buckets)]
+                + [('+Inf', self.latency_buckets[-1])])}
+
+
+class Metrics:
+    """
+    Collects counters of a single run: API calls per endpoint, items processed per helper and phase durations.
+    All methods are thread safe, so a single instance can be shared by the API and all helpers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Starts a new run, for a process that runs many, like the daemon.
+        """
+        with self._lock:
+            self.started = time.time()
+            self.endpoints = OrderedDict()
+            self.helpers = OrderedDict()
+            self.phases = OrderedDict()
+            self.memory = OrderedDict()
+            self.logging = OrderedDict()
+
+    def _endpoint(self, url: str) -> EndpointMetrics:
+        if url not in self.endpoints:
+            self.endpoints[url] = EndpointMetrics()
+        return self.endpoints[url]
+
+    def observe_call(self, url: str, latency: float, bytes_sent: int = 0, bytes_received: int = 0):
+        with self._lock:
+            self._endpoint(url).observe(latency, bytes_sent, bytes_received)
+
+    def count_retry(self, url: str):
+        with self._lock:
+            self._endpoint(url).retries += 1
+
+    def count_error(self, url: str):
+        with self._lock:
+            self._endpoint(url).errors += 1
+
+    def count_dry_run(self, url: str):
+        with self._lock:
+            self._endpoint(url).dry_run_skipped += 1
+
+    def count(self, helper: str, action: str, value: int = 1):
+        assert action in HELPER_ACTIONS, f'Unknown helper action: {action}'
+        with self._lock:
+            if helper not in self.helpers:
+                self.helpers[helper] = OrderedDict((a, 0) for a in HELPER_ACTIONS)
+            self.helpers[helper][action] += value
+
+    def observe_memory(self, stats: dict):
+        """
+        Peak RSS and content store counters, observed at the end of a run.
+        """
+        with self._lock:
+            self.memory.update(stats)
+
+    def observe_logging(self, stats: dict):
+        """
+        Records logged and the CPU time spent on logging, observed at the end of a run.
+        """
+        with self._lock:
+            self.logging.update(stats)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self) -> dict:
+        with self._lock:
+            return OrderedDict([
+                ('started', self.started),
+                ('duration', round(time.time() - self.started, 6)),
+                ('phases', OrderedDict((k, round(v, 6)) for k, v in self.phases.items())),
+                ('helpers', OrderedDict((k, dict(v)) for k, v in self.helpers.items())),
+                ('endpoints', OrderedDict((k, v.to_dict()) for k, v in self.endpoints.items())),
+                ('memory', OrderedDict(self.memory)),
+                ('logging', OrderedDict(self.logging)),
+            ])
+
+    def write_report(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        _log.info('Run report written to: %s', path)
+
+    def write_prometheus(self, path: str):
+        """
+        Writes the metrics in the Prometheus text exposition format, suitable for the node exporter textfile collector.
+        """
+        report = self.report()
+        lines = ['# TYPE cicd_run_duration_seconds gauge',
+                 f'cicd_run_duration_seconds {report["duration"]}',
+                 '# TYPE cicd_phase_duration_seconds gauge']
+        lines += [f'cicd_phase_duration_seconds{{phase="{k}"}} {v}' for k, v in report['phases'].items()]
+        memory = report['memory']
+        for k in ('peak_rss', 'content_budget', 'content_size', 'content_peak_size'):
+            if memory.get(k) is not None:
+                lines += [f'# TYPE cicd_memory_{k}_bytes gauge', f'cicd_memory_{k}_bytes {memory[k]}']
+        if memory.get('content_evicted') is not None:
+            lines += ['# TYPE cicd_memory_content_evicted_total counter',
+                      f'cicd_memory_content_evicted_total {memory["content_evicted"]}']
+        if report['logging']:
+            lines += ['# TYPE cicd_log_records_total counter',
+                      f'cicd_log_records_total {report["logging"]["records"]}',
+                      '# TYPE cicd_log_cpu_seconds_total counter']
+            lines += [f'cicd_log_cpu_seconds_total{{thread="{t}"}} {report["logging"][f"{t}_cpu_time"]}'
+                      for t in ('caller', 'writer')]
+        lines.append('# TYPE cicd_items_total counter')
+        lines += [f'cicd_items_total{{helper="{h}",action="{a}"}} {c}'
+                  for h, actions in report['helpers'].items() for a, c in actions.items()]
+        for counter in ('calls', 'retries', 'errors', 'dry_run_skipped', 'bytes_sent', 'bytes_received'):
+            lines.append(f'# TYPE cicd_api_{counter}_total counter')
+            lines += [f'cicd_api_{counter}_total{{endpoint="{k}"}} {v[counter]}'
+                      for k, v in report['endpoints'].items()]
+        lines.append('# TYPE cicd_api_latency_seconds histogram')
+        for k, v in self.endpoints.items():
+            cumulative = 0
+            for bound, count in zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], v.latency_buckets):
+                cumulative += count
+                lines.append(f'cicd_api_latency_seconds_bucket{{endpoint="{k}",le="{bound}"}} {cumulative}')
+            lines.append(f'cicd_api_latency_seconds_sum{{endpoint="{k}"}} {round(v.latency_sum, 6)}')
+            lines.append(f'cicd_api_latency_seconds_count{{endpoint="{k}"}} {v.calls}')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        _log.info('Prometheus metrics written to: %s', path)
@@ -0,0 +1,81 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from os import path as op
+
+PROFILE_MODES = ['cpu', 'memory']
+DEFAULT_OUTPUT = {'cpu': 'cicd.pstats', 'memory': 'cicd_memory.txt'}
+# only functions defined within this folder are listed in the log summary
+SUMMARY_PATH = op.dirname(__file__)
+
+_log = logging.getLogger(__name__)
+
+
+class Profiler:
+    """
+    Runs the current process under cProfile (cpu) or tracemalloc (memory).
+    On stop, the full result is written to a file and the hottest functions of databricks_cicd.utils are logged.
+    """
+
+    def __init__(self, mode: str, output: str = None, top: int = 20):
+        assert mode in PROFILE_MODES, f'Unknown profile mode: {mode}'
+        self.mode = mode
+        self.output = output or DEFAULT_OUTPUT[mode]
+        self.top = top
+        self._profile = None
+
+    def start(self):
+        if self.mode == 'cpu':
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            import tracemalloc
+            tracemalloc.start(25)
+
+    def stop(self):
+        if self.mode == 'cpu':
+            self._stop_cpu()
+        else:
+            self._stop_memory()
+
+    def _stop_cpu(self):
+        import pstats
+        self._profile.disable()
+        self._profile.dump_stats(self.output)
+        stats = pstats.Stats(self._profile).stats
+        hottest = sorted(((v[2], v[3], v[1], k) for k, v in stats.items()
+                          if k[0].startswith(SUMMARY_PATH) and k[0] != __file__),
+                         reverse=True)[:self.top]
+        lines = [f'{tottime:10.4f} {cumtime:10.4f} {calls:10} {op.basename(f)}:{line}({func})'
+                 for tottime, cumtime, calls, (f, line, func) in hottest]
+        _log.info('CPU profile written to: %s. Hottest functions in databricks_cicd.utils:\n'
+                  '   tottime    cumtime      calls function\n%s', self.output, '\n'.join(lines))
+
+    def _stop_memory(self):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(self.output, 'w', encoding='utf-8') as f:
+            f.write(f'Peak traced memory: {peak} bytes\n')
+            for stat in snapshot.statistics('traceback')[:self.top]:
+                f.write(f'\n{stat}\n')
+                f.write('\n'.join(stat.traceback.format()) + '\n')
+        hottest = snapshot.filter_traces([tracemalloc.Filter(True, op.join(SUMMARY_PATH, '*'))]) \
+            .statistics('lineno')[:self.top]
+        _log.info('Memory profile written to: %s. Peak traced memory: %s bytes. '
+                  'Largest allocations in databricks_cicd.utils:\n%s',
+                  self.output, peak, '\n'.join(str(s) for s in hottest))
@@ -0,0 +1,105 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import json
+import os
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+TRACE_FORMATS = ['chrome', 'otlp']
+
+_log = logging.getLogger(__name__)
+
+
+class Span:
+    def __init__(self, span_id: int, parent_id: int, name: str, attributes: dict):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+
+class Tracer:
+    """
+    Records nested, timed spans per thread. When disabled, span() returns a shared no-op context manager,
+    so the instrumented code paths stay cheap.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 1
+        self._trace_id = os.urandom(16).hex()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, attributes)
+
+    @contextmanager
+    def _span(self, name: str, attributes: dict):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        stack = self._local.stack
+        with self._lock:
+            span = Span(self._next_id, stack[-1].span_id if stack else 0, name,
+                        {k: str(v) for k, v in attributes.items() if v is not None})
+            self._next_id += 1
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end_ns = time.time_ns()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def to_chrome(self) -> dict:
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for s in sorted(self.spans, key=lambda x: x.start_ns):
+            tid = threads.setdefault(s.thread_id, len(threads) + 1)
+            events.append({'name': s.name, 'cat': s.name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': s.start_ns / 1000, 'dur': (s.end_ns - s.start_ns) / 1000, 'args': s.attributes})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self) -> dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'databricks-cicd'}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'databricks_cicd'},
+                'spans': [{
+                    'traceId': self._trace_id,
+                    'spanId': f'{s.span_id:016x}',
+                    'parentSpanId': f'{s.parent_id:016x}' if s.parent_id else '',
+                    'name': s.name,
+                    'kind': 1,
+                    'startTimeUnixNano': str(s.start_ns),
+                    'endTimeUnixNano': str(s.end_ns),
+                    'attributes': [{'key': k, 'value': {'stringValue': v}} for k, v in s.attributes.items()]
+                } for s in sorted(self.spans, key=lambda x: x.start_ns)]}]}]}
+
+    def write(self, path: str, trace_format: str = 'chrome'):
+        assert trace_format in TRACE_FORMATS, f'Unknown trace format: {trace_format}'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome() if trace_format == 'chrome' else self.to_otlp(), f)
+        _log.info('Trace with %s spans written to: %s', len(self.spans), path)
@@ -0,0 +1,302 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import base64
+import hashlib
+import json
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit, quote, quote_plus, unquote, unquote_plus
+
+# request and response attributes that hold notebook or file content. They are never written to a recording
+CONTENT_KEYS = ('content', 'contents', 'data')
+# attributes that hold user names or other personal data. They are recorded as pseudonyms
+IDENTITY_KEYS = frozenset(['userName', 'displayName', 'applicationId', 'givenName', 'familyName', 'emails',
+                           'creator_user_name', 'run_as_user_name', 'owner_user_name', 'user_name',
+                           'service_principal_name'])
+RECORDING_VERSION = 2
+PSEUDONYM_PREFIX = 'redacted-'
+# the value of a SCIM filter, like filter=userName+eq+john.smith@domain.com
+_SCIM_FILTER = re.compile(r'(filter=\w+(?:\+|%20)eq(?:\+|%20))([^&]*)')
+# the user name in a workspace path, like /Users/john.smith@domain.com/project or /Repos/john.smith@domain.com/repo
+_IDENTITY_PATH = re.compile(r'(/(?:Users|Repos)/)([^/\s?&#"\'()]+)')
+_PSEUDONYM = re.compile(re.escape(PSEUDONYM_PREFIX) + r'[0-9a-f]{16}')
+# bytes read from a file at once, while streaming it
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_log = logging.getLogger(__name__)
+
+
+class StreamBody:
+    """
+    Request body of raw bytes, streamed from a file between an optional head and tail, like the parts of a multipart
+    form. Its length is known upfront, so it is sent with a Content-Length. The file is opened again on every send,
+    so a retried call sends the whole body.
+    :param opener: returns the file, opened for reading bytes
+    :param progress: called with the bytes of the file sent so far, after every chunk
+    """
+
+    def __init__(self, opener, size: int, head: bytes = b'', tail: bytes = b'', progress=None):
+        self._opener = opener
+        self._size = size
+        self._head = head
+        self._tail = tail
+        self._progress = progress
+
+    def __len__(self):
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        if self._head:
+            yield self._head
+        sent = 0
+        with self._opener() as f:
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+                yield chunk
+                sent += len(chunk)
+                if self._progress is not None:
+                    self._progress(sent)
+        if self._tail:
+            yield self._tail
+
+    def __str__(self):
+        return f'<{len(self)} bytes streamed>'
+
+
+class HttpTransport:
+    """
+    Sends requests over a single pooled HTTP session.
+    """
+
+    def __init__(self):
+        import requests
+        self._session = requests.Session()
+
+    def request(self, method: str, url: str, headers: dict, data):
+        return self._session.request(method, url, headers=headers, data=data)
+
+
+class _Pseudonyms:
+    """
+    Stable stand-ins for user names, salted per recording, so they cannot be matched across recordings.
+    Names seen while replaying are remembered, so the pseudonyms of the replaying identity can be restored.
+    """
+
+    def __init__(self, salt: str):
+        self._salt = salt
+        self._lock = threading.Lock()
+        self._names = {}
+
+    def pseudonym(self, value: str) -> str:
+        pseudonym = PSEUDONYM_PREFIX + hashlib.sha256((self._salt + value).encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            self._names[pseudonym] = value
+        return pseudonym
+
+    def all(self, obj):
+        """
+        Replaces all strings within obj by their pseudonym, recursively.
+        """
+        if isinstance(obj, str):
+            return self.pseudonym(obj)
+        if isinstance(obj, dict):
+            return {k: self.all(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [self.all(v) for v in obj]
+        return obj
+
+    def paths(self, value: str) -> str:
+        """
+        Replaces the user names in the workspace paths within value by their pseudonym.
+        """
+        return _IDENTITY_PATH.sub(lambda m: m.group(1) + self.pseudonym(m.group(2)), value)
+
+    def restore(self, value: str) -> str:
+        """
+        Replaces the known pseudonyms within value by their name.
+        """
+        with self._lock:
+            return _PSEUDONYM.sub(lambda m: self._names.get(m.group(0), m.group(0)), value)
+
+
+def _query_param(param: str, pseudonyms: _Pseudonyms) -> str:
+    key, sep, value = param.partition('=')
+    value = unquote_plus(value)
+    sanitized = pseudonyms.paths(value)
+    return param if sanitized == value else f'{key}{sep}{quote_plus(sanitized, safe="/")}'
+
+
+def _api_path(url: str, pseudonyms: _Pseudonyms) -> str:
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    sanitized = pseudonyms.paths(path)
+    path = parts.path if sanitized == path else quote(sanitized)
+    query = _SCIM_FILTER.sub(lambda m: m.group(1) + pseudonyms.pseudonym(unquote_plus(m.group(2))), parts.query)
+    query = '&'.join(_query_param(p, pseudonyms) for p in query.split('&')) if query else query
+    return f'{path}?{query}' if query else path
+
+
+def sanitize(obj, pseudonyms: _Pseudonyms):
+    """
+    Replaces content attributes with their size and hash and user names, also within workspace paths,
+    with pseudonyms, recursively.
+    """
+    if isinstance(obj, dict):
+        return {k: _redact(v) if k in CONTENT_KEYS and isinstance(v, str)
+                else pseudonyms.all(v) if k in IDENTITY_KEYS else sanitize(v, pseudonyms) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [sanitize(v, pseudonyms) for v in obj]
+    if isinstance(obj, str):
+        return pseudonyms.paths(obj)
+    return obj
+
+
+def _redact(value: str) -> dict:
+    try:
+        size = len(base64.b64decode(value, validate=True))
+    except ValueError:
+        size = len(value.encode('utf-8'))
+    return {'redacted': True, 'size': size, 'sha256': hashlib.sha256(value.encode('utf-8')).hexdigest()}
+
+
+def _sanitize_request(data, pseudonyms: _Pseudonyms):
+    if isinstance(data, StreamBody):
+        # the stream is not read again, only for its record
+        return {'redacted': True, 'size': len(data)}
+    return sanitize(json.loads(data), pseudonyms) if data else None
+
+
+def _restore(obj, pseudonyms: _Pseudonyms):
+    """
+    Reverse of sanitize: the redacted content is replaced by deterministic placeholder text of the original size.
+    Pseudonyms of names seen in the replayed requests are replaced by the names, others are kept.
+    """
+    if isinstance(obj, dict):
+        if obj.get('redacted') is True and 'sha256' in obj:
+            seed = obj['sha256'].encode('utf-8')
+            return base64.b64encode((seed * (obj['size'] // len(seed) + 1))[:obj['size']]).decode('utf-8')
+        return {k: _restore(v, pseudonyms) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restore(v, pseudonyms) for v in obj]
+    if isinstance(obj, str):
+        return pseudonyms.restore(obj)
+    return obj
+
+
+class RecordingTransport:
+    """
+    Passes all requests to another transport and writes sanitized request/response pairs with their timing
+    to a JSON lines file. Access tokens, headers and the workspace host are not recorded, user names are recorded
+    as pseudonyms.
+    """
+
+    def __init__(self, transport, path: str):
+        self._transport = transport
+        self._path = path
+        self._lock = threading.Lock()
+        salt = secrets.token_hex(16)
+        self._pseudonyms = _Pseudonyms(salt)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': RECORDING_VERSION, 'recorded_at': time.time(), 'salt': salt}) + '\n')
+
+    def request(self, method: str, url: str, headers: dict, data):
+        start = time.perf_counter()
+        response = self._transport.request(method, url, headers, data)
+        elapsed = time.perf_counter() - start
+        try:
+            response_body = sanitize(json.loads(response.content), self._pseudonyms) if response.content else None
+        except ValueError:
+            response_body = {'redacted': True, 'size': len(response.content)}
+        record = {'method': method, 'url': _api_path(url, self._pseudonyms), 'elapsed': round(elapsed, 6),
+                  'request': _sanitize_request(data, self._pseudonyms),
+                  'status': response.status_code, 'reason': response.reason, 'response': response_body}
+        with self._lock, open(self._path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        return response
+
+
+class ReplayResponse:
+    """
+    The subset of requests.Response used by this package.
+    """
+
+    def __init__(self, status_code: int, reason: str, content: bytes):
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReplayTransport:
+    """
+    Serves responses from a recording. Requests are matched by method, url and sanitized body, in the recorded order.
+    Once all recorded responses of a request are served, the last one is repeated.
+    Requests that were never recorded get an empty successful response.
+    :param speed: scale of the recorded latencies. 1 replays the original timing, 0 does not wait at all
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self._speed = speed
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._last = {}
+        self.unmatched = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            assert header.get('version') == RECORDING_VERSION, \
+                f'Unsupported recording version {header.get("version")} in {path}'
+            self._pseudonyms = _Pseudonyms(header['salt'])
+            for line in f:
+                record = json.loads(line)
+                key = self._key(record['method'], record['url'], record['request'])
+                self._responses.setdefault(key, deque()).append(record)
+        _log.info('Replaying %s recorded calls from: %s', sum(len(r) for r in self._responses.values()), path)
+
+    @staticmethod
+    def _key(method: str, url: str, body) -> tuple:
+        return method, url, json.dumps(body, sort_keys=True)
+
+    def request(self, method: str, url: str, headers: dict, data):
+        key = self._key(method, _api_path(url, self._pseudonyms), _sanitize_request(data, self._pseudonyms))
+        with self._lock:
+            queue = self._responses.get(key)
+            if queue:
+                record = queue.popleft()
+                self._last[key] = record
+            else:
+                record = self._last.get(key)
+            if record is None:
+                self.unmatched += 1
+        if record is None:
+            _log.warning('No recorded response for %s %s. Returning an empty response.', method, key[1])
+            return ReplayResponse(200, 'OK', b'{}')
+        if self._speed:
+            time.sleep(record['elapsed'] * self._speed)
+        body = record['response']
+        content = b'' if body is None else json.dumps(_restore(body, self._pseudonyms)).encode('utf-8')
+        return ReplayResponse(record['status'], record['reason'], content)
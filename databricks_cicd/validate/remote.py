@@ -0,0 +1,95 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context
+from databricks_cicd.utils.local import Local
+
+_log = logging.getLogger(__name__)
+
+
+class RemoteValidator:
+    """
+    Checks the local source files against the workspace, with a single listing per kind, all fetched in parallel.
+    The listings of other creators are kept, to find names that a deploy would create a second time.
+    The helpers get the listings of their own objects, so the checks of Validator do not list again.
+    """
+
+    def __init__(self, context: Context, workspace: helpers.WorkspaceHelper,
+                 instance_pools: helpers.InstancePoolsHelper, clusters: helpers.ClustersHelper,
+                 jobs: helpers.JobsHelper):
+        self._c = context
+        self._workspace = workspace
+        self._instance_pools = instance_pools
+        self._clusters = clusters
+        # kind, helper, name and creator of a listed spec
+        self._kinds = [
+            ('Instance pool', instance_pools, lambda s: s['instance_pool_name'],
+             lambda s: s['default_tags'].get('DatabricksInstancePoolCreatorId')),
+            ('Cluster', clusters, lambda s: s['cluster_name'], lambda s: s.get('creator_user_name')),
+            ('Job', jobs, lambda s: s['settings']['name'], lambda s: s.get('creator_user_name')),
+        ]
+        self._specs = {}
+
+    def fetch(self):
+        """
+        Looks up the deploying identity and lists all kinds, in parallel.
+        """
+        with ThreadPoolExecutor(max_workers=len(self._kinds) + 2) as executor:
+            identity = executor.submit(helpers.resolve_identity, self._c)
+            self._workspace.prefetch_remote(executor)
+            # unfiltered, so they do not wait for the identity
+            listings = {kind: executor.submit(helper.list_specs) for kind, helper, _, _ in self._kinds}
+            identity.result()
+            for kind, helper, _, _ in self._kinds:
+                self._specs[kind] = listings[kind].result()
+                helper.remote_items = helper.to_items([s for s in self._specs[kind] if helper.is_own(s)])
+
+    def _collisions(self) -> list:
+        problems = []
+        for kind, helper, name_of, creator_of in self._kinds:
+            others = {}
+            for spec in self._specs[kind]:
+                if not helper.is_own(spec) and spec.get('cluster_source') != 'JOB':
+                    others.setdefault(name_of(spec), creator_of(spec))
+            for name, local_item in helper.local_items.items():
+                remote_name = helper.remote_path(name)
+                if remote_name in others:
+                    problems.append(f'{kind} "{remote_name}" of {local_item.path} already exists in the workspace, '
+                                    f'created by {others[remote_name]}. Deploy would create a second one.')
+        return problems
+
+    def _instance_pool_references(self) -> list:
+        problems = []
+        for name, local_item in self._clusters.local_items.items():
+            try:
+                pool_name = Local.load_json(local_item.path).get('instance_pool_name')
+            except ValueError:
+                # reported by Validator
+                continue
+            if pool_name and pool_name not in self._instance_pools.local_items \
+                    and pool_name not in self._instance_pools.remote_items:
+                problems.append(f'Instance pool "{pool_name}" referenced in cluster "{name}" not found')
+        return problems
+
+    def validate(self) -> list:
+        """
+        Returns the list of all problems found. Call fetch first.
+        """
+        problems = self._instance_pool_references() + self._collisions()
+        _log.info('Checked against %s workspace objects, %s', len(self._workspace.remote_items),
+                  ', '.join(f'{len(self._specs[kind])} {kind.lower()}s' for kind, _, _, _ in self._kinds))
+        return problems
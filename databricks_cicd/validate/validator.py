@@ -0,0 +1,173 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import hashlib
+import io
+import json
+from os import path as op
+from concurrent.futures import ThreadPoolExecutor
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd import __version__
+from databricks_cicd.utils import Context, Item, codec
+
+PYTHON_NOTEBOOK_HEADER = '# Databricks notebook source\n'
+CACHE_VERSION = 1
+
+_log = logging.getLogger(__name__)
+
+
+class Validator:
+    """
+    Validates all local source files in a worker pool. Each file is read once and all checks that apply to it run
+    on that content. Results are cached by the content hash of the file and a hash of everything else the checks
+    depend on (validation config, the set of notebooks and clusters), so unchanged files are skipped on the next run.
+    """
+
+    def __init__(self, context: Context, workspace: helpers.WorkspaceHelper, clusters: helpers.ClustersHelper,
+                 jobs: helpers.JobsHelper):
+        self._c = context
+        self._conf = context.conf.validate
+        self._workspace = workspace
+        self._clusters = clusters
+        self._jobs = jobs
+        # results checked against a workspace depend on more than the files, so they are not cached
+        self._cache_file = op.join(context.conf.local_path, self._conf.cache_file) \
+            if self._conf.cache_file and context.api is None else None
+        self.cached = 0
+
+    def _config_hash(self) -> str:
+        state = {
+            'version': __version__,
+            'cache_version': CACHE_VERSION,
+            'validate': {k: v for k, v in vars(self._conf).items() if not k.startswith('_')},
+            'notebooks': sorted(self._workspace.local_items),
+            'clusters': sorted(self._clusters.local_items),
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _load_cache(self, config_hash: str) -> dict:
+        if self._cache_file and op.isfile(self._cache_file):
+            try:
+                with open(self._cache_file, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('config') == config_hash:
+                    return cache.get('files', {})
+            except (OSError, ValueError):
+                _log.warning('Ignoring invalid validation cache: %s', self._cache_file)
+        return {}
+
+    def _save_cache(self, config_hash: str, files: dict):
+        if self._cache_file:
+            try:
+                with open(self._cache_file, 'w', encoding='utf-8') as f:
+                    json.dump({'config': config_hash, 'files': files}, f)
+            except OSError as e:
+                # e.g. a read-only checkout. The files are validated, only the next run checks them again
+                _log.warning('Cannot write the validation cache %s: %s', self._cache_file, e)
+
+    def _files(self) -> list:
+        """
+        Returns a list of (kind, name, local item) of all files to validate.
+        """
+        files = [('workspace', k, v) for k, v in self._workspace.local_items.items()
+                 if not v.is_dir and v.language == 'PYTHON']
+        files += [('cluster', k, v) for k, v in self._clusters.local_items.items()]
+        files += [('job', k, v) for k, v in self._jobs.local_items.items()]
+        return files
+
+    def _check_notebook(self, local_item: Item, data: bytes) -> list:
+        problems = []
+        if self._conf.workspace_python_notebook_header:
+            file_header = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').readline()
+            if file_header != PYTHON_NOTEBOOK_HEADER:
+                problems.append(f'Invalid Python notebook header "{file_header}" in {local_item.path}.')
+        return problems
+
+    def _check_cluster(self, name: str, local_item: Item, data: bytes) -> list:
+        problems = []
+        if self._conf.clusters_no_nested_folders and '/' in name:
+            problems.append(f'Cluster file {local_item.path} is in a subfolder. '
+                            'All cluster files should be in a single folder without nesting.')
+        if self._conf.clusters_name:
+            cluster_name = codec.loads(data).get('cluster_name', '')
+            if not cluster_name:
+                problems.append(f'File {local_item.path} has no cluster_name.')
+            elif op.splitext(op.basename(local_item.path))[0] != cluster_name:
+                problems.append(f'File {local_item.path} has different name than the cluster "{cluster_name}" '
+                                'defined in it.')
+        return problems
+
+    def _check_job(self, name: str, local_item: Item, data: bytes) -> list:
+        problems = []
+        if self._conf.jobs_no_nested_folders and '/' in name:
+            problems.append(f'Job file {local_item.path} is in a subfolder. '
+                            'All job files should be in a single folder without nesting.')
+        item = Item(path=local_item.path, kind=local_item.kind, content=codec.loads(data))
+        job_name = item.content.get('name', '')
+        if self._conf.jobs_name:
+            if not job_name:
+                problems.append(f'File {local_item.path} has no job name.')
+            elif op.splitext(op.basename(local_item.path))[0] != job_name:
+                problems.append(f'File {local_item.path} has different name than the job "{job_name}" defined in it.')
+        if self._conf.jobs_existing_clusters and job_name:
+            problems += self._collect(self._jobs.validate_existing_cluster_name, item)
+        if self._conf.jobs_notebook_paths and job_name:
+            problems += self._collect(self._jobs.validate_notebook_path, item)
+        return problems
+
+    @staticmethod
+    def _collect(check, *args) -> list:
+        try:
+            check(*args)
+        except AssertionError as e:
+            return [str(e)]
+        return []
+
+    def _validate_file(self, kind: str, name: str, local_item: Item, cache: dict) -> tuple:
+        with open(local_item.path, 'rb') as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        cached = cache.get(local_item.path)
+        if cached and cached['hash'] == content_hash:
+            return content_hash, cached['problems'], True
+        try:
+            if kind == 'workspace':
+                problems = self._check_notebook(local_item, data)
+            elif kind == 'cluster':
+                problems = self._check_cluster(name, local_item, data)
+            else:
+                problems = self._check_job(name, local_item, data)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            problems = [f'File {local_item.path} cannot be validated: {e!r}']
+        return content_hash, problems, False
+
+    def validate(self) -> list:
+        """
+        Runs all checks and returns the list of all problems found.
+        """
+        config_hash = self._config_hash()
+        cache = self._load_cache(config_hash)
+        files = self._files()
+        with ThreadPoolExecutor(max_workers=self._conf.workers) as executor:
+            results = list(executor.map(lambda f: self._validate_file(*f, cache), files))
+        problems = []
+        new_cache = {}
+        for (_, _, local_item), (content_hash, file_problems, from_cache) in zip(files, results):
+            problems += file_problems
+            self.cached += from_cache
+            new_cache[local_item.path] = {'hash': content_hash, 'problems': file_problems}
+        self._save_cache(config_hash, new_cache)
+        _log.info('Validated %s files, %s of them unchanged since the last run.', len(files), self.cached)
+        return problems
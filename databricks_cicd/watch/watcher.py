@@ -0,0 +1,235 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import queue
+import threading
+import time
+from os import path as op
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+_log = logging.getLogger(__name__)
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, events: queue.Queue):
+        self._events = events
+
+    def on_any_event(self, event):
+        self._events.put(event.src_path)
+        if getattr(event, 'dest_path', None):
+            self._events.put(event.dest_path)
+
+
+class _Poller(threading.Thread):
+    """
+    Scans the local files every poll_interval and reports the paths, whose size or modification time changed.
+    """
+
+    def __init__(self, roots: list, poll_interval: float, events: queue.Queue):
+        super().__init__(name='cicd-watch-poller', daemon=True)
+        self._roots = roots
+        self._poll_interval = poll_interval
+        self._events = events
+        self._stopped = threading.Event()
+
+    def _snapshot(self) -> dict:
+        snapshot = {}
+        for root in self._roots:
+            for cur_path, dirs, files in os.walk(root):
+                for f in dirs + files:
+                    try:
+                        stat = os.stat(op.join(cur_path, f))
+                    except FileNotFoundError:
+                        continue
+                    snapshot[op.join(cur_path, f)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def run(self):
+        previous = self._snapshot()
+        while not self._stopped.wait(self._poll_interval):
+            current = self._snapshot()
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self._events.put(path)
+            previous = current
+
+    def stop(self):
+        self._stopped.set()
+
+
+class Watcher:
+    """
+    Keeps the remote listing of all helpers in memory and pushes every local change as soon as the local files are
+    quiet for `debounce` seconds. Only the affected kinds are scanned again and only the changed items are written.
+    A full deploy runs every resync_interval, for changes made in the workspace or missed by the watcher.
+    """
+
+    def __init__(self, context: Context, workspace: helpers.WorkspaceHelper,
+                 instance_pools: helpers.InstancePoolsHelper, clusters: helpers.ClustersHelper,
+                 jobs: helpers.JobsHelper, dbfs: helpers.DBFSHelper):
+        self._c = context
+        conf = context.conf
+        # deploy order. Jobs reference notebooks and clusters, clusters reference instance pools
+        self._helpers = [(kind, helper) for kind, helper in [('workspace', workspace),
+                                                             ('instance_pools', instance_pools),
+                                                             ('clusters', clusters), ('jobs', jobs), ('dbfs', dbfs)]
+                         if getattr(conf, kind).deploy]
+        self._roots = {kind: op.abspath(op.join(conf.local_path, getattr(conf, kind).local_sub_dir))
+                       for kind, _ in self._helpers}
+        self._events = queue.Queue()
+        self._observer = None
+
+    def _start(self):
+        conf = self._c.conf
+        if conf.watch.use_watchdog and Observer is not None:
+            self._observer = Observer()
+            for root in self._roots.values():
+                if op.isdir(root):
+                    self._observer.schedule(_EventHandler(self._events), root, recursive=True)
+            _log.info('Watching %s with watchdog', conf.local_path)
+        else:
+            self._observer = _Poller(list(self._roots.values()), conf.watch.poll_interval, self._events)
+            _log.info('Watching %s by scanning every %ss', conf.local_path, conf.watch.poll_interval)
+        self._observer.start()
+
+    def _stop(self):
+        self._observer.stop()
+        self._observer.join()
+
+    def _kind(self, path: str):
+        path = op.abspath(path)
+        for kind, root in self._roots.items():
+            if path == root or path.startswith(root + os.sep):
+                return kind
+        return None
+
+    def _next_batch(self, timeout: float) -> set:
+        """
+        Waits up to timeout for a change, then collects changes until none arrived for `debounce` seconds.
+        Returns the changed paths, or an empty set on timeout.
+        """
+        try:
+            paths = {self._events.get(timeout=timeout)}
+        except queue.Empty:
+            return set()
+        while True:
+            try:
+                paths.add(self._events.get(timeout=self._c.conf.watch.debounce))
+            except queue.Empty:
+                return paths
+
+    def _changed_names(self, helper: helpers.DeployHelperBase, paths: set) -> set:
+        """
+        Scans the local items again. Returns the names of the added, removed and changed items.
+        """
+        previous = helper.local_items
+        helper.local_items = None
+        current = helper.local_items
+        changed = {name for name, item in current.items() if op.abspath(item.path) in paths}
+        return (previous.keys() ^ current.keys()) | changed
+
+    def push(self, paths: set):
+        """
+        Pushes the items of the changed local paths.
+        """
+        start = time.perf_counter()
+        self._c.api.reset_safety_limit()
+        kinds = {self._kind(p) for p in paths}
+        paths = {op.abspath(p) for p in paths}
+        pushed = 0
+        for kind, helper in self._helpers:
+            if kind not in kinds:
+                continue
+            names = self._changed_names(helper, paths)
+            if not names:
+                continue
+            try:
+                helper.push(names, force=kind == 'dbfs')
+                pushed += len(names)
+            except Exception as e:
+                # a file in the middle of an edit, like a job with invalid JSON, must not stop the watch
+                _log.error('Failed to push %s %s: %s', kind.replace('_', ' '), ', '.join(sorted(names)), e)
+                helper.remote_items = None
+        if pushed:
+            _log.info('Pushed %s changes in %.2fs', pushed, time.perf_counter() - start)
+
+    @staticmethod
+    def _keep_hashes(previous: dict, remote_items: dict):
+        """
+        Keeps the hashes of notebooks that did not change since the last listing. Notebooks written by the watch were
+        not listed since, so their hash is kept as well: a change in the workspace between the write and the next
+        listing is only seen once the notebook is written again.
+        """
+        for name, remote_item in remote_items.items():
+            known = previous.get(name)
+            if known is None or known.hash is None or known.is_dir:
+                continue
+            if known.modified_at is None \
+                    or (known.size, known.modified_at) == (remote_item.size, remote_item.modified_at):
+                remote_item.hash = known.hash
+
+    def resync(self):
+        """
+        Lists all kinds again and deploys all local items. Cached hashes of notebooks that did not change remotely
+        are kept, so they are not exported again.
+        """
+        _log.info('Resync...')
+        self._c.api.reset_safety_limit()
+        for kind, helper in self._helpers:
+            # only notebooks have cached hashes. Other kinds may be stale, and would be listed twice
+            previous = helper.remote_items if kind == 'workspace' else None
+            helper.local_items = None
+            helper.remote_items = None
+            try:
+                if previous is not None:
+                    self._keep_hashes(previous, helper.remote_items)
+                helper.deploy()
+            except Exception as e:
+                _log.error('Failed to resync %s: %s', kind.replace('_', ' '), e)
+                helper.remote_items = None
+
+    def watch(self, iterations: int = None):
+        """
+        Deploys once, then pushes changes until interrupted.
+        :param iterations: stops after this many batches of changes or resyncs. Forever if None
+        """
+        conf = self._c.conf.watch
+        for kind, helper in self._helpers:
+            _log.info('Deploying %s...', kind.replace('_', ' '))
+            helper.deploy()
+        self._start()
+        next_resync = time.monotonic() + conf.resync_interval if conf.resync_interval else None
+        try:
+            while iterations is None or iterations > 0:
+                timeout = None if next_resync is None else max(next_resync - time.monotonic(), 0)
+                paths = self._next_batch(timeout)
+                if paths:
+                    self.push(paths)
+                else:
+                    self.resync()
+                    next_resync = time.monotonic() + conf.resync_interval
+                if iterations is not None:
+                    iterations -= 1
+        finally:
+            self._stop()
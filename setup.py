@@ -24,6 +24,7 @@ setup(
     package_data={'': ['*.ini']},
     include_package_data=True,
     install_requires=io.open('requirements.txt', encoding='utf-8').read(),
+    extras_require={'fast': ['orjson>=3.6'], 'watch': ['watchdog>=2.1']},
     entry_points='''
         [console_scripts]
         cicd=databricks_cicd.cli:cli
@@ -0,0 +1,99 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import sys
+from os import path as op
+import pytest
+
+TESTS_DIR = op.dirname(op.abspath(__file__))
+REPO_DIR = op.dirname(TESTS_DIR)
+sys.path.insert(0, TESTS_DIR)
+sys.path.insert(0, op.join(REPO_DIR, 'benchmarks'))
+sys.path.insert(0, REPO_DIR)
+
+from stub_server import StubServer  # noqa: E402 pylint: disable=wrong-import-position
+
+TARGET_PATH = '/t'
+USER_NAME = 'cicd@example.com'
+
+
+NOTEBOOK = '# Databricks notebook source\nprint("{name}")\n'
+
+
+def _write(path, content):
+    os.makedirs(op.dirname(path), exist_ok=True)
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    with open(path, mode) as f:
+        f.write(content if isinstance(content, (str, bytes)) else json.dumps(content, indent=2))
+
+
+def write_source(root: str):
+    """
+    A small source tree, in which every kind depends on another: job_a runs nb_a on cluster_a, which uses pool_a.
+    """
+    for name in ['nb_a', 'nb_b', 'lib/nb_c']:
+        _write(op.join(root, 'workspace', f'{name}.py'), NOTEBOOK.format(name=name))
+    _write(op.join(root, 'instance_pools', 'pool_a.json'),
+           {'instance_pool_name': 'pool_a', 'node_type_id': 'Standard_DS3_v2', 'min_idle_instances': 0})
+    _write(op.join(root, 'clusters', 'cluster_a.json'),
+           {'cluster_name': 'cluster_a', 'spark_version': '10.4.x-scala2.12', 'num_workers': 1,
+            'instance_pool_name': 'pool_a'})
+    _write(op.join(root, 'jobs', 'job_a.json'),
+           {'name': 'job_a', 'max_concurrent_runs': 1,
+            'tasks': [{'task_key': 'first', 'notebook_task': {'notebook_path': 'nb_a'},
+                       'existing_cluster_name': 'cluster_a'},
+                      {'task_key': 'second', 'depends_on': [{'task_key': 'first'}],
+                       'notebook_task': {'notebook_path': 'lib/nb_c'}, 'existing_cluster_name': 'cluster_a'}]})
+    _write(op.join(root, 'jobs', 'job_b.json'),
+           {'name': 'job_b', 'tasks': [{'task_key': 'only', 'notebook_task': {'notebook_path': 'nb_b'},
+                                        'new_cluster': {'spark_version': '10.4.x-scala2.12', 'num_workers': 1}}]})
+    _write(op.join(root, 'dbfs', 'conf', 'settings.json'), {'env': 'test'})
+    return root
+
+
+@pytest.fixture
+def source(tmp_path):
+    return write_source(str(tmp_path / 'source'))
+
+
+@pytest.fixture
+def server():
+    """
+    The stand-in API with empty target folders.
+    """
+    with StubServer(user_name=USER_NAME) as stub:
+        stub.state.workspace_mkdirs(TARGET_PATH)
+        stub.state.dbfs_mkdirs(TARGET_PATH)
+        yield stub
+
+
+def run_cicd(*args, cwd=None, env=None) -> subprocess.CompletedProcess:
+    """
+    Runs cicd in a separate process, so each run starts with a fresh logging setup and config.
+    :param env: environment variables, on top of the ones of the tests
+    """
+    env = dict(os.environ, **(env or {}), PYTHONPATH=os.pathsep.join([REPO_DIR, os.environ.get('PYTHONPATH', '')]))
+    return subprocess.run([sys.executable, '-m', 'databricks_cicd.cli'] + [str(a) for a in args],
+                          capture_output=True, text=True, env=env, cwd=cwd or REPO_DIR)
+
+
+def target_args(server: StubServer, local_path: str, config_file: str = None) -> list:
+    """
+    Arguments of deploy, drift and similar commands, for the target folders of the server fixture.
+    """
+    args = ['-w', server.url, '-u', USER_NAME, '-t', 'token', '-tp', TARGET_PATH, '-np', 'dev_', '-lp', local_path]
+    return args + (['-c', config_file] if config_file else [])
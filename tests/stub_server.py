@@ -0,0 +1,742 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A local stand-in for the Databricks REST API, used by tests and benchmarks.
+
+It keeps the whole workspace state in memory and implements every route in databricks_cicd.utils.api.Endpoints:
+the workspace tree, paginated jobs and their runs, clusters, instance pools, DBFS with handles and blocks,
+multipart and raw file uploads and SCIM lookups.
+Latency, 429 and 5xx responses can be injected and every call is counted per route.
+
+    with StubServer(latency=0.01) as server:
+        deploy against server.url, e.g. `cicd deploy -w http://127.0.0.1:PORT ...`
+        server.calls['2.1/jobs/list']
+
+It can also run standalone: python tests/stub_server.py --port 8080
+"""
+
+import argparse
+import base64
+import json
+import posixpath
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+MAX_BLOCK_SIZE = 1024 * 1024
+MAX_JOBS_LIMIT = 25
+# raw uploads address the file by the rest of the url: 2.0/fs/files/<path>
+FILES_ROUTE = '2.0/fs/files'
+# settings of jobs/update that are merged by key
+JOB_SETTINGS_KEYS = {'tasks': 'task_key', 'job_clusters': 'job_cluster_key'}
+# settings that the server sets on every job, whatever was sent
+JOB_SERVER_SETTINGS = {'format': 'MULTI_TASK'}
+
+
+class StubError(Exception):
+    def __init__(self, status: int, error_code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.error_code = error_code
+        self.message = message
+
+
+def _not_found(message):
+    return StubError(404, 'RESOURCE_DOES_NOT_EXIST', message)
+
+
+def _invalid(message):
+    return StubError(400, 'INVALID_PARAMETER_VALUE', message)
+
+
+class StubState:
+    """
+    In-memory state of a single workspace.
+    """
+
+    def __init__(self, user_name: str, user_id: str):
+        self.lock = threading.RLock()
+        self.user_name = user_name
+        self.user_id = user_id
+        self.users = [{'id': user_id, 'userName': user_name, 'active': True}]
+        self.service_principals = []
+        self.next_id = 1000
+        self.workspace = {'/': {'object_type': 'DIRECTORY', 'object_id': 0}}
+        self.jobs = OrderedDict()
+        self.clusters = OrderedDict()
+        self.instance_pools = OrderedDict()
+        self.dbfs = {'/': {'is_dir': True, 'data': None, 'modification_time': 0}}
+        self.handles = {}
+        self.runs = OrderedDict()
+        # seconds a job run takes, and the result state of runs by job name. Runs of other jobs succeed
+        self.run_duration = 0.0
+        self.run_results = {}
+
+    def new_id(self) -> int:
+        self.next_id += 1
+        return self.next_id
+
+    @staticmethod
+    def now() -> int:
+        return int(time.time() * 1000)
+
+    # ----- workspace -----------------------------------------------------------------------------------------------
+    def workspace_mkdirs(self, path: str):
+        parts = [p for p in path.split('/') if p]
+        for i in range(1, len(parts) + 1):
+            current = '/' + '/'.join(parts[:i])
+            obj = self.workspace.get(current)
+            if obj is None:
+                self.workspace[current] = {'object_type': 'DIRECTORY', 'object_id': self.new_id(),
+                                           'modified_at': self.now()}
+            elif obj['object_type'] != 'DIRECTORY':
+                raise StubError(400, 'RESOURCE_ALREADY_EXISTS', f'{current} exists and is not a directory')
+
+    def workspace_children(self, path: str) -> list:
+        prefix = path.rstrip('/') + '/'
+        return sorted(p for p in self.workspace if p != path and p.startswith(prefix) and '/' not in p[len(prefix):])
+
+    # ----- dbfs ----------------------------------------------------------------------------------------------------
+    def dbfs_mkdirs(self, path: str):
+        parts = [p for p in path.split('/') if p]
+        for i in range(1, len(parts) + 1):
+            current = '/' + '/'.join(parts[:i])
+            obj = self.dbfs.get(current)
+            if obj is None:
+                self.dbfs[current] = {'is_dir': True, 'data': None, 'modification_time': self.now()}
+            elif not obj['is_dir']:
+                raise StubError(400, 'RESOURCE_ALREADY_EXISTS', f'{current} exists and is not a directory')
+
+    def dbfs_children(self, path: str) -> list:
+        prefix = path.rstrip('/') + '/'
+        return sorted(p for p in self.dbfs if p != path and p.startswith(prefix) and '/' not in p[len(prefix):])
+
+    def dbfs_write(self, path: str, data: bytes, overwrite: bool):
+        existing = self.dbfs.get(path)
+        if existing is not None and (existing['is_dir'] or not overwrite):
+            raise StubError(400, 'RESOURCE_ALREADY_EXISTS', f'{path} already exists')
+        self.dbfs_mkdirs(posixpath.dirname(path))
+        self.dbfs[path] = {'is_dir': False, 'data': bytes(data), 'modification_time': self.now()}
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('utf-8')
+
+
+def _unb64(data: str) -> bytes:
+    try:
+        return base64.b64decode(data or '', validate=True)
+    except ValueError as e:
+        raise _invalid(f'Invalid base64: {e}') from e
+
+
+def _path(params: dict, key='path') -> str:
+    path = params.get(key)
+    if not path or not path.startswith('/'):
+        raise _invalid(f'Path ({path}) must be absolute')
+    return path.rstrip('/') or '/'
+
+
+# ----- routes --------------------------------------------------------------------------------------------------------
+def workspace_list(state: StubState, params: dict):
+    path = _path(params)
+    obj = state.workspace.get(path)
+    if obj is None:
+        raise _not_found(f'Path ({path}) doesn\'t exist.')
+    if obj['object_type'] != 'DIRECTORY':
+        return {'objects': [dict(_workspace_object(path, obj))]}
+    objects = [_workspace_object(p, state.workspace[p]) for p in state.workspace_children(path)]
+    return {'objects': objects} if objects else {}
+
+
+def _workspace_object(path: str, obj: dict) -> dict:
+    result = {'path': path, 'object_type': obj['object_type'], 'object_id': obj['object_id']}
+    if obj['object_type'] == 'NOTEBOOK':
+        result['language'] = obj['language']
+        result['modified_at'] = obj['modified_at']
+        result['size'] = len(obj['content'])
+    return result
+
+
+def workspace_export(state: StubState, params: dict):
+    path = _path(params)
+    obj = state.workspace.get(path)
+    if obj is None:
+        raise _not_found(f'Path ({path}) doesn\'t exist.')
+    if obj['object_type'] != 'NOTEBOOK':
+        raise _invalid(f'{path} is not a notebook')
+    return {'content': _b64(obj['content']), 'file_type': 'py'}
+
+
+def workspace_import(state: StubState, params: dict):
+    path = _path(params)
+    parent = posixpath.dirname(path)
+    if state.workspace.get(parent, {}).get('object_type') != 'DIRECTORY':
+        raise _not_found(f'The parent folder ({parent}) does not exist.')
+    existing = state.workspace.get(path)
+    if existing is not None and not params.get('overwrite'):
+        raise StubError(400, 'RESOURCE_ALREADY_EXISTS', f'{path} already exists.')
+    if existing is not None and existing['object_type'] == 'DIRECTORY':
+        raise StubError(400, 'RESOURCE_ALREADY_EXISTS', f'{path} is a directory.')
+    if params.get('language') not in ('PYTHON', 'SCALA', 'SQL', 'R'):
+        raise _invalid(f'Invalid language: {params.get("language")}')
+    state.workspace[path] = {'object_type': 'NOTEBOOK', 'language': params['language'],
+                             'content': _unb64(params.get('content')),
+                             'object_id': existing['object_id'] if existing else state.new_id(),
+                             'modified_at': state.now()}
+    return {}
+
+
+def workspace_delete(state: StubState, params: dict):
+    path = _path(params)
+    if path not in state.workspace:
+        raise _not_found(f'Path ({path}) doesn\'t exist.')
+    children = [p for p in state.workspace if p.startswith(path.rstrip('/') + '/')]
+    if children and not params.get('recursive'):
+        raise StubError(400, 'DIRECTORY_NOT_EMPTY', f'Folder ({path}) is not empty')
+    for p in children + [path]:
+        del state.workspace[p]
+    return {}
+
+
+def workspace_mkdirs(state: StubState, params: dict):
+    state.workspace_mkdirs(_path(params))
+    return {}
+
+
+def jobs_list(state: StubState, params: dict):
+    limit = int(params.get('limit', 20))
+    offset = int(params.get('offset', 0))
+    if limit < 1 or limit > MAX_JOBS_LIMIT:
+        raise _invalid(f'limit must be between 1 and {MAX_JOBS_LIMIT}')
+    expand_tasks = str(params.get('expand_tasks', 'false')).lower() == 'true'
+    jobs = list(state.jobs.values())[offset:offset + limit]
+    result = []
+    for job in jobs:
+        job = json.loads(json.dumps(job))
+        if not expand_tasks:
+            job['settings'].pop('tasks', None)
+            job['settings'].pop('job_clusters', None)
+        result.append(job)
+    response = {'has_more': offset + limit < len(state.jobs)}
+    if result:
+        response['jobs'] = result
+    return response
+
+
+def _job(state: StubState, params: dict) -> dict:
+    job = state.jobs.get(int(params.get('job_id', 0)))
+    if job is None:
+        raise _not_found(f'Job {params.get("job_id")} does not exist.')
+    return job
+
+
+def jobs_get(state: StubState, params: dict):
+    return _job(state, params)
+
+
+def jobs_create(state: StubState, params: dict):
+    job_id = state.new_id()
+    state.jobs[job_id] = {'job_id': job_id, 'creator_user_name': state.user_name, 'created_time': state.now(),
+                          'settings': dict(params, **JOB_SERVER_SETTINGS)}
+    return {'job_id': job_id}
+
+
+def jobs_reset(state: StubState, params: dict):
+    job = _job(state, params)
+    if 'new_settings' not in params:
+        raise _invalid('new_settings is required')
+    job['settings'] = dict(params['new_settings'], **JOB_SERVER_SETTINGS)
+    return {}
+
+
+def jobs_update(state: StubState, params: dict):
+    job = _job(state, params)
+    new_settings = params.get('new_settings') or {}
+    fields_to_remove = params.get('fields_to_remove') or []
+    settings = job['settings']
+    for field in fields_to_remove:
+        top, _, key = field.partition('/')
+        if top in JOB_SERVER_SETTINGS:
+            raise _invalid(f'{field} cannot be removed')
+        if top in new_settings and not key:
+            raise _invalid(f'{field} is both updated and removed')
+        if key:
+            if top not in JOB_SETTINGS_KEYS:
+                raise _invalid(f'Cannot remove nested field {field}')
+            elements = settings.get(top) or []
+            kept = [e for e in elements if e.get(JOB_SETTINGS_KEYS[top]) != key]
+            if len(kept) == len(elements):
+                raise _invalid(f'{field} does not exist')
+            settings[top] = kept
+        else:
+            settings.pop(field, None)
+    for field, value in new_settings.items():
+        if field in JOB_SETTINGS_KEYS:
+            key = JOB_SETTINGS_KEYS[field]
+            merged = {e[key]: e for e in settings.get(field) or []}
+            merged.update({e[key]: e for e in value})
+            settings[field] = list(merged.values())
+        elif field not in JOB_SERVER_SETTINGS:
+            settings[field] = value
+    return {}
+
+
+def jobs_delete(state: StubState, params: dict):
+    _job(state, params)
+    del state.jobs[int(params['job_id'])]
+    return {}
+
+
+def jobs_run_now(state: StubState, params: dict):
+    job = _job(state, params)
+    run_id = state.new_id()
+    state.runs[run_id] = {'run_id': run_id, 'job_id': job['job_id'], 'run_name': job['settings'].get('name'),
+                          'start_time': state.now(), 'run_page_url': f'stub://runs/{run_id}', 'cancelled': False}
+    return {'run_id': run_id, 'number_in_job': run_id}
+
+
+def _run(state: StubState, params: dict) -> dict:
+    run = state.runs.get(int(params.get('run_id', 0)))
+    if run is None:
+        raise _not_found(f'Run {params.get("run_id")} does not exist.')
+    return run
+
+
+def jobs_runs_get(state: StubState, params: dict):
+    run = dict(_run(state, params))
+    elapsed = (state.now() - run['start_time']) / 1000
+    if run.pop('cancelled'):
+        run['state'] = {'life_cycle_state': 'TERMINATED', 'result_state': 'CANCELED', 'state_message': 'Cancelled'}
+    elif elapsed < state.run_duration * 0.2:
+        run['state'] = {'life_cycle_state': 'PENDING', 'state_message': 'Waiting for cluster'}
+    elif elapsed < state.run_duration:
+        run['state'] = {'life_cycle_state': 'RUNNING', 'state_message': ''}
+    else:
+        result = state.run_results.get(run['run_name'], 'SUCCESS')
+        run['state'] = {'life_cycle_state': 'TERMINATED', 'result_state': result, 'state_message': ''}
+    return run
+
+
+def jobs_runs_cancel(state: StubState, params: dict):
+    _run(state, params)['cancelled'] = True
+    return {}
+
+
+def _pool(state: StubState, params: dict) -> dict:
+    pool = state.instance_pools.get(params.get('instance_pool_id'))
+    if pool is None:
+        raise _not_found(f'Instance pool {params.get("instance_pool_id")} does not exist.')
+    return pool
+
+
+def instance_pools_list(state: StubState, _):
+    pools = list(state.instance_pools.values())
+    return {'instance_pools': pools} if pools else {}
+
+
+def instance_pools_create(state: StubState, params: dict):
+    if not params.get('instance_pool_name'):
+        raise _invalid('instance_pool_name is required')
+    pool_id = f'pool-{state.new_id()}'
+    state.instance_pools[pool_id] = dict(params, instance_pool_id=pool_id, state='ACTIVE', stats={'idle_count': 0},
+                                         default_tags={'DatabricksInstancePoolCreatorId': state.user_id,
+                                                       'DatabricksInstancePoolId': pool_id})
+    return {'instance_pool_id': pool_id}
+
+
+def instance_pools_edit(state: StubState, params: dict):
+    pool = _pool(state, params)
+    state.instance_pools[pool['instance_pool_id']] = dict(
+        params, state=pool['state'], stats=pool['stats'], default_tags=pool['default_tags'])
+    return {}
+
+
+def instance_pools_delete(state: StubState, params: dict):
+    del state.instance_pools[_pool(state, params)['instance_pool_id']]
+    return {}
+
+
+def _cluster(state: StubState, params: dict) -> dict:
+    cluster = state.clusters.get(params.get('cluster_id'))
+    if cluster is None:
+        raise _not_found(f'Cluster {params.get("cluster_id")} does not exist')
+    return cluster
+
+
+def clusters_list(state: StubState, _):
+    clusters = list(state.clusters.values())
+    return {'clusters': clusters} if clusters else {}
+
+
+def clusters_create(state: StubState, params: dict):
+    if not params.get('cluster_name'):
+        raise _invalid('cluster_name is required')
+    cluster_id = f'0101-{state.new_id()}-stub'
+    state.clusters[cluster_id] = dict(params, cluster_id=cluster_id, creator_user_name=state.user_name,
+                                      cluster_source='API', state='PENDING', start_time=state.now())
+    return {'cluster_id': cluster_id}
+
+
+def clusters_edit(state: StubState, params: dict):
+    cluster = _cluster(state, params)
+    state.clusters[cluster['cluster_id']] = dict(
+        params, creator_user_name=cluster['creator_user_name'], cluster_source=cluster['cluster_source'],
+        state=cluster['state'], start_time=cluster['start_time'])
+    return {}
+
+
+def clusters_delete(state: StubState, params: dict):
+    del state.clusters[_cluster(state, params)['cluster_id']]
+    return {}
+
+
+def _dbfs_object(state: StubState, path: str) -> dict:
+    obj = state.dbfs.get(path)
+    if obj is None:
+        raise _not_found(f'No file or directory exists on path {path}.')
+    return obj
+
+
+def _dbfs_status(path: str, obj: dict) -> dict:
+    return {'path': path, 'is_dir': obj['is_dir'], 'file_size': 0 if obj['is_dir'] else len(obj['data']),
+            'modification_time': obj['modification_time']}
+
+
+def dbfs_list(state: StubState, params: dict):
+    path = _path(params)
+    obj = _dbfs_object(state, path)
+    if not obj['is_dir']:
+        return {'files': [_dbfs_status(path, obj)]}
+    files = [_dbfs_status(p, state.dbfs[p]) for p in state.dbfs_children(path)]
+    return {'files': files} if files else {}
+
+
+def dbfs_read(state: StubState, params: dict):
+    path = _path(params)
+    obj = _dbfs_object(state, path)
+    if obj['is_dir']:
+        raise _invalid(f'{path} is a directory')
+    offset = int(params.get('offset', 0))
+    length = int(params.get('length', MAX_BLOCK_SIZE))
+    if length > MAX_BLOCK_SIZE:
+        raise StubError(400, 'MAX_READ_SIZE_EXCEEDED', f'Cannot read more than {MAX_BLOCK_SIZE} bytes')
+    data = obj['data'][offset:offset + length]
+    return {'bytes_read': len(data), 'data': _b64(data)}
+
+
+def dbfs_put(state: StubState, params: dict):
+    contents = params.get('contents')
+    # a multipart upload streams the file as it is, without the limit of the base64 contents
+    if isinstance(contents, bytes):
+        data = contents
+    else:
+        data = _unb64(contents)
+        if len(data) > MAX_BLOCK_SIZE:
+            raise StubError(400, 'MAX_BLOCK_SIZE_EXCEEDED', 'Use the streaming API for files larger than 1MB')
+    state.dbfs_write(_path(params), data, params.get('overwrite') in (True, 'true'))
+    return {}
+
+
+def fs_files_upload(state: StubState, params: dict):
+    state.dbfs_write(_path(params), params.get('contents', b''), params.get('overwrite') == 'true')
+    return {}
+
+
+def dbfs_delete(state: StubState, params: dict):
+    path = _path(params)
+    if path not in state.dbfs:
+        return {}
+    children = [p for p in state.dbfs if p.startswith(path.rstrip('/') + '/')]
+    if children and not params.get('recursive'):
+        raise StubError(400, 'IO_ERROR', f'Directory {path} is not empty')
+    for p in children + [path]:
+        del state.dbfs[p]
+    return {}
+
+
+def dbfs_mkdirs(state: StubState, params: dict):
+    state.dbfs_mkdirs(_path(params))
+    return {}
+
+
+def dbfs_create(state: StubState, params: dict):
+    path = _path(params)
+    existing = state.dbfs.get(path)
+    if existing is not None and (existing['is_dir'] or not params.get('overwrite')):
+        raise StubError(400, 'RESOURCE_ALREADY_EXISTS', f'{path} already exists')
+    handle = state.new_id()
+    state.handles[handle] = {'path': path, 'data': bytearray(), 'overwrite': bool(params.get('overwrite'))}
+    return {'handle': handle}
+
+
+def _handle(state: StubState, params: dict) -> dict:
+    handle = state.handles.get(int(params.get('handle', 0)))
+    if handle is None:
+        raise _not_found(f'Handle {params.get("handle")} does not exist')
+    return handle
+
+
+def dbfs_add_block(state: StubState, params: dict):
+    data = _unb64(params.get('data'))
+    if len(data) > MAX_BLOCK_SIZE:
+        raise StubError(400, 'MAX_BLOCK_SIZE_EXCEEDED', 'Block size exceeds 1MB')
+    _handle(state, params)['data'].extend(data)
+    return {}
+
+
+def dbfs_close(state: StubState, params: dict):
+    handle = _handle(state, params)
+    state.dbfs_write(handle['path'], handle['data'], handle['overwrite'])
+    del state.handles[int(params['handle'])]
+    return {}
+
+
+def _scim_filter(resources: list, params: dict) -> dict:
+    scim_filter = params.get('filter')
+    if scim_filter:
+        attribute, operator, value = scim_filter.split(' ', 2)
+        if operator != 'eq':
+            raise _invalid(f'Unsupported filter operator: {operator}')
+        resources = [r for r in resources if r.get(attribute) == value]
+    return {'totalResults': len(resources), 'startIndex': 1, 'itemsPerPage': len(resources),
+            'schemas': ['urn:ietf:params:scim:api:messages:2.0:ListResponse'], 'Resources': resources}
+
+
+def users_list(state: StubState, params: dict):
+    return _scim_filter(state.users, params)
+
+
+def service_principals_list(state: StubState, params: dict):
+    return _scim_filter(state.service_principals, params)
+
+
+ROUTES = {
+    ('GET', '2.0/workspace/list'): workspace_list,
+    ('GET', '2.0/workspace/export'): workspace_export,
+    ('POST', '2.0/workspace/import'): workspace_import,
+    ('POST', '2.0/workspace/delete'): workspace_delete,
+    ('POST', '2.0/workspace/mkdirs'): workspace_mkdirs,
+    ('GET', '2.1/jobs/list'): jobs_list,
+    ('GET', '2.1/jobs/get'): jobs_get,
+    ('POST', '2.1/jobs/create'): jobs_create,
+    ('POST', '2.1/jobs/reset'): jobs_reset,
+    ('POST', '2.1/jobs/update'): jobs_update,
+    ('POST', '2.1/jobs/delete'): jobs_delete,
+    ('POST', '2.1/jobs/run-now'): jobs_run_now,
+    ('GET', '2.1/jobs/runs/get'): jobs_runs_get,
+    ('POST', '2.1/jobs/runs/cancel'): jobs_runs_cancel,
+    ('GET', '2.0/instance-pools/list'): instance_pools_list,
+    ('POST', '2.0/instance-pools/create'): instance_pools_create,
+    ('POST', '2.0/instance-pools/edit'): instance_pools_edit,
+    ('POST', '2.0/instance-pools/delete'): instance_pools_delete,
+    ('GET', '2.0/clusters/list'): clusters_list,
+    ('POST', '2.0/clusters/create'): clusters_create,
+    ('POST', '2.0/clusters/edit'): clusters_edit,
+    ('POST', '2.0/clusters/permanent-delete'): clusters_delete,
+    ('GET', '2.0/dbfs/list'): dbfs_list,
+    ('GET', '2.0/dbfs/read'): dbfs_read,
+    ('POST', '2.0/dbfs/put'): dbfs_put,
+    ('POST', '2.0/dbfs/delete'): dbfs_delete,
+    ('POST', '2.0/dbfs/mkdirs'): dbfs_mkdirs,
+    ('POST', '2.0/dbfs/create'): dbfs_create,
+    ('POST', '2.0/dbfs/add-block'): dbfs_add_block,
+    ('POST', '2.0/dbfs/close'): dbfs_close,
+    ('PUT', FILES_ROUTE): fs_files_upload,
+    ('GET', '2.0/preview/scim/v2/Users'): users_list,
+    ('GET', '2.0/preview/scim/v2/ServicePrincipals'): service_principals_list,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'DatabricksStub/1.0'
+    protocol_version = 'HTTP/1.1'
+    # keep-alive connections otherwise wait for the delayed ACK on every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body.extend(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _parse_body(self, body: bytes) -> dict:
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser().parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + body)
+            if not message.is_multipart():
+                raise ValueError('Malformed multipart body')
+            return {part.get_param('name', header='Content-Disposition'):
+                    part.get_payload(decode=True) if part.get_filename() is not None
+                    else part.get_payload(decode=True).decode('utf-8')
+                    for part in message.get_payload()}
+        if content_type.startswith('application/octet-stream'):
+            return {'contents': body}
+        return json.loads(body)
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str):
+        stub = self.server.stub  # type: StubServer
+        url = urlsplit(self.path)
+        route = url.path[len('/api/'):] if url.path.startswith('/api/') else url.path
+        files_path = None
+        if route.startswith(FILES_ROUTE + '/'):
+            route, files_path = FILES_ROUTE, unquote(route[len(FILES_ROUTE):])
+        body = self._read_body()
+        with stub.lock:
+            stub.calls[route] += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        if self.headers.get('Authorization') != f'Bearer {stub.token}' and stub.token is not None:
+            self._send(401, {'error_code': 'UNAUTHENTICATED', 'message': 'Invalid access token'})
+            return
+        fault = stub.next_fault(route)
+        if fault:
+            self._send(fault, {'error_code': 'TEMPORARILY_UNAVAILABLE' if fault != 429 else 'REQUEST_LIMIT_EXCEEDED',
+                               'message': f'Injected {fault}'})
+            return
+        handler = ROUTES.get((method, route))
+        if handler is None:
+            self._send(404, {'error_code': 'ENDPOINT_NOT_FOUND', 'message': f'No API found for {method} {route}'})
+            return
+        try:
+            params = dict(parse_qsl(url.query))
+            if body:
+                params.update(self._parse_body(body))
+            if files_path is not None:
+                params['path'] = files_path
+            with stub.state.lock:
+                self._send(200, handler(stub.state, params))
+        except StubError as e:
+            self._send(e.status, {'error_code': e.error_code, 'message': e.message})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'error_code': 'MALFORMED_REQUEST', 'message': str(e)})
+
+
+class StubServer:
+    """
+    Runs the stand-in API on 127.0.0.1 in a background thread.
+    :param latency: seconds added to every call
+    :param rate_429: probability of answering any call with 429
+    :param rate_5xx: probability of answering any call with 503
+    :param seed: seed of the fault injection, so runs are reproducible
+    :param token: expected access token. None accepts any token
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0, rate_429: float = 0.0, rate_5xx: float = 0.0,
+                 seed: int = 0, token: str = None, user_name: str = 'cicd@example.com', user_id: str = '100'):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.token = token
+        self.state = StubState(user_name, user_id)
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._faults = {}
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def fail(self, route: str, status: int = 429, times: int = 1):
+        """
+        Answers the next `times` calls of `route` with `status`.
+        """
+        with self.lock:
+            self._faults.setdefault(route, []).extend([status] * times)
+
+    def next_fault(self, route: str):
+        with self.lock:
+            if self._faults.get(route):
+                return self._faults[route].pop(0)
+            if self.rate_429 and self._random.random() < self.rate_429:
+                return 429
+            if self.rate_5xx and self._random.random() < self.rate_5xx:
+                return 503
+        return None
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Databricks REST API.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every call.')
+    parser.add_argument('--rate_429', type=float, default=0.0, help='Probability of a 429 response.')
+    parser.add_argument('--rate_5xx', type=float, default=0.0, help='Probability of a 503 response.')
+    parser.add_argument('--user', default='cicd@example.com', help='The user name that owns created objects.')
+    args = parser.parse_args()
+    server = StubServer(args.port, args.latency, args.rate_429, args.rate_5xx, user_name=args.user)
+    print(f'Serving the Databricks stand-in API on {server.url}')
+    server.start()._thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import zipfile
+import pytest
+from conftest import TARGET_PATH, run_cicd, target_args
+from databricks_cicd.bundle.bundle import INDEX_ENTRY, Bundle
+
+
+def test_deploy_from_bundle(server, source, tmp_path):
+    bundle = tmp_path / 'bundle.zip'
+    result = run_cicd('bundle', '-lp', source, '-o', bundle)
+    assert result.returncode == 0, result.stdout + result.stderr
+    result = run_cicd('deploy', *target_args(server, tmp_path / 'elsewhere'), '--bundle', bundle)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert f'{TARGET_PATH}/lib/nb_c' in server.state.workspace
+    assert json.loads(server.state.dbfs[f'{TARGET_PATH}/conf/settings.json']['data']) == {'env': 'test'}
+
+
+@pytest.mark.parametrize('index, message', [
+    pytest.param(None, f'Not a bundle, no {INDEX_ENTRY} in', id='no index'),
+    pytest.param({'format': 0}, 'Bundle format 0', id='other format'),
+])
+def test_invalid_bundle(tmp_path, index, message):
+    path = tmp_path / 'invalid.zip'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('workspace/nb', '')
+        if index is not None:
+            archive.writestr(INDEX_ENTRY, json.dumps(index))
+    with pytest.raises(RuntimeError, match=message) as e:
+        Bundle(str(path))
+    if index is None:
+        assert isinstance(e.value.__cause__, KeyError)
+
+
+def test_deploy_of_invalid_bundle(server, source, tmp_path):
+    path = tmp_path / 'invalid.zip'
+    path.write_bytes(b'not a zip')
+    result = run_cicd('deploy', *target_args(server, source), '--bundle', path)
+    assert result.returncode != 0
+    assert 'Cannot open bundle' in result.stderr
@@ -0,0 +1,66 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import pytest
+from databricks_cicd.utils import codec
+
+
+def _keep(element) -> bool:
+    return not isinstance(element, dict) or element.get('keep', True)
+
+
+def _expected(data: bytes, key: str) -> tuple:
+    obj = json.loads(data)
+    elements = obj.get(key, [])
+    obj[key] = [e for e in elements if _keep(e)]
+    return obj, len(elements)
+
+
+@pytest.fixture(autouse=True)
+def incremental(monkeypatch):
+    monkeypatch.setattr(codec, 'INCREMENTAL_THRESHOLD', 0)
+
+
+@pytest.mark.parametrize('data', [
+    pytest.param(rb'{"jobs": [{"name": "a \"quoted\" name", "keep": true}, {"name": "back\\slash\\", "keep": false}]}',
+                 id='escaped quotes and backslashes'),
+    pytest.param(b'{"jobs": [{"name": "[{not a list}]", "n": "}"}, {"name": "]", "keep": false}], "next": "{["}',
+                 id='brackets in strings'),
+    pytest.param('{"jobs": [{"name": "café ☃ \U0001f600", "e": "\\u00e9"}], "ü": "ü"}'
+                 .encode('utf-8'), id='unicode'),
+    pytest.param(b'{"jobs": [], "has_more": false}', id='empty list'),
+    pytest.param(b'{"has_more": false}', id='missing key'),
+    pytest.param(b'{}', id='empty object'),
+    pytest.param(b' {\n "jobs" : [ 1 , -2.5e3 , null , true , [ [ ] , { } ] , {"keep" : false} ] ,\n "n" : 3 } ',
+                 id='scalars, nesting and whitespace'),
+])
+def test_equals_json_loads(data):
+    assert codec.loads_filtered(data, 'jobs', _keep) == _expected(data, 'jobs')
+    assert codec.loads_filtered(data.decode('utf-8'), 'jobs', _keep) == _expected(data, 'jobs')
+
+
+@pytest.mark.parametrize('data', [
+    b'{"jobs": [{"name": "a"}, {"name": "b"',
+    b'{"jobs": [{"name": "a"}, ',
+    b'{"jobs": [{"name": "unterminated',
+    b'{"jobs": [1, 2]',
+    b'{"jobs"',
+    b'',
+])
+def test_truncated_input_is_an_error(data):
+    with pytest.raises(ValueError):
+        json.loads(data)
+    with pytest.raises(ValueError):
+        codec.loads_filtered(data, 'jobs', _keep)
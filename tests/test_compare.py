@@ -0,0 +1,66 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from databricks_cicd.utils.compare import Comparator
+
+IGNORE = ['format', 'azure_attributes.first_on_demand']
+TASKS = [{'task_key': 'a', 'timeout_seconds': 60}, {'task_key': 'b', 'depends_on': [{'task_key': 'a'}]}]
+
+
+@pytest.mark.parametrize('left, right', [
+    pytest.param({'name': 'x', 'tags': None}, {'name': 'x'}, id='missing is None'),
+    pytest.param({'name': 'x', 'libraries': []}, {'name': 'x'}, id='missing is empty list'),
+    pytest.param({'name': 'x', 'spark_conf': {}}, {'name': 'x', 'spark_conf': None}, id='missing is empty dict'),
+    pytest.param({'a': 1, 'b': {'c': 2, 'd': 3}}, {'b': {'d': 3, 'c': 2}, 'a': 1}, id='key order'),
+    pytest.param({'ids': [3, 1, 2]}, {'ids': [1, 2, 3]}, id='list order'),
+    pytest.param({'tasks': TASKS}, {'tasks': TASKS[::-1]}, id='order of dicts with a sort key'),
+    pytest.param({'timeout': 1, 'nested': [{'task_key': 'a', 'n': 2}]},
+                 {'timeout': 1.0, 'nested': [{'task_key': 'a', 'n': 2.0}]}, id='int and float'),
+    pytest.param({'name': 'x', 'format': 'MULTI_TASK'}, {'name': 'x', 'format': 'SINGLE_TASK'},
+                 id='ignored top level key'),
+    pytest.param({'azure_attributes': {'first_on_demand': 1, 'availability': 'SPOT'}},
+                 {'azure_attributes': {'first_on_demand': 3, 'availability': 'SPOT'}}, id='ignored dotted path'),
+])
+def test_equal(left, right):
+    comparator = Comparator(IGNORE)
+    assert not comparator.is_different(left, right)
+    assert not comparator.is_different(right, left)
+    assert comparator.diff(left, right) == []
+
+
+@pytest.mark.parametrize('left, right', [
+    pytest.param({'name': 'x'}, {'name': 'y'}, id='changed value'),
+    pytest.param({'name': 'x'}, {'name': 'x', 'tags': {'team': 'a'}}, id='added attribute'),
+    pytest.param({'ids': [1, 2]}, {'ids': [1, 2, 2]}, id='list length'),
+    pytest.param({'timeout': 1}, {'timeout': 1.5}, id='number'),
+    pytest.param({'timeout': 1}, {'timeout': '1'}, id='number and string'),
+    pytest.param({'clusters': [{'name': 'a'}, {'name': 'b'}]}, {'clusters': [{'name': 'b'}, {'name': 'a'}]},
+                 id='order of dicts without a sort key'),
+    pytest.param({'tasks': TASKS}, {'tasks': [TASKS[0], dict(TASKS[1], depends_on=[{'task_key': 'c'}])]},
+                 id='nested change of a keyed dict'),
+    pytest.param({'settings': {'format': 'a'}}, {'settings': {'format': 'b'}}, id='ignored key below the top level'),
+    pytest.param({'first_on_demand': 1}, {'first_on_demand': 2}, id='dotted path at the top level'),
+])
+def test_different(left, right):
+    comparator = Comparator(IGNORE)
+    assert comparator.is_different(left, right)
+    assert comparator.is_different(right, left)
+    assert comparator.diff(left, right) != []
+
+
+def test_diff_matches_dicts_by_sort_key():
+    changed = [dict(TASKS[0], timeout_seconds=120), TASKS[1]]
+    assert Comparator().diff({'tasks': TASKS}, {'tasks': changed[::-1]}) == \
+        [('$.tasks[task_key=a].timeout_seconds', 60, 120)]
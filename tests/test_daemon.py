@@ -0,0 +1,73 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from conftest import TARGET_PATH, USER_NAME
+from databricks_cicd.conf import Conf
+from databricks_cicd.daemon.server import DeployDaemon, _HTTPServer
+
+
+@pytest.fixture
+def daemon():
+    deploy_daemon = DeployDaemon(Conf({'daemon': {}}, None).daemon)
+    server = _HTTPServer(('127.0.0.1', 0), deploy_daemon)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def call(path: str, body: dict = None) -> tuple:
+        request = urllib.request.Request(f'http://127.0.0.1:{server.server_address[1]}{path}',
+                                         data=None if body is None else json.dumps(body).encode('utf-8'))
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+    yield call
+    server.shutdown()
+    server.server_close()
+    deploy_daemon.close()
+
+
+def _request(server, source, **fields) -> dict:
+    return {'token': 'token', 'workspace': server.url, 'user': USER_NAME, 'target_path': TARGET_PATH,
+            'name_prefix': 'dev_', 'local_path': source, **fields}
+
+
+def test_invalid_requests(daemon):
+    assert daemon('/deploy', {'token': 'token'})[0] == 400
+    assert daemon('/deploy', ['not', 'an', 'object'])[0] == 400
+    assert daemon('/other', {})[0] == 404
+    assert daemon('/status')[1]['sessions'] == []
+
+
+def test_failed_deploys_are_server_errors(daemon, server, source, tmp_path):
+    invalid = tmp_path / 'invalid.ini'
+    invalid.write_text('[global]\ndeploy_safety_limit: many\n')
+    status, body = daemon('/deploy', _request(server, source, config_file=str(invalid)))
+    assert (status, body['status']) == (500, 'failed')
+
+    limited = tmp_path / 'limited.ini'
+    limited.write_text('[global]\ndeploy_safety_limit: 1\n')
+    status, body = daemon('/deploy', _request(server, source, config_file=str(limited)))
+    assert (status, body['status']) == (500, 'failed')
+    assert 'Deploy safety limit reached' in body['error']
+
+    status, body = daemon('/deploy', _request(server, source))
+    assert (status, body['status']) == (200, 'succeeded'), body
+    stats = {s['config_file']: (s['deploys'], s['failed']) for s in daemon('/status')[1]['sessions']}
+    assert stats == {str(limited): (0, 1), None: (1, 0)}
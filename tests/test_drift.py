@@ -0,0 +1,64 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from conftest import TARGET_PATH, run_cicd, target_args
+
+
+def _drift(server, source, tmp_path) -> tuple:
+    report = tmp_path / 'drift.json'
+    result = run_cicd('drift', *target_args(server, source), '--report', report, '--state_file',
+                      tmp_path / 'state.json')
+    return result, json.loads(report.read_text()) if report.exists() else None
+
+
+def test_no_drift_after_deploy(server, source, tmp_path):
+    assert run_cicd('deploy', *target_args(server, source)).returncode == 0
+    result, report = _drift(server, source, tmp_path)
+    assert result.returncode == 0, result.stdout
+    assert report['drift'] == []
+
+
+def test_missing_references_are_reported(server, source, tmp_path):
+    assert run_cicd('deploy', *target_args(server, source)).returncode == 0
+    # deleted by hand: a notebook that job_a runs and the instance pool of cluster_a
+    del server.state.workspace[f'{TARGET_PATH}/nb_a']
+    pool_id = next(k for k, v in server.state.instance_pools.items() if v['instance_pool_name'] == 'dev_pool_a')
+    del server.state.instance_pools[pool_id]
+
+    result, report = _drift(server, source, tmp_path)
+
+    assert result.returncode == 3, result.stdout + result.stderr
+    drift = {(d['kind'], d['name']): d for d in report['drift']}
+    assert drift[('workspace', 'nb_a')]['change'] == 'missing'
+    assert drift[('instance_pools', 'pool_a')]['change'] == 'missing'
+    assert drift[('jobs', 'job_a')]['change'] == 'changed'
+    assert 'Notebook "nb_a"' in drift[('jobs', 'job_a')]['reason']
+    assert drift[('clusters', 'cluster_a')]['change'] == 'changed'
+    assert 'Instance pool "pool_a"' in drift[('clusters', 'cluster_a')]['reason']
+    assert ('jobs', 'job_b') not in drift
+
+
+def test_state_is_kept_outside_of_the_source(server, source, tmp_path):
+    home = tmp_path / 'home'
+    assert run_cicd('deploy', *target_args(server, source)).returncode == 0
+    before = sorted(os.listdir(source))
+
+    result = run_cicd('drift', *target_args(server, source), env={'HOME': str(home)})
+
+    assert result.returncode == 0, result.stdout
+    assert sorted(os.listdir(source)) == before
+    state = json.loads((home / '.cache' / 'databricks-cicd' / 'drift_state.json').read_text())
+    assert [len(notebooks) for notebooks in state['workspaces'].values()] == [3]
@@ -0,0 +1,72 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import pytest
+from databricks_cicd.utils import ItemStore, ancestors, merge_join
+
+PATHS = ['a', 'a/b', 'a/b/c', 'a b', 'a-b', 'a.b', 'a/b c', 'b', 'B', 'é', 'a/é', '']
+
+
+def _expected(left: dict, right: dict) -> list:
+    return [(k, left.get(k), right.get(k)) for k in sorted(left.keys() | right.keys())]
+
+
+@pytest.mark.parametrize('store', [dict, ItemStore])
+@pytest.mark.parametrize('seed', range(5))
+def test_merge_join(store, seed):
+    rnd = random.Random(seed)
+    left = store({p: f'left {p}' for p in PATHS if rnd.random() < 0.6})
+    right = store({p: f'right {p}' for p in PATHS if rnd.random() < 0.6})
+    assert list(merge_join(left, right)) == _expected(left, right)
+
+
+def test_merge_join_of_empty_stores():
+    assert list(merge_join(ItemStore(), {})) == []
+    assert list(merge_join(ItemStore({'a': 1}), ItemStore())) == [('a', 1, None)]
+    assert list(merge_join({}, ItemStore({'a': 1}))) == [('a', None, 1)]
+
+
+def test_merge_join_yields_parents_first():
+    store = ItemStore({p: p for p in PATHS if p})
+    seen = set()
+    for path, _, _ in merge_join(store, {}):
+        assert all(a in seen for a in ancestors(path) if a in store), path
+        seen.add(path)
+
+
+@pytest.mark.parametrize('mutate', [
+    pytest.param(lambda s: s.__setitem__('c', 3), id='setitem'),
+    pytest.param(lambda s: s.__delitem__('a'), id='delitem'),
+    pytest.param(lambda s: s.pop('a'), id='pop'),
+    pytest.param(lambda s: s.popitem(), id='popitem'),
+    pytest.param(lambda s: s.setdefault('0', 0), id='setdefault'),
+    pytest.param(lambda s: s.update({'c': 3}), id='update'),
+    pytest.param(lambda s: s.update(c=3), id='update kwargs'),
+    pytest.param(lambda s: s.__ior__({'c': 3}), id='ior'),
+    pytest.param(lambda s: s.clear(), id='clear'),
+])
+def test_sorted_keys_follow_changes(mutate):
+    store = ItemStore({'b': 2, 'a': 1})
+    assert store.sorted_keys() == ['a', 'b']
+    mutate(store)
+    assert store.sorted_keys() == sorted(store)
+
+
+def test_ior_keeps_the_store():
+    store = ItemStore({'b': 2})
+    store.sorted_keys()
+    store |= {'a': 1}
+    assert isinstance(store, ItemStore)
+    assert store.sorted_keys() == ['a', 'b']
@@ -0,0 +1,132 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import pytest
+from conftest import run_cicd, target_args
+from databricks_cicd.conf import Conf
+from databricks_cicd.utils import Context
+from databricks_cicd.utils.helpers import JobsHelper
+
+TASK_A = {'task_key': 'a', 'notebook_task': {'notebook_path': '/t/nb_a'}, 'timeout_seconds': 60}
+TASK_B = {'task_key': 'b', 'notebook_task': {'notebook_path': '/t/nb_b'}, 'depends_on': [{'task_key': 'a'}]}
+CLUSTER = {'job_cluster_key': 'main', 'new_cluster': {'spark_version': '10.4.x-scala2.12', 'num_workers': 1}}
+REMOTE = {'name': 'job', 'max_concurrent_runs': 1, 'email_notifications': {'on_failure': ['team@example.com']},
+          'tasks': [TASK_A, TASK_B], 'job_clusters': [CLUSTER], 'format': 'MULTI_TASK'}
+
+
+@pytest.fixture
+def jobs() -> JobsHelper:
+    conf = Conf({'global': {'workspace_host': 'localhost', 'deploying_user_name': 'cicd@example.com'}}, None)
+    return JobsHelper(Context(conf), None, None)
+
+
+def _local(**changes) -> dict:
+    local = {k: v for k, v in REMOTE.items() if k != 'format'}
+    local.update(changes)
+    return {k: v for k, v in local.items() if v is not None}
+
+
+def test_removed_field(jobs):
+    assert jobs.partial_settings(_local(email_notifications=None), REMOTE) == \
+        {'new_settings': {}, 'fields_to_remove': ['email_notifications']}
+
+
+def test_changed_field(jobs):
+    assert jobs.partial_settings(_local(max_concurrent_runs=2), REMOTE) == \
+        {'new_settings': {'max_concurrent_runs': 2}, 'fields_to_remove': []}
+
+
+def test_server_settings_are_never_removed(jobs):
+    assert jobs.partial_settings(_local(), REMOTE) is None
+    assert 'format' not in jobs.partial_settings(_local(name='other'), REMOTE)['fields_to_remove']
+
+
+def test_keyed_changes(jobs):
+    changed_a = dict(TASK_A, timeout_seconds=120)
+    task_c = {'task_key': 'c', 'notebook_task': {'notebook_path': '/t/nb_c'}}
+    other_cluster = {'job_cluster_key': 'other', 'new_cluster': CLUSTER['new_cluster']}
+    body = jobs.partial_settings(_local(tasks=[task_c, changed_a], job_clusters=[other_cluster]), REMOTE)
+    assert body == {'new_settings': {'tasks': [task_c, changed_a], 'job_clusters': [other_cluster]},
+                    'fields_to_remove': ['job_clusters/main', 'tasks/b']}
+
+
+def test_all_tasks_removed(jobs):
+    assert jobs.partial_settings(_local(tasks=None), REMOTE) == \
+        {'new_settings': {}, 'fields_to_remove': ['tasks/a', 'tasks/b']}
+
+
+@pytest.mark.parametrize('tasks', [
+    pytest.param([TASK_A, {'notebook_task': {'notebook_path': '/t/nb_b'}}], id='task without key'),
+    pytest.param([TASK_A, dict(TASK_B, task_key='a')], id='duplicate key'),
+])
+def test_reset_when_keys_do_not_identify_tasks(jobs, tasks):
+    assert jobs.partial_settings(_local(tasks=tasks), REMOTE) is None
+
+
+def _edit_job(source: str, edit):
+    path = os.path.join(source, 'jobs', 'job_a.json')
+    with open(path) as f:
+        job = json.load(f)
+    edit(job)
+    with open(path, 'w') as f:
+        json.dump(job, f)
+
+
+def _redeploy(server, source, config=None) -> dict:
+    server.reset_calls()
+    result = run_cicd('deploy', *target_args(server, source, config))
+    assert result.returncode == 0, result.stdout + result.stderr
+    return {'update': server.calls['2.1/jobs/update'], 'reset': server.calls['2.1/jobs/reset']}
+
+
+def _job_a(server) -> dict:
+    return next(j['settings'] for j in server.state.jobs.values() if j['settings']['name'] == 'dev_job_a')
+
+
+def test_unchanged_job_is_not_updated(server, source):
+    _redeploy(server, source)
+    assert _redeploy(server, source) == {'update': 0, 'reset': 0}
+
+
+def test_changed_job_is_updated_partially(server, source):
+    _redeploy(server, source)
+
+    def edit(job):
+        job.pop('max_concurrent_runs')
+        job['tasks'][0]['timeout_seconds'] = 120
+        del job['tasks'][1]
+    _edit_job(source, edit)
+
+    assert _redeploy(server, source) == {'update': 1, 'reset': 0}
+    job = _job_a(server)
+    assert 'max_concurrent_runs' not in job
+    assert [(t['task_key'], t.get('timeout_seconds')) for t in job['tasks']] == [('first', 120)]
+    assert job['format'] == 'MULTI_TASK'
+
+
+def test_keyless_task_falls_back_to_reset(server, source):
+    _redeploy(server, source)
+    _edit_job(source, lambda job: job['tasks'][1].pop('depends_on') and job['tasks'][1].pop('task_key'))
+    assert _redeploy(server, source) == {'update': 0, 'reset': 1}
+
+
+def test_reset_without_partial_update(server, source, tmp_path):
+    config = tmp_path / 'reset.ini'
+    config.write_text('[jobs]\npartial_update: False\n')
+    _redeploy(server, source, config)
+    _edit_job(source, lambda job: job.update(max_concurrent_runs=2))
+    assert _redeploy(server, source, config) == {'update': 0, 'reset': 1}
+    assert _job_a(server)['max_concurrent_runs'] == 2
@@ -0,0 +1,55 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from urllib.parse import quote, quote_plus
+from conftest import USER_NAME, run_cicd
+from databricks_cicd.utils import transport
+
+USER_PATH = f'/Users/{USER_NAME}/cicd'
+IDENTITIES = [USER_NAME, quote(USER_NAME), quote_plus(USER_NAME), USER_NAME.split('@')[0] + '@']
+
+
+def _deploy(server, source, *args):
+    return run_cicd('deploy', '-w', server.url, '-u', USER_NAME, '-t', 'token', '-tp', USER_PATH, '-np', 'dev_',
+                    '-lp', source, *args)
+
+
+def test_recording_has_no_identities(server, source, tmp_path):
+    server.state.workspace_mkdirs(USER_PATH)
+    server.state.dbfs_mkdirs(USER_PATH)
+    recording = tmp_path / 'calls.jsonl'
+    assert _deploy(server, source).returncode == 0
+    result = _deploy(server, source, '--record', recording)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    text = recording.read_text()
+    assert f'/Users/{transport.PSEUDONYM_PREFIX}' in text
+    assert not [identity for identity in IDENTITIES if identity in text]
+
+    replay = _deploy(server, source, '--replay', recording, '--replay_speed', 0)
+    assert replay.returncode == 0, replay.stdout + replay.stderr
+    assert 'No recorded response' not in replay.stderr
+
+
+def test_paths_in_urls_are_restored():
+    pseudonyms = transport._Pseudonyms('salt')
+    url = f'https://host/api/2.0/workspace/list?path={quote_plus(USER_PATH)}&x=1'
+    path = transport._api_path(url, pseudonyms)
+    assert USER_NAME not in path and quote_plus(USER_NAME) not in path
+    assert path.startswith('/api/2.0/workspace/list?path=/Users/' + transport.PSEUDONYM_PREFIX)
+    assert path.endswith('/cicd&x=1')
+
+    body = transport.sanitize({'objects': [{'path': f'/Repos/{USER_NAME}/repo'}]}, pseudonyms)
+    assert USER_NAME not in str(body)
+    assert transport._restore(body, pseudonyms) == {'objects': [{'path': f'/Repos/{USER_NAME}/repo'}]}
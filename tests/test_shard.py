@@ -0,0 +1,133 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from conftest import run_cicd, target_args
+from generate import SCALES, generate
+from databricks_cicd.conf import Conf
+import databricks_cicd.utils.helpers as helpers
+from databricks_cicd.utils import Context
+from databricks_cicd.deploy.shard import Shard, ShardMarkers, _UnionFind
+
+COUNT = 3
+KINDS = ['workspace', 'instance_pools', 'clusters', 'jobs', 'dbfs']
+
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory) -> str:
+    root = str(tmp_path_factory.mktemp('generated'))
+    generate(root, dict(SCALES['small'], dbfs_large=0))
+    return root
+
+
+def _split(local_path: str, shard: Shard) -> dict:
+    """
+    The local item names of a shard by kind, without directories.
+    """
+    context = Context(Conf({'global': {'workspace_host': 'localhost', 'local_path': local_path,
+                                       'deploying_user_name': 'cicd@example.com'}}, None))
+    workspace = helpers.WorkspaceHelper(context)
+    instance_pools = helpers.InstancePoolsHelper(context)
+    clusters = helpers.ClustersHelper(context, instance_pools)
+    jobs = helpers.JobsHelper(context, clusters, workspace)
+    dbfs = helpers.DBFSHelper(context)
+    shard.split(workspace, instance_pools, clusters, jobs, dbfs)
+    return {kind: {name for name, item in helper.local_items.items() if not item.is_dir}
+            for kind, helper in zip(KINDS, [workspace, instance_pools, clusters, jobs, dbfs])}
+
+
+def test_partition_is_complete_and_deterministic(generated):
+    whole = _split(generated, Shard(1, 1))
+    shards = [_split(generated, Shard(i, COUNT)) for i in range(1, COUNT + 1)]
+    assert shards == [_split(generated, Shard(i, COUNT)) for i in range(1, COUNT + 1)]
+    for kind in KINDS:
+        assert sum(len(s[kind]) for s in shards) == len(whole[kind]), kind
+        assert set().union(*[s[kind] for s in shards]) == whole[kind], kind
+    assert all(s['jobs'] for s in shards)
+
+
+def test_dependent_items_stay_in_one_shard(generated):
+    for i in range(1, COUNT + 1):
+        items = _split(generated, Shard(i, COUNT))
+        for name in items['jobs']:
+            with open(os.path.join(generated, 'jobs', f'{name}.json')) as f:
+                spec = json.load(f)
+            notebooks = {t['notebook_task']['notebook_path'] for t in spec['tasks'] if 'notebook_task' in t}
+            assert notebooks and notebooks <= items['workspace'], name
+        for name in items['clusters']:
+            with open(os.path.join(generated, 'clusters', f'{name}.json')) as f:
+                pool = json.load(f).get('instance_pool_name')
+            assert pool is None or pool in items['instance_pools'], name
+
+
+def test_groups_do_not_depend_on_order():
+    pairs = [('jobs:b', 'workspace:x'), ('jobs:a', 'workspace:x'), ('clusters:c', 'instance_pools:p')]
+    groups = []
+    for ordered in [pairs, pairs[::-1], [(r, l) for l, r in pairs]]:
+        union_find = _UnionFind()
+        for left, right in ordered:
+            union_find.union(left, right)
+        groups.append(union_find.groups())
+    assert groups[0] == groups[1] == groups[2]
+    assert groups[0]['jobs:b'] == groups[0]['workspace:x'] == 'jobs:a'
+    assert groups[0]['instance_pools:p'] == 'clusters:c'
+
+
+def test_shard_is_validated():
+    assert str(Shard.parse(' 2/4 ')) == '2/4'
+    for value in ['0/3', '4/3', '3', 'a/b']:
+        with pytest.raises(AssertionError):
+            Shard.parse(value)
+
+
+def test_markers(tmp_path):
+    markers = ShardMarkers(str(tmp_path), COUNT, 'tree')
+    for i in [1, 3]:
+        markers.write(Shard(i, COUNT), writes=i)
+    with pytest.raises(AssertionError, match=f'Shard 2/{COUNT} has not succeeded. No marker in: '):
+        markers.check()
+    markers.write(Shard(2, COUNT), writes=2)
+    assert sum(m['writes'] for m in markers.check()) == 6
+    with pytest.raises(AssertionError, match='different source tree'):
+        ShardMarkers(str(tmp_path), COUNT, 'other tree').check()
+    markers.clear()
+    assert os.listdir(tmp_path) == []
+
+
+def test_finalize_refuses_without_all_markers(server, source, tmp_path):
+    shard_dir = tmp_path / 'shards'
+    config = tmp_path / 'shard.ini'
+    config.write_text('[shard]\npoll_interval: 1\nwait_timeout: 60\n')
+
+    def deploy(*args):
+        return run_cicd('deploy', *target_args(server, source, config), '--shard_dir', shard_dir, *args)
+    # shards wait for the clusters of other shards, so they run at the same time
+    with ThreadPoolExecutor(COUNT) as executor:
+        results = list(executor.map(lambda i: deploy('--shard', f'{i}/{COUNT}'), range(1, COUNT + 1)))
+    assert all(r.returncode == 0 for r in results), [r.stderr for r in results]
+
+    os.remove(shard_dir / f'shard_2_of_{COUNT}.json')
+    server.reset_calls()
+    result = deploy('--finalize_shards', COUNT)
+    assert result.returncode != 0
+    assert f'Shard 2/{COUNT} has not succeeded. No marker in: ' in result.stderr
+    assert not [route for route, count in server.calls.items() if count and 'delete' in route]
+
+    assert deploy('--shard', f'2/{COUNT}').returncode == 0
+    result = deploy('--finalize_shards', COUNT)
+    assert result.returncode == 0, result.stderr
+    assert os.listdir(shard_dir) == []
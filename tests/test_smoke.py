@@ -0,0 +1,51 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from conftest import USER_NAME, run_cicd
+
+JOBS = 12  # more than the default deploy_safety_limit
+
+
+@pytest.fixture
+def smoke(server, tmp_path):
+    for i in range(JOBS):
+        job_id = server.state.new_id()
+        server.state.jobs[job_id] = {'job_id': job_id, 'creator_user_name': USER_NAME,
+                                     'created_time': server.state.now(),
+                                     'settings': {'name': f'dev_job_{i}', 'format': 'MULTI_TASK'}}
+    config = tmp_path / 'smoke.ini'
+    config.write_text('[smoke]\npoll_interval: 0.05\nmax_poll_interval: 0.2\ncalls_per_second: 50\n')
+
+    def run(*args):
+        jobs = [arg for i in range(JOBS) for arg in ['-j', f'job_{i}']]
+        return run_cicd('smoke', '-w', server.url, '-u', USER_NAME, '-t', 'token', '-np', 'dev_', '-c', config,
+                        *jobs, *args)
+    return run
+
+
+def test_runs_do_not_count_towards_the_safety_limit(server, smoke):
+    result = smoke()
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert server.calls['2.1/jobs/run-now'] == JOBS
+    assert server.calls['2.1/jobs/runs/cancel'] == 0
+
+
+def test_aborted_smoke_cancels_its_runs(server, smoke):
+    server.state.run_duration = 60
+    server.fail('2.1/jobs/runs/get', 400)
+    result = smoke()
+    assert result.returncode != 0
+    assert len(server.state.runs) == JOBS
+    assert all(run['cancelled'] for run in server.state.runs.values())
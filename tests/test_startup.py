@@ -0,0 +1,34 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+import pytest
+from startup import HEAVY_MODULES, heavy_imports, _env
+from databricks_cicd.cli import COMMANDS
+
+SUBCOMMAND_MODULES = [v.split(':')[0] for v in COMMANDS.values()]
+
+
+@pytest.mark.parametrize('module', ['databricks_cicd', 'databricks_cicd.cli'])
+def test_import_is_lazy(module):
+    modules = HEAVY_MODULES + SUBCOMMAND_MODULES
+    probe = f'import sys, {module}; print("\\n".join(m for m in {modules} if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, env=_env(), check=True)
+    assert result.stdout.split() == []
+
+
+@pytest.mark.parametrize('command', [['-v'], ['validate', '-lp', '{local_path}']])
+def test_local_commands_do_not_load_the_api(command, tmp_path):
+    assert heavy_imports([a.format(local_path=tmp_path) for a in command]) == []
@@ -0,0 +1,55 @@
+# Copyright (C) databricks-cicd 2021 man40 (man40dev@gmail.com)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pytest
+from conftest import TARGET_PATH, run_cicd, target_args
+from stub_server import FILES_ROUTE
+from databricks_cicd.utils.transport import STREAM_CHUNK_SIZE
+
+# more than two chunks, and not a multiple of the chunk or block size
+SIZE = 2 * STREAM_CHUNK_SIZE + 12345
+ROUTES = {'blocks': '2.0/dbfs/add-block', 'put': '2.0/dbfs/put', 'files': FILES_ROUTE}
+
+
+def _deploy(server, source, tmp_path, backend: str):
+    config = tmp_path / 'upload.ini'
+    config.write_text(f'[global]\ndeploy_safety_limit: 100\nrate_limit_timeout: 1\n[dbfs]\nupload_backend: {backend}\n')
+    result = run_cicd('deploy', *target_args(server, source, config))
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result
+
+
+@pytest.fixture
+def large_file(source) -> bytes:
+    content = os.urandom(SIZE)
+    with open(os.path.join(source, 'dbfs', 'large file.bin'), 'wb') as f:
+        f.write(content)
+    return content
+
+
+@pytest.mark.parametrize('backend', sorted(ROUTES))
+def test_large_file_is_uploaded_whole(server, source, tmp_path, large_file, backend):
+    _deploy(server, source, tmp_path, backend)
+    assert server.state.dbfs[f'{TARGET_PATH}/large file.bin']['data'] == large_file
+    assert server.calls[ROUTES[backend]] > 0
+
+
+@pytest.mark.parametrize('backend', ['put', 'files'])
+def test_retried_upload_sends_the_whole_stream_again(server, source, tmp_path, large_file, backend):
+    server.fail(ROUTES[backend], 429)
+    _deploy(server, source, tmp_path, backend)
+    assert server.state.dbfs[f'{TARGET_PATH}/large file.bin']['data'] == large_file
+    # the large file and conf/settings.json, plus the retry
+    assert server.calls[ROUTES[backend]] == 3